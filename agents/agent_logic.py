@@ -1,42 +1,91 @@
 # ai-emotion-support/agents/agent_logic.py - SON GÜNCEL VE İYİLEŞTİRİLMİŞ PROMPT KODU
-from langchain.memory import ConversationBufferMemory
 from langchain.agents import AgentExecutor, create_openai_functions_agent
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from typing import Dict, List, Any
+from typing import Awaitable, Callable, Dict, Iterator, List, Any, Optional
+import asyncio
 import json
+import queue
+import threading
+import time
 from datetime import datetime
-from .tools import get_agent_tools 
+from .tools import get_agent_tools, provide_crisis_resources
+from .keyword_engine import match_categories
+from .session_manager import AgentSession, create_memory
+from .conversation_memory import format_transcript
+from .streaming import EVENT_CRISIS, EVENT_DONE, EVENT_TOKEN, EVENT_TOOL_END, EVENT_TOOL_START, QueueCallbackHandler, is_end_of_stream
+from .intent_router import AGENT_ROUTE, IntentDecision, IntentRouter, template_response
+from .crisis_detector import CRISIS_RESPONSE_OPENING, CrisisAssessment, detect_crisis
+from .llm_client import LLM_TIMEOUT_SECONDS, ResilientChatModel
+from rag.resilience import CircuitOpenError, OverloadedError
+from .deadline import (
+    DEFAULT_FALLBACK_TOOL, DEFAULT_TURN_BUDGET_SECONDS, FALLBACK_TOOL_BY_CATEGORY, STAGE_RETRIEVAL,
+    DeadlineCallbackHandler, DeadlineExceeded, TurnDeadline,
+)
+from rag.context_packer import pack_context
+from rag.topic_router import route_topics
 
 class EmotionalSupportAgent:
     """
     Destekleyici Mini Terapi Asistanı - Agent Mimarisi
+
+    LLM istemcisi, araçlar, prompt ve AgentExecutor durumsuzdur ve tüm kullanıcılarca
+    paylaşılır. Konuşma belleği ve duygu profili AgentSession'da tutulur
+    (bkz. session_manager.SessionPool); session verilmezse varsayılan oturum kullanılır.
     """
-    def __init__(self, api_key: str, retriever= None):
+    def __init__(self, api_key: str, retriever= None, context_token_budget: int = 600,
+                 enable_fast_path: bool = True, fast_path_wrap: str = "template",
+                 turn_budget_seconds: Optional[float] = DEFAULT_TURN_BUDGET_SECONDS):
         self.api_key = api_key
-        self.llm = ChatGoogleGenerativeAI(
+        # Yeniden deneme ve süre sınırı ResilientChatModel'dedir; sağlayıcı istemcisi
+        # tek deneme yapar, böylece kesintide istekler katlanmaz.
+        self.llm = ResilientChatModel(inner=ChatGoogleGenerativeAI(
             model="gemini-2.5-flash",   
             google_api_key=api_key,
             temperature=1.0,
-            convert_system_message_to_human=True
-        )
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history", return_messages=True,
-            output_key="output", input_key="input",
-        )
+            convert_system_message_to_human=True,
+            timeout=LLM_TIMEOUT_SECONDS,
+            max_retries=1,
+        ))
         self.tools = get_agent_tools()
+        self._tools_by_name = {tool.name: tool for tool in self.tools}
         self.prompt = self._create_agent_prompt()
         self.agent = create_openai_functions_agent(
             llm=self.llm, tools=self.tools, prompt=self.prompt
         )
+        # Executor'a bellek bağlanmaz; geçmiş her çağrıda oturumdan verilir ve
+        # yanıt oturumun belleğine yazılır. Böylece tek executor tüm oturumlara hizmet eder.
         self.agent_executor = AgentExecutor(
-            agent=self.agent, tools=self.tools, memory=self.memory,
+            agent=self.agent, tools=self.tools,
             verbose=True, handle_parsing_errors=True, max_iterations=5
         )
         self.retriever = retriever
-        self.user_profile = {
-            "emotion_history": [], "preferred_support_types": [], "crisis_indicators": []
-        }
+        # RAG bağlamı için token bütçesi (birleştirme + MMR + kırpma sonrası)
+        self.context_token_budget = context_token_budget
+        # Tek kullanıcılı kullanım (session verilmeyen çağrılar) için varsayılan oturum
+        self.default_session = AgentSession("default", memory=create_memory(summarizer=self.summarize_conversation))
+        # aprocess_user_input'un başlattığı arka plan kayıt görevleri
+        self._background_tasks = set()
+        # Tek araçlık kısa istekler için agent döngüsünü atlayan yerel yönlendirici.
+        # fast_path_wrap: "template" (LLM çağrısı yok) veya "llm" (tek kısa LLM çağrısı)
+        self.intent_router = IntentRouter() if enable_fast_path else None
+        self.fast_path_wrap = fast_path_wrap
+        # Tur başına süre bütçesi (saniye; None = sınırsız). Bütçe LLM çağrıları ve araç
+        # çalıştırmaları boyunca uygulanır; tükenirse toplanan araç çıktısıyla yanıt verilir.
+        self.turn_budget_seconds = turn_budget_seconds
+        self._budget_lock = threading.Lock()
+        self._budget_exhausted: Dict[str, int] = {}
+
+    @property
+    def memory(self):
+        return self.default_session.memory
+
+    @property
+    def user_profile(self):
+        return self.default_session.user_profile
+
+    def _session(self, session: Optional[AgentSession]) -> AgentSession:
+        return session if session is not None else self.default_session
 
     # agent_logic.py dosyasındaki fonksiyonu güncelleyin
 
@@ -74,36 +123,46 @@ class EmotionalSupportAgent:
         )
         return prompt
 
-    def analyze_emotion_pattern(self, current_emotion: str, intensity: int) -> Dict[str, Any]:
-        emotion_entry = {
-            "emotion": current_emotion, "intensity": intensity, "timestamp": datetime.now().isoformat()
-        }
-        self.user_profile["emotion_history"].append(emotion_entry)
-        recent_emotions = self.user_profile["emotion_history"][-5:]
+    def analyze_emotion_pattern(self, current_emotion: str, intensity: int,
+                                session: Optional[AgentSession] = None,
+                                crisis: Optional[CrisisAssessment] = None) -> Dict[str, Any]:
+        # Eğilim motoru son kayıtları halka tamponda tutar; tüm ölçüler O(1) güncellenir.
+        trend = self._session(session).user_profile["emotion_trend"]
+        trend.add(current_emotion, intensity)
         analysis = {
             "pattern_detected": False, "trend": "stable",
-            "recommendations": [], "crisis_risk": "low"
+            "recommendations": [], "crisis_risk": "low",
+            "ewma_intensity": round(trend.ewma, 2), "intensity_slope": round(trend.slope(), 3),
         }
-        if len(recent_emotions) >= 3:
-            intensities = [e["intensity"] for e in recent_emotions]
-            if all(i >= 4 for i in intensities[-3:]):
+        if trend.size >= 3:
+            if trend.high_streak >= 3:
                 analysis["trend"] = "worsening"; analysis["crisis_risk"] = "medium"; analysis["recommendations"].append("professional_help")
-            elif all(i <= 2 for i in intensities[-3:]):
+            elif trend.low_streak >= 3:
                 analysis["trend"] = "improving"
-            emotions = [e["emotion"] for e in recent_emotions]
-            if emotions.count(current_emotion) >= 3:
+            if trend.count(current_emotion) >= 3:
                 analysis["pattern_detected"] = True; analysis["recommendations"].append("pattern_intervention")
+        if crisis is not None and crisis.is_crisis:
+            # Yerel kriz algılayıcısı metinde risk ifadesi buldu
+            analysis["crisis_risk"] = "high"
+            analysis["recommendations"].append("crisis_resources")
         return analysis
 
+    def _analyze_form_emotion(self, emotion_data: Dict, session: AgentSession,
+                              crisis: Optional[CrisisAssessment] = None) -> Dict[str, Any]:
+        # Formda seçilen duygu, kayıtlı ruh hali geçmişiyle (selected_emotion) aynı etiketle izlenir.
+        emotion = emotion_data.get("dominant_emotion") or emotion_data.get("selected_emotion") or "belirsiz"
+        return self.analyze_emotion_pattern(emotion, emotion_data.get("intensity", 3), session=session, crisis=crisis)
+
     def create_multi_step_plan(self, user_input: str, emotion_analysis: Dict) -> List[str]:
         # PLAN ADIMLARI DAHA ÇOK AI'IN İÇSEL DÜŞÜNCE SÜRECİNİ YANSITMALI
         plan_steps = [] 
         if emotion_analysis.get("crisis_risk") == "high":
             plan_steps.append("🚨 Acil destek kaynaklarını nazikçe öner.")
             plan_steps.append("📞 Profesyonel yardım almanın önemini vurgula.")
-        if "stres" in user_input.lower() or "endişe" in user_input.lower():
+        categories = match_categories(user_input)
+        if categories & {"stress", "anxiety"}:
             plan_steps.append("🧘 Rahatlatıcı tekniklerden (nefes, meditasyon) birini somut olarak öner.")
-        if "motivasyon" in user_input.lower() or "enerji" in user_input.lower():
+        if "motivation" in categories:
             plan_steps.append("⚡ Motivasyon artırıcı egzersizlerden veya küçük bir öz bakım aktivitesinden somut bir örnek ver.")
         
         # Bu adım, ana destek mesajının nasıl oluşturulacağını yönlendirir, kullanıcıya gösterilmez.
@@ -116,60 +175,500 @@ class EmotionalSupportAgent:
    # agent_logic.py dosyasında bu fonksiyonu bulun ve değiştirin
 
     
-    def process_user_input(self, user_input: str, emotion_data: Dict = None) -> Dict[str, Any]:
+    def process_user_input(self, user_input: str, emotion_data: Dict = None,
+                           session: Optional[AgentSession] = None) -> Dict[str, Any]:
+        session = self._session(session)
+        # Aynı oturuma gelen eşzamanlı istekler sıraya girer; diğer oturumlar etkilenmez.
+        with session.lock:
+            session.touch()
+            started = time.perf_counter()
+            result = self._process_user_input(user_input, emotion_data, session)
+            self._record_route(result, started)
+            return result
+
+    def _process_user_input(self, user_input: str, emotion_data: Optional[Dict],
+                            session: AgentSession) -> Dict[str, Any]:
+        # Kriz taraması her ağ çağrısından önce ve yerel olarak yapılır.
+        crisis = self._assess_crisis(user_input, session)
         try:
-            emotion_analysis = {}
-            if emotion_data:
-                emotion_analysis = self.analyze_emotion_pattern(
-                    emotion_data.get("dominant_emotion", "belirsiz"),
-                    emotion_data.get("intensity", 3)
+            # Akut krizde hızlı yol atlanır; agent yanıtı kriz kaynaklarının ardından gelir.
+            decision = None if crisis.is_acute else self._classify_intent(user_input, emotion_data)
+            if decision is not None:
+                return self._fast_path_turn(user_input, emotion_data, session, decision)
+            deadline = self._new_deadline()
+            plan_steps, plan_instructions_for_ai = self._analyze_and_plan(user_input, emotion_data, session, crisis)
+            retrieval_topics = self._route_topics(emotion_data)
+            guard = self._deadline_guard(deadline)
+            try:
+                retrieved_context = self._retrieve_within(user_input, retrieval_topics, deadline)
+                agent_inputs = self._build_agent_inputs(user_input, plan_instructions_for_ai, retrieved_context, session)
+                # 3. Adım: Oluşturduğun planı invoke metoduna gönder
+                output = self._invoke_agent(agent_inputs, deadline, guard)
+            except DeadlineExceeded as e:
+                return self._deadline_turn(user_input, emotion_data, session, plan_steps, retrieval_topics,
+                                           e, guard, crisis)
+            return self._finish_turn(user_input, output, session, plan_steps, retrieval_topics, crisis=crisis)
+        except Exception as e:
+            return self._error_result(e, crisis)
+
+    def stream_user_input(self, user_input: str, emotion_data: Dict = None,
+                          session: Optional[AgentSession] = None) -> Iterator[Dict[str, Any]]:
+        """
+        process_user_input'un akış (streaming) sürümü. Agent ayrı bir iş parçacığında
+        çalışırken üretilen olayları sırayla döndürür (bkz. agents/streaming.py):
+        LLM token'ları, araç başlangıç/bitişleri ve en sonda process_user_input ile
+        aynı biçimdeki sonucu taşıyan "done" olayı. Oturum belleği yanıt tamamlanınca güncellenir.
+        Akut krizde kriz kaynakları, LLM beklenmeden ilk olay ("crisis") olarak gönderilir.
+        """
+        session = self._session(session)
+        with session.lock:
+            session.touch()
+            started = time.perf_counter()
+            crisis = self._assess_crisis(user_input, session)
+            try:
+                decision = None
+                if crisis.is_acute:
+                    yield {"type": EVENT_CRISIS, "text": self._crisis_resources(user_input)}
+                else:
+                    decision = self._classify_intent(user_input, emotion_data)
+                if decision is not None:
+                    yield {"type": EVENT_TOOL_START, "name": decision.route.tool_name, "input": user_input}
+                    result = self._fast_path_turn(user_input, emotion_data, session, decision)
+                    yield {"type": EVENT_TOOL_END, "name": decision.route.tool_name}
+                    if result["success"]:
+                        yield {"type": EVENT_TOKEN, "text": result["response"]}
+                    self._record_route(result, started)
+                    yield {"type": EVENT_DONE, "result": result}
+                    return
+                deadline = self._new_deadline()
+                plan_steps, plan_instructions_for_ai = self._analyze_and_plan(user_input, emotion_data, session, crisis)
+                retrieval_topics = self._route_topics(emotion_data)
+                retrieved_context = self._retrieve_within(user_input, retrieval_topics, deadline)
+                agent_inputs = self._build_agent_inputs(user_input, plan_instructions_for_ai, retrieved_context, session)
+                if deadline is not None:
+                    deadline.check(STAGE_RETRIEVAL)
+            except DeadlineExceeded as e:
+                result = self._deadline_turn(user_input, emotion_data, session, plan_steps, retrieval_topics, e,
+                                             None, crisis)
+                yield {"type": EVENT_TOKEN, "text": result["response"]}
+                self._record_route(result, started)
+                yield {"type": EVENT_DONE, "result": result}
+                return
+            except Exception as e:
+                yield {"type": EVENT_DONE, "result": self._error_result(e, crisis)}
+                return
+
+            events: "queue.Queue" = queue.Queue()
+            handler = QueueCallbackHandler(events)
+            guard = self._deadline_guard(deadline)
+            callbacks = [handler] if guard is None else [handler, guard]
+            outcome: Dict[str, Any] = {}
+
+            def run_agent():
+                try:
+                    outcome["response"] = self.agent_executor.invoke(agent_inputs, config={"callbacks": callbacks})
+                except Exception as e:
+                    outcome["error"] = e
+                finally:
+                    handler.finish()
+
+            worker = threading.Thread(target=run_agent, name="agent-stream", daemon=True)
+            worker.start()
+            while True:
+                try:
+                    event = events.get(timeout=deadline.remaining() if deadline is not None else None)
+                except queue.Empty:
+                    # Bütçe bitti; yürütme arka planda bir sonraki adımda durur.
+                    guard.abandon()
+                    outcome["error"] = deadline.exceeded(guard.stage)
+                    break
+                if is_end_of_stream(event):
+                    worker.join()
+                    break
+                yield event
+
+            if isinstance(outcome.get("error"), DeadlineExceeded):
+                result = self._deadline_turn(user_input, emotion_data, session, plan_steps, retrieval_topics,
+                                             outcome["error"], guard, crisis)
+                yield {"type": EVENT_TOKEN, "text": result["response"]}
+            elif "error" in outcome:
+                result = self._error_result(outcome["error"], crisis)
+            else:
+                result = self._finish_turn(
+                    user_input, outcome["response"]["output"], session, plan_steps, retrieval_topics, crisis=crisis
+                )
+            self._record_route(result, started)
+            yield {"type": EVENT_DONE, "result": result}
+
+    async def aprocess_user_input(self, user_input: str, emotion_data: Dict = None,
+                                  session: Optional[AgentSession] = None, timeout: Optional[float] = None,
+                                  persist: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None) -> Dict[str, Any]:
+        """
+        process_user_input'un asenkron sürümü. RAG araması (iş parçacığında) yerel duygu
+        analizi ve planlama ile eşzamanlı yürür; LLM çağrısı asenkron yapılır.
+
+        - timeout: Tüm tur için saniye cinsinden süre sınırı; aşılırsa hata sonucu döner.
+        - persist: Başarılı sonuçla çağrılan asenkron kayıt fonksiyonu (örn. Firestore
+          yazmaları). Yanıtı bekletmemek için arka plan görevi olarak başlatılır;
+          wait_for_background_tasks() ile beklenebilir.
+        Çağıran görev iptal edilirse (asyncio.CancelledError) devam eden arama da iptal edilir.
+        """
+        session = self._session(session)
+        async with session.async_lock:
+            session.touch()
+            started = time.perf_counter()
+            # Süre sınırından bağımsız: kriz taraması yereldir ve mikro saniyeler sürer.
+            crisis = self._assess_crisis(user_input, session)
+            try:
+                result = await asyncio.wait_for(
+                    self._aprocess_user_input(user_input, emotion_data, session, crisis), timeout=timeout
                 )
+            except asyncio.TimeoutError:
+                return self._error_result(TimeoutError(f"Yanıt {timeout} saniye içinde oluşturulamadı."), crisis)
+            self._record_route(result, started)
+        if persist is not None and result.get("success"):
+            self._start_background_task(persist(result))
+        return result
 
-            # --- BU BLOK ÖNEMLİ! ---
-            # 1. Adım: Plan adımlarını oluştur
-            plan_steps = self.create_multi_step_plan(user_input, emotion_analysis)
-            
-            # 2. Adım: Bu adımları LLM'in anlayacağı bir metne dönüştür
-            plan_instructions_for_ai = (
-                "Follow these steps to construct your response:\n" +
-                "\n".join(f"- {step}" for step in plan_steps)
+    async def _aprocess_user_input(self, user_input: str, emotion_data: Optional[Dict],
+                                   session: AgentSession, crisis: CrisisAssessment) -> Dict[str, Any]:
+        retrieval_task = None
+        try:
+            decision = None if crisis.is_acute else self._classify_intent(user_input, emotion_data)
+            if decision is not None:
+                return await asyncio.to_thread(self._fast_path_turn, user_input, emotion_data, session, decision)
+            deadline = self._new_deadline()
+            plan_steps: List[str] = []
+            retrieval_topics = self._route_topics(emotion_data)
+            # Arama iş parçacığında başlar, yerel analiz ve planlama bu sırada yapılır.
+            retrieval_task = asyncio.create_task(
+                asyncio.to_thread(self._retrieve_context, user_input, retrieval_topics)
             )
-            # --- BLOK SONU ---
-
-            retrieved_context = self.retriever.get_relevant_documents(user_input) if self.retriever else ""
-            chat_history_value = self.memory.chat_memory.messages
-            
-            # 3. Adım: Oluşturduğun planı invoke metoduna gönder
-            response = self.agent_executor.invoke({
-                "input": user_input, 
-                "plan_instructions_for_ai": plan_instructions_for_ai, # <<< EKSİK OLAN DEĞİŞKEN BURADA
-                "current_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "context": retrieved_context,
-                "chat_history": chat_history_value
-            })
-            
-            return {
-                "success": True, "response": response["output"], "plan_steps": plan_steps, 
-            }
+            plan_steps, plan_instructions_for_ai = self._analyze_and_plan(user_input, emotion_data, session, crisis)
+            guard = self._deadline_guard(deadline)
+            try:
+                retrieved_context = await self._await_within(retrieval_task, deadline, STAGE_RETRIEVAL)
+                agent_inputs = self._build_agent_inputs(user_input, plan_instructions_for_ai, retrieved_context, session)
+                if deadline is not None:
+                    deadline.check(STAGE_RETRIEVAL)
+                response = await self._await_within(
+                    self.agent_executor.ainvoke(agent_inputs, config={"callbacks": [guard] if guard else []}),
+                    deadline, lambda: guard.stage,
+                )
+            except DeadlineExceeded as e:
+                return self._deadline_turn(user_input, emotion_data, session, plan_steps, retrieval_topics,
+                                           e, guard, crisis)
+            return self._finish_turn(user_input, response["output"], session, plan_steps, retrieval_topics,
+                                     crisis=crisis)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            print(f"Hata oluştu: {e}")
-            return {
-                "success": False, "error": str(e),
-                "fallback_response": "Üzgünüm, şu anda teknik bir sorun yaşıyorum. Lütfen tekrar deneyin."
-            }
-
-    def _get_memory_summary(self) -> str:
-        messages = self.memory.chat_memory.messages
+            return self._error_result(e, crisis)
+        finally:
+            if retrieval_task is not None and not retrieval_task.done():
+                retrieval_task.cancel()
+
+    @staticmethod
+    async def _await_within(awaitable: Awaitable[Any], deadline: Optional[TurnDeadline], stage) -> Any:
+        """Bütçe içinde bekler; süre dolarsa işi iptal edip DeadlineExceeded fırlatır."""
+        if deadline is None:
+            return await awaitable
+        task = asyncio.ensure_future(awaitable)
+        try:
+            # wait_for'dan farklı olarak iptalin tamamlanması beklenmez; iş parçacığındaki
+            # bir çağrı sürse bile tur bütçe dolduğunda döner.
+            done, _pending = await asyncio.wait({task}, timeout=deadline.remaining())
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if not done:
+            task.cancel()
+            raise deadline.exceeded(stage() if callable(stage) else stage)
+        return task.result()
+
+    def _start_background_task(self, coroutine: Awaitable[Any]):
+        task = asyncio.ensure_future(coroutine)
+        # Görev referansı tutulmazsa çöp toplayıcı tamamlanmadan silebilir.
+        self._background_tasks.add(task)
+        task.add_done_callback(self._on_background_task_done)
+
+    def _on_background_task_done(self, task: "asyncio.Future"):
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"HATA: Arka plan kaydı başarısız oldu: {task.exception()}")
+
+    async def wait_for_background_tasks(self, timeout: Optional[float] = None):
+        """Bekleyen arka plan kayıtlarının bitmesini bekler (örn. kapanışta)."""
+        if self._background_tasks:
+            await asyncio.wait(set(self._background_tasks), timeout=timeout)
+
+    def _analyze_and_plan(self, user_input: str, emotion_data: Optional[Dict], session: AgentSession,
+                          crisis: Optional[CrisisAssessment] = None):
+        emotion_analysis = {}
+        if emotion_data:
+            emotion_analysis = self._analyze_form_emotion(emotion_data, session, crisis)
+        elif crisis is not None and crisis.is_crisis:
+            emotion_analysis = {"crisis_risk": "high"}
+
+        # --- BU BLOK ÖNEMLİ! ---
+        # 1. Adım: Plan adımlarını oluştur
+        plan_steps = self.create_multi_step_plan(user_input, emotion_analysis)
+        
+        # 2. Adım: Bu adımları LLM'in anlayacağı bir metne dönüştür
+        plan_instructions_for_ai = (
+            "Follow these steps to construct your response:\n" +
+            "\n".join(f"- {step}" for step in plan_steps)
+        )
+        # --- BLOK SONU ---
+        return plan_steps, plan_instructions_for_ai
+
+    def _route_topics(self, emotion_data: Optional[Dict]) -> List[str]:
+        # Formdaki duygu/ihtiyaç seçimine göre aramayı ilgili konulara daralt
+        return route_topics(
+            emotion_data.get("selected_emotion"), emotion_data.get("needs")
+        ) if emotion_data else []
+
+    def _retrieve_context(self, user_input: str, retrieval_topics: List[str]) -> str:
+        retrieved_documents = self._retrieve_documents(user_input, retrieval_topics)
+        return pack_context(
+            user_input, retrieved_documents, token_budget=self.context_token_budget
+        )
+
+    def _retrieve_within(self, user_input: str, retrieval_topics: List[str], deadline: Optional[TurnDeadline]) -> str:
+        """
+        RAG aramasını tur bütçesi içinde yapar (senkron yol için _await_within karşılığı).
+        Arama bir iş parçacığında yürür; bütçe dolunca beklemeden DeadlineExceeded
+        fırlatılır, geç biten aramanın sonucu kullanılmaz.
+        """
+        if deadline is None:
+            return self._retrieve_context(user_input, retrieval_topics)
+        outcome: Dict[str, Any] = {}
+
+        def run_retrieval():
+            try:
+                outcome["context"] = self._retrieve_context(user_input, retrieval_topics)
+            except Exception as e:
+                outcome["error"] = e
+
+        worker = threading.Thread(target=run_retrieval, name="rag-retrieval", daemon=True)
+        worker.start()
+        worker.join(deadline.remaining())
+        if worker.is_alive():
+            raise deadline.exceeded(STAGE_RETRIEVAL)
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["context"]
+
+    def _build_agent_inputs(self, user_input: str, plan_instructions_for_ai: str, retrieved_context: str,
+                            session: AgentSession) -> Dict[str, Any]:
+        # Özetleyen bellekte: [önceki konuşmaların özeti] + son turlar
+        chat_history_value = session.memory.load_memory_variables({})["chat_history"]
+        return {
+            "input": user_input, 
+            "plan_instructions_for_ai": plan_instructions_for_ai, # <<< EKSİK OLAN DEĞİŞKEN BURADA
+            "current_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "context": retrieved_context,
+            "chat_history": chat_history_value
+        }
+
+    def _finish_turn(self, user_input: str, output: str, session: AgentSession,
+                     plan_steps: List[str], retrieval_topics: List[str], route: str = AGENT_ROUTE,
+                     crisis: Optional[CrisisAssessment] = None) -> Dict[str, Any]:
+        acute = crisis is not None and crisis.is_acute
+        if acute:
+            # Kriz kaynakları yanıtın başında kalır; agent yanıtı (varsa) ardından gelir.
+            # Tur agent rotasında sayılır (hızlı yol oranını şişirmesin); işaret result["crisis"]'da.
+            output = "\n\n".join(part for part in (self._crisis_resources(user_input), output) if part)
+        session.memory.save_context({"input": user_input}, {"output": output})
+        result = {
+            "success": True, "response": output, "plan_steps": plan_steps,
+            "retrieval_topics": retrieval_topics, "route": route,
+        }
+        if acute:
+            result["crisis"] = crisis.as_dict()
+        return result
+
+    # --- Tur bütçesi ---
+    def _new_deadline(self) -> Optional[TurnDeadline]:
+        return TurnDeadline(self.turn_budget_seconds) if self.turn_budget_seconds else None
+
+    @staticmethod
+    def _deadline_guard(deadline: Optional[TurnDeadline]) -> Optional[DeadlineCallbackHandler]:
+        return DeadlineCallbackHandler(deadline) if deadline is not None else None
+
+    def _invoke_agent(self, agent_inputs: Dict[str, Any], deadline: Optional[TurnDeadline],
+                      guard: Optional[DeadlineCallbackHandler]) -> str:
+        """
+        Agent'ı tur bütçesi içinde çalıştırıp yanıt metnini döndürür. Yürütme bir iş
+        parçacığında yapılır; bütçe dolunca beklemeden DeadlineExceeded fırlatılır ve
+        yürütme bir sonraki LLM/araç adımında kendiliğinden durur.
+        """
+        if deadline is None:
+            return self.agent_executor.invoke(agent_inputs)["output"]
+        deadline.check(STAGE_RETRIEVAL)
+        outcome: Dict[str, Any] = {}
+
+        def run_agent():
+            try:
+                outcome["response"] = self.agent_executor.invoke(agent_inputs, config={"callbacks": [guard]})
+            except Exception as e:
+                outcome["error"] = e
+
+        worker = threading.Thread(target=run_agent, name="agent-turn", daemon=True)
+        worker.start()
+        worker.join(deadline.remaining())
+        if worker.is_alive():
+            guard.abandon()
+            raise deadline.exceeded(guard.stage)
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["response"]["output"]
+
+    def _deadline_turn(self, user_input: str, emotion_data: Optional[Dict], session: AgentSession,
+                       plan_steps: List[str], retrieval_topics: List[str], error: DeadlineExceeded,
+                       guard: Optional[DeadlineCallbackHandler], crisis: CrisisAssessment) -> Dict[str, Any]:
+        """Bütçe tükendiğinde o ana kadar toplanan araç çıktısı ve şablonlarla en iyi yanıtı oluşturur."""
+        print(f"UYARI: {error}")
+        with self._budget_lock:
+            self._budget_exhausted[error.stage] = self._budget_exhausted.get(error.stage, 0) + 1
+        best = guard.best_tool_output() if guard is not None else None
+        if crisis.is_acute:
+            # Kriz kaynakları _finish_turn'de ekleniyor; şablonla ikinci kez tekrarlanmaz.
+            response = ""
+        else:
+            if crisis.is_crisis:
+                tool_output = provide_crisis_resources(user_input)
+            elif best is not None:
+                tool_output = best[1]
+            else:
+                tool_output = self._fallback_tool_output(user_input)
+            response = template_response(tool_output, emotion_data)
+        result = self._finish_turn(user_input, response, session, plan_steps, retrieval_topics, crisis=crisis)
+        result["deadline"] = {
+            "stage": error.stage, "elapsed_seconds": round(error.elapsed, 2),
+            "budget_seconds": error.budget, "partial": True,
+        }
+        return result
+
+    def _fallback_tool_output(self, user_input: str) -> str:
+        categories = match_categories(user_input)
+        tool_name = next(
+            (name for category, name in FALLBACK_TOOL_BY_CATEGORY if category in categories), DEFAULT_FALLBACK_TOOL
+        )
+        return self._tools_by_name[tool_name].func(user_input)
+
+    # --- Yerel kriz algılama ---
+    def _assess_crisis(self, user_input: str, session: AgentSession) -> CrisisAssessment:
+        """Mesajı yerel kriz sözlüğüyle tarar; risk bulunursa kullanıcı profiline işler."""
+        crisis = detect_crisis(user_input)
+        if crisis.is_crisis:
+            session.user_profile["crisis_indicators"].append({
+                "level": crisis.level, "matches": crisis.matches, "timestamp": datetime.now().isoformat()
+            })
+        return crisis
+
+    @staticmethod
+    def _crisis_resources(user_input: str) -> str:
+        """Akut krizde LLM beklenmeden gösterilen sabit açılış ve kriz kaynakları."""
+        return "{}\n{}".format(CRISIS_RESPONSE_OPENING, provide_crisis_resources(user_input).strip("\n"))
+
+    # --- Hızlı yol (agent döngüsü olmadan tek araç) ---
+    def _classify_intent(self, user_input: str, emotion_data: Optional[Dict]) -> Optional[IntentDecision]:
+        """Hızlı yola uygun, güvenli bir rota varsa kararı; yoksa None döndürür."""
+        if self.intent_router is None:
+            return None
+        decision = self.intent_router.classify(user_input, emotion_data)
+        if decision.route is None or decision.route.tool_name not in self._tools_by_name:
+            return None
+        return decision
+
+    def _fast_path_turn(self, user_input: str, emotion_data: Optional[Dict], session: AgentSession,
+                        decision: IntentDecision) -> Dict[str, Any]:
+        if emotion_data:
+            # Duygu profili hızlı yolda da güncel kalmalı
+            self._analyze_form_emotion(emotion_data, session)
+        tool_output = self._tools_by_name[decision.route.tool_name].run(user_input)
+        response = self._wrap_tool_output(user_input, tool_output, emotion_data)
+        return self._finish_turn(user_input, response, session, [], [], route=decision.route_name)
+
+    def _wrap_tool_output(self, user_input: str, tool_output: str, emotion_data: Optional[Dict]) -> str:
+        if self.fast_path_wrap == "llm":
+            try:
+                opener = str(self.llm.invoke(
+                    "Kullanıcı bir duygusal destek asistanına şunu yazdı: \"" + user_input + "\". "
+                    "Ona aşağıdaki öneriyi sunmadan önce söylenecek, içten ve empatik 1-2 cümlelik "
+                    "Türkçe bir giriş yaz. Soru sorma, yalnızca girişi döndür."
+                ).content).strip()
+                if opener:
+                    return "{}\n{}".format(opener, tool_output.strip("\n"))
+            except Exception as e:
+                print(f"UYARI: Hızlı yol girişi oluşturulamadı, şablon kullanılıyor: {e}")
+        return template_response(tool_output, emotion_data)
+
+    def _record_route(self, result: Dict[str, Any], started: float):
+        if self.intent_router is not None and result.get("success"):
+            self.intent_router.record(result.get("route", AGENT_ROUTE), time.perf_counter() - started)
+
+    def get_routing_report(self) -> Dict[str, Any]:
+        """Rota başına isabet oranları, hızlı yolun kazandırdığı tahmini süre ve bütçe aşımları."""
+        report = self.intent_router.report() if self.intent_router is not None else {}
+        with self._budget_lock:
+            report["budget_exhausted_by_stage"] = dict(self._budget_exhausted)
+        return report
+
+    def get_llm_client_report(self) -> Dict[str, Any]:
+        """LLM istemcisinin kuyruk/gecikme metrikleri ve devre kesici durumu."""
+        return self.llm.report() if isinstance(self.llm, ResilientChatModel) else {}
+
+    def _error_result(self, error: Exception, crisis: Optional[CrisisAssessment] = None) -> Dict[str, Any]:
+        print(f"Hata oluştu: {error}")
+        if isinstance(error, (CircuitOpenError, OverloadedError)):
+            # İstek üst sisteme hiç gönderilmedi; kesinti veya yoğunluk sırasında hızlı dönüş
+            fallback_response = "Üzgünüm, şu anda çok yoğunum. Birkaç dakika sonra tekrar dener misin?"
+        else:
+            fallback_response = "Üzgünüm, şu anda teknik bir sorun yaşıyorum. Lütfen tekrar deneyin."
+        if crisis is not None and crisis.is_crisis:
+            # Risk ifadesi içeren bir mesaj teknik hatada bile kaynaksız kalmamalı
+            fallback_response = "{}\n\n{}\n{}".format(
+                fallback_response, CRISIS_RESPONSE_OPENING, provide_crisis_resources("").strip("\n")
+            )
+        return {
+            "success": False, "error": str(error), "error_type": type(error).__name__,
+            "fallback_response": fallback_response,
+        }
+
+    def summarize_conversation(self, previous_summary: str, messages: List[Any]) -> str:
+        """Önceki özeti, özete katılacak yeni turlarla birlikte güncelleyip kısa bir özet döndürür."""
+        prompt = (
+            "Aşağıda bir duygusal destek asistanı ile kullanıcı arasındaki konuşmanın mevcut özeti ve "
+            "yeni konuşma satırları var. Özeti yeni satırlarla güncelle. Kullanıcının yaşadığı durumları, "
+            "duygularını, önemli kişileri ve işe yarayan/yaramayan önerileri koru; en fazla 120 kelimelik, "
+            "Türkçe, üçüncü şahıs bir metin yaz. Yalnızca özeti döndür.\n\n"
+            f"Mevcut özet:\n{previous_summary or '(yok)'}\n\nYeni satırlar:\n{format_transcript(messages)}"
+        )
+        return str(self.llm.invoke(prompt).content).strip()
+
+    def _retrieve_documents(self, user_input: str, topics: List[str]) -> List[Any]:
+        if not self.retriever:
+            return []
+        if topics and getattr(self.retriever, "supports_topic_filter", False):
+            return self.retriever.invoke(user_input, topics=topics)
+        return self.retriever.get_relevant_documents(user_input)
+
+    def _get_memory_summary(self, session: Optional[AgentSession] = None) -> str:
+        messages = self._session(session).memory.chat_memory.messages
         return f"Son {len(messages)} mesaj hafızada saklanıyor" if messages else "Henüz hafızada mesaj yok"
 
-    def clear_memory(self):
-        self.memory.clear()
-        self.user_profile["emotion_history"] = []
+    def clear_memory(self, session: Optional[AgentSession] = None):
+        session = self._session(session)
+        session.memory.clear()
+        session.user_profile["emotion_trend"].clear()
 
-    def get_user_profile_summary(self) -> Dict[str, Any]:
+    def get_user_profile_summary(self, session: Optional[AgentSession] = None) -> Dict[str, Any]:
+        session = self._session(session)
         return {
-            "total_conversations": len(self.memory.chat_memory.messages) // 2,
-            "emotion_history_count": len(self.user_profile["emotion_history"]),
-            "recent_emotions": self.user_profile["emotion_history"][-3:],
-            "memory_summary": self._get_memory_summary()
+            "total_conversations": len(session.memory.chat_memory.messages) // 2,
+            "emotion_history_count": session.user_profile["emotion_trend"].total,
+            "recent_emotions": session.user_profile["emotion_trend"].recent(3),
+            "memory_summary": self._get_memory_summary(session)
         }
\ No newline at end of file
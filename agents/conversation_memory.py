@@ -0,0 +1,292 @@
+# ai-emotion-support/agents/conversation_memory.py
+# Token bütçeli konuşma belleği: son turlar olduğu gibi tutulur, daha eskileri
+# artımlı olarak güncellenen bir özete katlanır. Özet kullanıcının Firestore
+# verisiyle birlikte saklanır (bkz. firebase_db.save_memory_summary); böylece
+# her oturumda tüm geçmiş yeniden özetlenmez ve istem boyutu kullanım süresinden
+# bağımsız olarak sabit kalır.
+#
+# Tur sırasında gereken katlama (LLM özeti + Firestore kaydı) yanıtı bekletmez:
+# ortak bir iş parçacığı havuzunda yürür. Katlama bitene kadar bu turlar istemde
+# olduğu gibi kalır; sonraki tur tamamlanmış en son özeti kullanır.
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from rag.context_packer import estimate_tokens
+
+# (önceki_özet, özete katılacak mesajlar) -> yeni özet
+Summarizer = Callable[[str, List[BaseMessage]], str]
+
+DEFAULT_MAX_RECENT_TURNS = 6
+DEFAULT_RECENT_TOKEN_BUDGET = 1200
+DEFAULT_SUMMARY_TOKEN_BUDGET = 300
+
+SUMMARY_PREFIX = "Kullanıcıyla önceki konuşmaların özeti:\n"
+
+# Arka plan katlamaları için tüm oturumların paylaştığı iş parçacığı sayısı.
+# Aynı belleğin katlamaları sırayla yapılır; farklı oturumlarınkiler eşzamanlı yürür.
+SUMMARY_FOLD_MAX_WORKERS = int(os.getenv("AGENT_SUMMARY_FOLD_WORKERS", "2"))
+
+_fold_executor: Optional[ThreadPoolExecutor] = None
+_fold_executor_lock = threading.Lock()
+
+
+def _get_fold_executor() -> ThreadPoolExecutor:
+    global _fold_executor
+    with _fold_executor_lock:
+        if _fold_executor is None:
+            _fold_executor = ThreadPoolExecutor(
+                max_workers=SUMMARY_FOLD_MAX_WORKERS, thread_name_prefix="summary-fold"
+            )
+        return _fold_executor
+
+
+def format_transcript(messages: List[BaseMessage]) -> str:
+    """Mesajları özetleyici için 'Kullanıcı: ... / Asistan: ...' satırlarına çevirir."""
+    lines = []
+    for message in messages:
+        speaker = "Kullanıcı" if isinstance(message, HumanMessage) else "Asistan"
+        lines.append("{}: {}".format(speaker, " ".join(str(message.content).split())))
+    return "\n".join(lines)
+
+
+def truncate_summary(summary: str, token_budget: int) -> str:
+    """Özeti token bütçesine indirir; en yeni bilgiyi korumak için baştan kırpar."""
+    max_chars = int(token_budget * 3.5)
+    if len(summary) <= max_chars:
+        return summary
+    cut = summary[-max_chars:]
+    newline = cut.find("\n")
+    return cut[newline + 1:] if 0 <= newline < max_chars // 2 else cut
+
+
+def extractive_summary(previous_summary: str, messages: List[BaseMessage], token_budget: int) -> str:
+    """
+    LLM kullanmayan yedek özetleyici: kullanıcının söylediklerinin kısaltılmış
+    hâllerini önceki özete ekler ve sonucu bütçeye sığdırır.
+    """
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            text = " ".join(str(message.content).split())
+            lines.append("- Kullanıcı: " + (text[:200] + " …" if len(text) > 200 else text))
+    return truncate_summary("\n".join(lines), token_budget)
+
+
+class RollingSummaryMemory:
+    """
+    ConversationBufferMemory'nin agent tarafından kullanılan yüzeyiyle uyumlu
+    (chat_memory, save_context, load_memory_variables, clear) özetleyen bellek.
+
+    Son turlar `max_recent_turns` tur ve `recent_token_budget` token sınırı içinde
+    kelimesi kelimesine tutulur. Sınır aşılınca en eski turlar, bütçenin yarısına
+    inilene kadar bir kerede özete katlanır; böylece özetleyici her turda değil,
+    birkaç turda bir çağrılır. Özet değiştiğinde `on_summary_updated(state)` çağrılır.
+
+    `background=True` iken save_context'in tetiklediği katlama arka planda yapılır
+    ve on_summary_updated o iş parçacığından çağrılır; katlanmayı bekleyen turlar
+    load_memory_variables'ta özetin ardından olduğu gibi döner. load_history'deki
+    katlama oturum açılışında yapıldığı için eşzamanlıdır.
+    """
+
+    memory_key = "chat_history"
+
+    def __init__(self, summarizer: Optional[Summarizer] = None,
+                 max_recent_turns: int = DEFAULT_MAX_RECENT_TURNS,
+                 recent_token_budget: int = DEFAULT_RECENT_TOKEN_BUDGET,
+                 summary_token_budget: int = DEFAULT_SUMMARY_TOKEN_BUDGET,
+                 on_summary_updated: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 background: bool = True):
+        self.summarizer = summarizer
+        self.max_recent_turns = max(1, max_recent_turns)
+        self.recent_token_budget = recent_token_budget
+        self.summary_token_budget = summary_token_budget
+        self.on_summary_updated = on_summary_updated
+        self.chat_memory = InMemoryChatMessageHistory()
+        self.summary = ""
+        # Özete katlanmış tur sayısı; kayıtlı konuşmaların ilk kaç tanesinin
+        # özette temsil edildiğini gösterir.
+        self.summarized_turns = 0
+        self.background = background
+        # summary/summarized_turns ve katlama kuyruğu arka plan iş parçacığıyla paylaşılır
+        self._lock = threading.RLock()
+        # Katlanmayı bekleyen (mesajlar, tur sayısı) grupları, eskiden yeniye
+        self._pending_folds: List[Tuple[List[BaseMessage], int]] = []
+        self._folding = False
+        self._fold_future = None
+        # clear() ile artar; eski kuşağın bitmekte olan katlaması sonucu uygulamaz
+        self._generation = 0
+
+    # --- Durum ---
+    def state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"summary": self.summary, "summarized_turns": self.summarized_turns}
+
+    def load_history(self, conversations: List[dict], state: Optional[Dict[str, Any]] = None,
+                     offset: Optional[int] = 0):
+        """
+        Kayıtlı özet durumunu ve konuşmaları yükler. Özetin kapsamadığı turlardan
+        yalnızca son `max_recent_turns` tanesi olduğu gibi tutulur; aradakiler
+        (varsa) tek bir özetleyici çağrısıyla özete eklenir.
+
+        `conversations` geçmişin yalnızca son kısmı olabilir; `offset` ilk kaydın
+        tüm geçmişteki sırasıdır. Bilinmiyorsa (None) özetin önceki turları
+        kapsadığı varsayılır ve yalnızca son turlar yüklenir.
+        """
+        self.clear()
+        state = state or {}
+        self.summary = state.get("summary", "") or ""
+        summarized = int(state.get("summarized_turns", 0) or 0)
+        if offset is None:
+            self.summarized_turns = summarized
+            pending = conversations[-self.max_recent_turns:]
+        else:
+            self.summarized_turns = min(summarized, offset + len(conversations))
+            pending = conversations[max(0, self.summarized_turns - offset):]
+            # Özetle yüklenen sayfa arasında boşluk varsa o turlar özette temsil edilemez
+            self.summarized_turns = max(self.summarized_turns, offset)
+        older, recent = pending[:-self.max_recent_turns], pending[-self.max_recent_turns:]
+        if older:
+            self._fold([message for entry in older for message in _entry_messages(entry)], len(older))
+        for entry in recent:
+            self.chat_memory.add_messages(_entry_messages(entry))
+        self._compact()
+
+    def clear(self):
+        self.chat_memory.clear()
+        with self._lock:
+            self.summary = ""
+            self.summarized_turns = 0
+            self._pending_folds.clear()
+            self._folding = False
+            self._generation += 1
+
+    # --- ConversationBufferMemory uyumlu arayüz ---
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, Any]):
+        self.chat_memory.add_messages([HumanMessage(content=inputs["input"]), AIMessage(content=outputs["output"])])
+        self._compact()
+
+    def load_memory_variables(self, inputs: Optional[Dict[str, Any]] = None) -> Dict[str, List[BaseMessage]]:
+        messages: List[BaseMessage] = []
+        with self._lock:
+            if self.summary:
+                messages.append(SystemMessage(content=SUMMARY_PREFIX + self.summary))
+            for folding, _turns in self._pending_folds:
+                messages.extend(folding)
+        messages.extend(self.chat_memory.messages)
+        return {self.memory_key: messages}
+
+    # --- Özetleme ---
+    def _recent_tokens(self) -> int:
+        return sum(estimate_tokens(str(message.content)) for message in self.chat_memory.messages)
+
+    def _compact(self):
+        messages = self.chat_memory.messages
+        turns = len(messages) // 2
+        if turns <= self.max_recent_turns and self._recent_tokens() <= self.recent_token_budget:
+            return
+        # Histerezis: bütçenin/tur sınırının yarısına inene kadar en eski turları katla
+        target_turns = max(1, self.max_recent_turns // 2)
+        target_tokens = self.recent_token_budget // 2
+        fold_turns = 0
+        remaining_tokens = self._recent_tokens()
+        while turns - fold_turns > 1 and (
+            turns - fold_turns > target_turns or remaining_tokens > target_tokens
+        ):
+            for message in messages[2 * fold_turns: 2 * fold_turns + 2]:
+                remaining_tokens -= estimate_tokens(str(message.content))
+            fold_turns += 1
+        if not fold_turns:
+            return
+        folded, kept = messages[: 2 * fold_turns], messages[2 * fold_turns:]
+        self.chat_memory.clear()
+        self.chat_memory.add_messages(kept)
+        if self.background:
+            self._schedule_fold(folded, fold_turns)
+        else:
+            self._fold(folded, fold_turns)
+
+    def _summarize(self, previous_summary: str, messages: List[BaseMessage]) -> str:
+        summary = None
+        if self.summarizer is not None:
+            try:
+                summary = self.summarizer(previous_summary, messages)
+            except Exception as e:
+                print(f"UYARI: Konuşma özeti güncellenemedi, basit özet kullanılıyor: {e}")
+        if not summary:
+            summary = extractive_summary(previous_summary, messages, self.summary_token_budget)
+        return truncate_summary(summary.strip(), self.summary_token_budget)
+
+    def _fold(self, messages: List[BaseMessage], turn_count: int):
+        self._apply_fold(self._summarize(self.summary, messages), turn_count, self._generation, 0)
+
+    def _apply_fold(self, summary: str, turn_count: int, generation: int, folded_groups: int) -> bool:
+        """Özeti uygular ve katlanan grupları kuyruktan düşer; bellek bu arada temizlendiyse False."""
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self.summary = summary
+            self.summarized_turns += turn_count
+            del self._pending_folds[:folded_groups]
+            state = self.state()
+        if self.on_summary_updated is not None:
+            try:
+                self.on_summary_updated(state)
+            except Exception as e:
+                print(f"UYARI: Konuşma özeti kaydedilemedi: {e}")
+        return True
+
+    # --- Arka plan katlama ---
+    def _schedule_fold(self, messages: List[BaseMessage], turn_count: int):
+        with self._lock:
+            self._pending_folds.append((messages, turn_count))
+            if self._folding:
+                # Çalışan katlama kuyruğu boşaltırken bu grubu da alır
+                return
+            self._folding = True
+            self._fold_future = _get_fold_executor().submit(self._drain_folds, self._generation)
+
+    def _drain_folds(self, generation: int):
+        try:
+            self._drain_fold_queue(generation)
+        except Exception as e:
+            print(f"HATA: Arka plan özet katlaması başarısız oldu: {e}")
+            with self._lock:
+                if generation == self._generation:
+                    self._folding = False
+
+    def _drain_fold_queue(self, generation: int):
+        """Kuyruktaki tüm grupları tek özetleyici çağrısıyla katlar; bu sırada gelenler için tekrarlar."""
+        while True:
+            with self._lock:
+                if generation != self._generation:
+                    return
+                if not self._pending_folds:
+                    self._folding = False
+                    return
+                groups = list(self._pending_folds)
+                previous_summary = self.summary
+            messages = [message for group, _turns in groups for message in group]
+            summary = self._summarize(previous_summary, messages)
+            if not self._apply_fold(summary, sum(turns for _group, turns in groups), generation, len(groups)):
+                return
+
+    def wait_for_summary(self, timeout: Optional[float] = None) -> bool:
+        """Arka plandaki katlamanın bitmesini bekler (örn. testler, kapanış); süre dolarsa False."""
+        while True:
+            with self._lock:
+                if not self._folding:
+                    return True
+                future = self._fold_future
+            try:
+                future.result(timeout=timeout)
+            except FutureTimeoutError:
+                return False
+
+
+def _entry_messages(entry: dict) -> List[BaseMessage]:
+    return [HumanMessage(content=entry["user_message"]), AIMessage(content=entry["ai_response"])]
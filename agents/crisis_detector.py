@@ -0,0 +1,258 @@
+# ai-emotion-support/agents/crisis_detector.py
+# Ağ çağrısından önce, kritik yolda çalışan yerel kriz algılayıcı.
+# Türkçe kriz sözlüğü açılışta tek bir düzenli ifadeye derlenir. Metin ve sözlük
+# Türkçe kurallarıyla küçük harfe çevrilip ASCII'ye indirgenir ("olmek istiyorum"
+# da yakalanır); her kelime ek almış hâlleriyle (kendimi öldür -> öldürmek,
+# öldüreceğim) ve aralarına en fazla iki kelime girerek eşleşir. Terimden sonra
+# gelen ek olumsuzsa ("kendimi öldürmeyeceğim", "intiharı düşünmüyorum") ya da
+# ifadenin ardından "değil" geliyorsa eşleşme sayılmaz.
+#
+# Seviyeler:
+#   acute    : açık intihar / kendine zarar verme niyeti -> kriz kaynakları LLM beklenmeden
+#              gösterilir, agent yanıtı ardından gelir
+#   elevated : umutsuzluk ifadeleri -> agent planında kriz riski yükseltilir
+#   none     : eşleşme yok
+#
+# Etiketli örnek seti ve mikro saniye cinsinden ölçüm için:
+#     python -m agents.crisis_detector
+import re
+import time
+from typing import Dict, List, Tuple
+
+from rag.text_normalize import ascii_fold
+
+LEVEL_NONE = "none"
+LEVEL_ELEVATED = "elevated"
+LEVEL_ACUTE = "acute"
+
+# Kelimeler arasında izin verilen en fazla ara kelime ("kendimi bu gece öldüreceğim")
+MAX_GAP_WORDS = 2
+
+# Her kelime, kendisiyle başlayan (ek almış) kelimelerle eşleşir. Bu yüzden kısa
+# ve başka kelimelerin başı olabilecek kökler ("kendimi as" -> "asla") yerine
+# çekimli hâller yazılmıştır. "intihar" ve "jilet" tek başına niyet bildirmez
+# ("arkadaşım intihar etti", "jiletle tıraş oldum"); yalnızca birinci şahıs
+# niyet içeren kalıplarla yer alır.
+ACUTE_TERMS = (
+    "intihar etmeyi düşün", "intihar etmeyi planl", "intiharı düşün",
+    "intihar etmek istiyor", "intihar etmek istedim", "intihar etmek isterim",
+    "intihar edeceğ", "intihar edesim",
+    "kendimi öldür",
+    "kendimi asmak", "kendimi asacağım", "kendimi asarım",
+    "canıma kıy",
+    "hayatıma son ver",
+    "ölmek istiyor", "ölmek istedim", "ölmek isterim", "ölmek isterdim",
+    "ölsem daha iyi", "ölmeyi düşünüyor", "ölmeyi planlı",
+    "yaşamak istemiyor", "yaşamak istemem",
+    "kendime zarar ver", "kendimi kesiyor", "kendimi kestim", "kendimi kesmek", "bileklerimi kes",
+    "jiletle kendimi", "kendimi jiletle",
+    "veda mektubu",
+    "bu dünyadan gitmek istiyor",
+    "kendimi köprüden", "kendimi camdan", "kendimi pencereden",
+)
+
+ELEVATED_TERMS = (
+    "umudum kalmadı", "umudum yok", "umutsuzum",
+    "yaşamanın anlamı yok", "yaşamanın bir anlamı yok", "hiçbir şeyin anlamı yok", "hayatın anlamı yok",
+    "her şeyi bitirmek istiyor",
+    "artık dayanamıyor", "daha fazla dayanamıyor",
+    "yok olmak istiyor", "kaybolup gitmek istiyor",
+    "bensiz daha iyi", "kimse beni özlemez", "kimse fark etmez",
+    "herkese yük oluyor", "yükten başka bir şey değil",
+    "uyuyup uyanmamak", "sonsuza kadar uyumak", "bir daha uyanmamak",
+    "çıkış yolu yok", "kurtuluş yok",
+)
+
+
+# Terimin son kelimesinden sonra gelen ek bunlardan biriyle başlıyorsa ifade
+# olumsuzdur: -mıyor/-miyor, -mayacak/-meyecek, -madı/-medi, -maz/-mez, -mam/-mem
+# (ASCII'ye indirgenmiş hâlleriyle).
+_NEGATION_SUFFIX = re.compile(r"m[aei](?:yor|y[ae]c|d|z|m)|m[iu]yor")
+# Olumsuzluk eki sanılabilecek gereklilik kuruluşu: "kendimi öldürmem lazım"
+_NECESSITY_WORDS = re.compile(r"\W+(?:lazim|gerek)")
+# İfadenin ardından gelen olumsuzluk: "intihar edecek değilim"
+_NEGATION_WORDS = re.compile(r"\W+degil")
+
+
+def _term_pattern(term: str) -> str:
+    words = ascii_fold(term).split()
+    gap = r"\W+(?:\w+\W+){0,%d}" % MAX_GAP_WORDS
+    return r"(?<!\w)" + gap.join(re.escape(word) + r"\w*" for word in words)
+
+
+def _compile(terms: Tuple[str, ...]) -> "re.Pattern":
+    return re.compile("|".join("(?P<t{}>{})".format(i, _term_pattern(term)) for i, term in enumerate(terms)))
+
+
+_ACUTE_PATTERN = _compile(ACUTE_TERMS)
+_ELEVATED_PATTERN = _compile(ELEVATED_TERMS)
+_LAST_WORDS = {
+    terms: tuple(ascii_fold(term).split()[-1] for term in terms) for terms in (ACUTE_TERMS, ELEVATED_TERMS)
+}
+
+
+class CrisisAssessment:
+    """Algılayıcının sonucu: seviye ve eşleşen sözlük terimleri."""
+
+    __slots__ = ("level", "matches")
+
+    def __init__(self, level: str, matches: List[str]):
+        self.level = level
+        self.matches = matches
+
+    @property
+    def is_acute(self) -> bool:
+        return self.level == LEVEL_ACUTE
+
+    @property
+    def is_crisis(self) -> bool:
+        return self.level != LEVEL_NONE
+
+    def as_dict(self) -> Dict[str, object]:
+        return {"level": self.level, "matches": list(self.matches)}
+
+    def __repr__(self):
+        return "CrisisAssessment(level={!r}, matches={!r})".format(self.level, self.matches)
+
+
+def _is_negated(match: "re.Match", last_word: str) -> bool:
+    """Eşleşmenin son kelimesi olumsuzluk eki almışsa ya da ardından "değil" geliyorsa True."""
+    suffix = re.split(r"\W+", match.group())[-1][len(last_word):]
+    rest = match.string[match.end():]
+    if _NEGATION_SUFFIX.match(suffix):
+        return not _NECESSITY_WORDS.match(rest)
+    return _NEGATION_WORDS.match(rest) is not None
+
+
+def _matched_terms(pattern: "re.Pattern", terms: Tuple[str, ...], text: str) -> List[str]:
+    last_words = _LAST_WORDS[terms]
+    matches = []
+    for match in pattern.finditer(text):
+        index = int(match.lastgroup[1:])
+        if not _is_negated(match, last_words[index]):
+            matches.append(terms[index])
+    return matches
+
+
+def detect_crisis(text: str) -> CrisisAssessment:
+    """Metni kriz sözlüğüne göre değerlendirir. Ağ çağrısı yapmaz; tipik mesajda mikro saniyeler sürer."""
+    folded = ascii_fold(text or "")
+    matches = _matched_terms(_ACUTE_PATTERN, ACUTE_TERMS, folded)
+    if matches:
+        return CrisisAssessment(LEVEL_ACUTE, matches)
+    matches = _matched_terms(_ELEVATED_PATTERN, ELEVATED_TERMS, folded)
+    if matches:
+        return CrisisAssessment(LEVEL_ELEVATED, matches)
+    return CrisisAssessment(LEVEL_NONE, [])
+
+
+# LLM'den bağımsız, anında gösterilen kriz yanıtının açılışı. Kaynak listesi
+# tools.provide_crisis_resources'tan eklenir.
+CRISIS_RESPONSE_OPENING = (
+    "Bunu benimle paylaştığın için teşekkür ederim. Şu anda yaşadıkların çok ağır olmalı ve "
+    "bu yükü tek başına taşımak zorunda değilsin.\n\n"
+    "**Eğer kendini şu anda güvende hissetmiyorsan lütfen hemen 112 Acil Çağrı Merkezi'ni ara** "
+    "ya da en yakın acil servise git. Güvendiğin birine, şimdi, nasıl hissettiğini söylemen de çok değerli."
+)
+
+
+# --- Etiketli örnek seti ---
+# (mesaj, beklenen seviye). Negatif örnekler, sözlük köklerine benzeyen ama kriz
+# içermeyen ifadeleri (olumsuzlama, "kesinlikle", "asla" vb.) özellikle içerir.
+LABELED_EXAMPLES: List[Tuple[str, str]] = [
+    ("Artık intihar etmeyi düşünüyorum", LEVEL_ACUTE),
+    ("intiharı düşündüğüm oluyor", LEVEL_ACUTE),
+    ("Kendimi öldürmek istiyorum", LEVEL_ACUTE),
+    ("bu gece kendimi gerçekten öldüreceğim", LEVEL_ACUTE),
+    ("ÖLMEK İSTİYORUM", LEVEL_ACUTE),
+    ("olmek istiyorum artik", LEVEL_ACUTE),
+    ("Bazen ölsem daha iyi olur diye düşünüyorum", LEVEL_ACUTE),
+    ("Yaşamak istemiyorum", LEVEL_ACUTE),
+    ("yasamak istemiyorum hicbir sey yolunda degil", LEVEL_ACUTE),
+    ("Canıma kıymayı düşünüyorum", LEVEL_ACUTE),
+    ("hayatıma son vermek istiyorum", LEVEL_ACUTE),
+    ("Dün gece kendime zarar verdim", LEVEL_ACUTE),
+    ("kendimi kesiyorum ve kimse bilmiyor", LEVEL_ACUTE),
+    ("Bileklerimi kesmeyi düşündüm", LEVEL_ACUTE),
+    ("Ailem için bir veda mektubu yazdım", LEVEL_ACUTE),
+    ("Kendimi köprüden atmak istiyorum", LEVEL_ACUTE),
+    ("Bazen kendimi jiletle kesiyorum", LEVEL_ACUTE),
+    ("Bu gece intihar edeceğim", LEVEL_ACUTE),
+    ("kendimi öldürmem lazım", LEVEL_ACUTE),
+    ("Umudum kalmadı", LEVEL_ELEVATED),
+    ("Hiçbir şeyin anlamı yok artık", LEVEL_ELEVATED),
+    ("yaşamanın bir anlamı yok gibi", LEVEL_ELEVATED),
+    ("Artık dayanamıyorum", LEVEL_ELEVATED),
+    ("Her şeyi bitirmek istiyorum", LEVEL_ELEVATED),
+    ("Sadece yok olmak istiyorum", LEVEL_ELEVATED),
+    ("Herkes bensiz daha iyi olurdu", LEVEL_ELEVATED),
+    ("Herkese yük oluyorum", LEVEL_ELEVATED),
+    ("Uyuyup uyanmamak istiyorum", LEVEL_ELEVATED),
+    ("Bu durumdan çıkış yolu yok", LEVEL_ELEVATED),
+    ("umutsuzum, ne yapacağımı bilmiyorum", LEVEL_ELEVATED),
+    ("Bugün kendimi çok yorgun hissediyorum", LEVEL_NONE),
+    ("Sınavlar yüzünden çok stresliyim", LEVEL_NONE),
+    ("Ölmek istemiyorum ama çok korkuyorum", LEVEL_NONE),
+    ("Kendimi kesinlikle daha iyi hissediyorum", LEVEL_NONE),
+    ("Kendimi asla yalnız hissetmek istemiyorum", LEVEL_NONE),
+    ("Bu iş beni öldürüyor, çok yoğunum", LEVEL_NONE),
+    ("Patronum yüzünden sinirden ölüyorum", LEVEL_NONE),
+    ("Nefes egzersizi öner", LEVEL_NONE),
+    ("Yaşamak için yeni bir şehre taşınmak istiyorum", LEVEL_NONE),
+    ("Umudumu kaybetmedim, sadece biraz yorgunum", LEVEL_NONE),
+    ("Gülmekten öldüm", LEVEL_NONE),
+    ("Meditasyon yaparken uyuyakaldım", LEVEL_NONE),
+    ("Arkadaşımla tartıştım ve çok üzgünüm", LEVEL_NONE),
+    ("Arkadaşım intihar etti", LEVEL_NONE),
+    ("Jiletle tıraş oldum", LEVEL_NONE),
+    ("kendimi öldürmeyeceğim", LEVEL_NONE),
+    ("İntihar etmeyi düşünmüyorum", LEVEL_NONE),
+    ("Kendime asla zarar vermem", LEVEL_NONE),
+    ("Kendime zarar verecek değilim, merak etme", LEVEL_NONE),
+]
+
+
+def evaluate(examples: List[Tuple[str, str]] = None) -> Dict[str, object]:
+    """Etiketli set üzerinde doğruluk, seviye başına duyarlılık ve hatalı örnekleri döndürür."""
+    examples = examples if examples is not None else LABELED_EXAMPLES
+    errors = []
+    per_level: Dict[str, List[int]] = {}
+    for text, expected in examples:
+        predicted = detect_crisis(text).level
+        stats = per_level.setdefault(expected, [0, 0])
+        stats[1] += 1
+        if predicted == expected:
+            stats[0] += 1
+        else:
+            errors.append({"text": text, "expected": expected, "predicted": predicted})
+    correct = sum(stats[0] for stats in per_level.values())
+    return {
+        "examples": len(examples),
+        "accuracy": round(correct / len(examples), 3) if examples else 0.0,
+        "recall": {level: round(hit / total, 3) for level, (hit, total) in sorted(per_level.items())},
+        "errors": errors,
+    }
+
+
+def benchmark(iterations: int = 2000, examples: List[Tuple[str, str]] = None) -> Dict[str, float]:
+    """Mesaj başına ortalama ve en kötü (p99) algılama süresini mikro saniye cinsinden ölçer."""
+    texts = [text for text, _level in (examples if examples is not None else LABELED_EXAMPLES)]
+    samples = []
+    for _ in range(iterations):
+        for text in texts:
+            started = time.perf_counter_ns()
+            detect_crisis(text)
+            samples.append(time.perf_counter_ns() - started)
+    samples.sort()
+    return {
+        "messages": len(samples),
+        "mean_us": round(sum(samples) / len(samples) / 1000.0, 2),
+        "p50_us": round(samples[len(samples) // 2] / 1000.0, 2),
+        "p99_us": round(samples[int(len(samples) * 0.99)] / 1000.0, 2),
+    }
+
+
+if __name__ == "__main__":
+    import json
+
+    print(json.dumps({"evaluation": evaluate(), "benchmark": benchmark()}, ensure_ascii=False, indent=2))
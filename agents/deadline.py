@@ -0,0 +1,124 @@
+# ai-emotion-support/agents/deadline.py
+# Tur başına gecikme bütçesi. AgentExecutor'ın max_iterations sınırı adım sayısını
+# sınırlar ama süreyi sınırlamaz; yavaş bir Gemini yanıtı veya araç döngüsü isteği
+# uzun süre bekletebilir. TurnDeadline turun kalan süresini tutar;
+# DeadlineCallbackHandler her LLM çağrısı ve araç çalıştırması başlamadan önce
+# bütçeyi kontrol eder, bütçe neredeyse bittiyse yeni adımı başlatmadan döngüyü
+# durdurur ve o ana kadar toplanan araç çıktılarını saklar.
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Varsayılan tur bütçesi ve yeni bir LLM çağrısı/araç başlatmak için gereken en az süre (saniye)
+DEFAULT_TURN_BUDGET_SECONDS = 20.0
+DEFAULT_RESERVE_SECONDS = 2.0
+
+# Bütçenin tükendiği aşamalar
+STAGE_PLANNING = "planning"
+STAGE_RETRIEVAL = "retrieval"
+STAGE_LLM = "llm"
+STAGE_TOOL = "tool"
+
+# Bütçe hiçbir araç çıktısı toplanmadan biterse mesajdaki kategoriye göre
+# çalıştırılacak yerel araç (sırayla ilk eşleşen); eşleşme yoksa varsayılan araç.
+FALLBACK_TOOL_BY_CATEGORY = (
+    ("stress", "BreathingExercise"),
+    ("anxiety", "BreathingExercise"),
+    ("sadness", "MeditationSuggestion"),
+    ("low_energy", "PhysicalActivity"),
+    ("motivation", "PhysicalActivity"),
+)
+DEFAULT_FALLBACK_TOOL = "SelfCareActivities"
+
+
+class DeadlineExceeded(Exception):
+    """
+    Tur bütçesi tükendi; `stage` bütçenin hangi aşamada bittiğini gösterir.
+    TimeoutError'dan türetilmez: AgentExecutor'ın asenkron döngüsü TimeoutError'ı
+    yakalayıp "iteration limit" yanıtına çevirir.
+    """
+
+    def __init__(self, stage: str, elapsed: float, budget: float):
+        super().__init__("Tur bütçesi {:.1f} sn'de '{}' aşamasında tükendi (bütçe {:.1f} sn).".format(
+            elapsed, stage, budget
+        ))
+        self.stage = stage
+        self.elapsed = elapsed
+        self.budget = budget
+
+
+class TurnDeadline:
+    """Tek bir turun süre bütçesi. `reserve` saniyeden az kaldığında yeni adım başlatılmaz."""
+
+    def __init__(self, budget_seconds: float, reserve_seconds: float = DEFAULT_RESERVE_SECONDS):
+        self.budget = budget_seconds
+        self.reserve = min(reserve_seconds, budget_seconds / 2)
+        self.started = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        return max(0.0, self.budget - self.elapsed())
+
+    def nearly_exhausted(self) -> bool:
+        return self.remaining() <= self.reserve
+
+    def check(self, stage: str):
+        """Yeni bir aşamaya geçmeden önce çağrılır; bütçe neredeyse bittiyse DeadlineExceeded fırlatır."""
+        if self.nearly_exhausted():
+            raise self.exceeded(stage)
+
+    def exceeded(self, stage: str) -> DeadlineExceeded:
+        return DeadlineExceeded(stage, self.elapsed(), self.budget)
+
+
+class DeadlineCallbackHandler(BaseCallbackHandler):
+    """
+    Agent yürütmesindeki aşamaları izler. Her LLM çağrısı ve araç çalıştırmasından
+    önce bütçeyi kontrol eder; hata fırlatarak (raise_error) AgentExecutor döngüsünü
+    durdurur. Tur bırakıldıktan sonra (abandon) arka planda süren yürütme de bir
+    sonraki adımda durur.
+    """
+
+    raise_error = True
+    run_inline = True
+
+    def __init__(self, deadline: TurnDeadline):
+        self.deadline = deadline
+        self.stage = STAGE_PLANNING
+        self.tool_outputs: List[Tuple[str, str]] = []
+        self._abandoned = threading.Event()
+        self._tool_names: Dict[Any, str] = {}
+
+    def abandon(self):
+        self._abandoned.set()
+
+    def _enter(self, stage: str):
+        if self._abandoned.is_set():
+            raise self.deadline.exceeded(self.stage)
+        self.deadline.check(stage)
+        self.stage = stage
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self._enter(STAGE_LLM)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any) -> None:
+        self._enter(STAGE_LLM)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id=None, **kwargs: Any) -> None:
+        name = (serialized or {}).get("name", "araç")
+        self._enter("{}:{}".format(STAGE_TOOL, name))
+        self._tool_names[run_id] = name
+
+    def on_tool_end(self, output: Any, *, run_id=None, **kwargs: Any) -> None:
+        name = self._tool_names.pop(run_id, "araç")
+        text = str(getattr(output, "content", output) or "").strip()
+        if text and not self._abandoned.is_set():
+            self.tool_outputs.append((name, text))
+
+    def best_tool_output(self) -> Optional[Tuple[str, str]]:
+        """Toplanan en son araç çıktısı (araç adı, çıktı) veya None."""
+        return self.tool_outputs[-1] if self.tool_outputs else None
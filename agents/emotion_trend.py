@@ -0,0 +1,179 @@
+# ai-emotion-support/agents/emotion_trend.py
+# Kullanıcı başına sabit bellekli, artımlı duygu eğilimi motoru.
+# Son `capacity` kayıt dizi tabanlı bir halka tamponda tutulur; üstel hareketli
+# ortalama (EWMA), pencere üzerindeki en küçük kareler eğimi, duygu başına sayılar
+# ve yüksek/düşük şiddet serileri her kayıtta O(1) güncellenir. Kalıcı ruh hali
+# geçmişi (Firestore `mood_history`) tek bir vektörel geçişle yüklenebilir.
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+DEFAULT_TREND_WINDOW = 5
+DEFAULT_EWMA_ALPHA = 0.3
+HIGH_INTENSITY = 4
+LOW_INTENSITY = 2
+
+
+def _timestamp(value) -> float:
+    if value is None:
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return value.timestamp()
+
+
+class EmotionTrend:
+    """
+    Sabit boyutlu halka tampon üzerinde duygu/şiddet eğilimi.
+
+    Eğim, kayıtların mutlak sıra numarası (t) ile şiddet (y) arasındaki en küçük
+    kareler eğimidir; Σt, Σy, Σt², Σty pencereye giren/çıkan kayıtla güncellenir.
+    """
+
+    __slots__ = (
+        "capacity", "alpha", "_intensities", "_timestamps", "_emotions", "_start", "_size", "total",
+        "ewma", "_emotion_counts", "high_streak", "low_streak", "_sum_t", "_sum_y", "_sum_tt", "_sum_ty",
+    )
+
+    def __init__(self, capacity: int = DEFAULT_TREND_WINDOW, alpha: float = DEFAULT_EWMA_ALPHA):
+        self.capacity = max(1, capacity)
+        self.alpha = alpha
+        self._intensities = array("d", [0.0] * self.capacity)
+        self._timestamps = array("d", [0.0] * self.capacity)
+        self._emotions: List[Optional[str]] = [None] * self.capacity
+        self.clear()
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+        # Şimdiye kadar eklenen toplam kayıt (pencereden çıkanlar dahil)
+        self.total = 0
+        self.ewma: Optional[float] = None
+        self._emotion_counts: Dict[str, int] = {}
+        self.high_streak = 0
+        self.low_streak = 0
+        self._sum_t = self._sum_y = self._sum_tt = self._sum_ty = 0.0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self):
+        return self._size
+
+    # --- Güncelleme ---
+    def add(self, emotion: str, intensity: float, timestamp=None):
+        """Yeni kaydı ekler; pencere doluysa en eski kayıt çıkar. O(1)."""
+        intensity = float(intensity)
+        if self._size == self.capacity:
+            self._evict_oldest()
+        slot = (self._start + self._size) % self.capacity
+        self._intensities[slot] = intensity
+        self._timestamps[slot] = _timestamp(timestamp)
+        self._emotions[slot] = emotion
+        self._size += 1
+
+        t = float(self.total)
+        self._sum_t += t
+        self._sum_y += intensity
+        self._sum_tt += t * t
+        self._sum_ty += t * intensity
+        self._emotion_counts[emotion] = self._emotion_counts.get(emotion, 0) + 1
+        self.ewma = intensity if self.ewma is None else self.alpha * intensity + (1 - self.alpha) * self.ewma
+        self.high_streak = self.high_streak + 1 if intensity >= HIGH_INTENSITY else 0
+        self.low_streak = self.low_streak + 1 if intensity <= LOW_INTENSITY else 0
+        self.total += 1
+
+    def _evict_oldest(self):
+        slot = self._start
+        t = float(self.total - self._size)
+        y = self._intensities[slot]
+        self._sum_t -= t
+        self._sum_y -= y
+        self._sum_tt -= t * t
+        self._sum_ty -= t * y
+        emotion = self._emotions[slot]
+        remaining = self._emotion_counts[emotion] - 1
+        if remaining:
+            self._emotion_counts[emotion] = remaining
+        else:
+            del self._emotion_counts[emotion]
+        self._emotions[slot] = None
+        self._start = (self._start + 1) % self.capacity
+        self._size -= 1
+
+    def seed(self, entries: Iterable[dict]):
+        """
+        Kayıtlı ruh hali geçmişinden (eskiden yeniye; `duygu_siddeti`, `selected_emotion`,
+        `zaman` alanları) durumu tek geçişte kurar. EWMA tüm geçmiş üzerinden, pencere
+        istatistikleri son `capacity` kayıttan vektörel olarak hesaplanır.
+        """
+        entries = list(entries)
+        self.clear()
+        if not entries:
+            return
+        intensities = np.asarray([float(entry.get("duygu_siddeti", 0)) for entry in entries], dtype=np.float64)
+        n = len(intensities)
+
+        # EWMA kapalı formu: ilk değer (1-a)^(n-1), i. değer a(1-a)^(n-1-i) ağırlık alır.
+        decay = (1 - self.alpha) ** np.arange(n - 1, -1, -1, dtype=np.float64)
+        weights = self.alpha * decay
+        weights[0] = decay[0]
+        ewma = float(weights @ intensities)
+
+        # Seriler: sondan başlayarak koşulu sağlayan ardışık kayıt sayısı
+        def streak(mask: np.ndarray) -> int:
+            breaks = np.flatnonzero(~mask)
+            return int(n - 1 - breaks[-1]) if breaks.size else n
+
+        window = entries[-self.capacity:]
+        window_y = intensities[-self.capacity:]
+        t = np.arange(n - len(window), n, dtype=np.float64)
+        for index, entry in enumerate(window):
+            self._intensities[index] = window_y[index]
+            self._timestamps[index] = _timestamp(entry.get("zaman"))
+            emotion = entry.get("selected_emotion") or "belirsiz"
+            self._emotions[index] = emotion
+            self._emotion_counts[emotion] = self._emotion_counts.get(emotion, 0) + 1
+        self._start = 0
+        self._size = len(window)
+        self.total = n
+        self.ewma = ewma
+        self.high_streak = streak(intensities >= HIGH_INTENSITY)
+        self.low_streak = streak(intensities <= LOW_INTENSITY)
+        self._sum_t = float(t.sum())
+        self._sum_y = float(window_y.sum())
+        self._sum_tt = float(t @ t)
+        self._sum_ty = float(t @ window_y)
+
+    # --- Sorgular ---
+    def count(self, emotion: str) -> int:
+        """Penceredeki kayıtlardan kaçının bu duygu olduğu."""
+        return self._emotion_counts.get(emotion, 0)
+
+    def slope(self) -> float:
+        """Pencere üzerindeki şiddet eğimi (kayıt başına); pozitif değer kötüleşmeyi gösterir."""
+        n = self._size
+        denominator = n * self._sum_tt - self._sum_t * self._sum_t
+        if n < 2 or denominator <= 0:
+            return 0.0
+        return (n * self._sum_ty - self._sum_t * self._sum_y) / denominator
+
+    def recent(self, k: int) -> List[dict]:
+        """En yeni k kaydı eskiden yeniye döndürür."""
+        k = min(k, self._size)
+        entries = []
+        for offset in range(self._size - k, self._size):
+            slot = (self._start + offset) % self.capacity
+            intensity = self._intensities[slot]
+            entries.append({
+                "emotion": self._emotions[slot],
+                "intensity": int(intensity) if intensity.is_integer() else intensity,
+                "timestamp": datetime.fromtimestamp(self._timestamps[slot]).isoformat(),
+            })
+        return entries
@@ -4,6 +4,18 @@ from firebase_admin import credentials, firestore
 import os
 from dotenv import load_dotenv
 import json 
+import asyncio
+import atexit
+import itertools
+import queue
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .history_cache import HistoryCache
+from .local_store import LocalFirestoreClient
 
 print(f"--- DEBUG (firebase_db.py): Modül yükleniyor: {__file__} ---")
 
@@ -73,11 +85,316 @@ def initialize_firebase_app():
     db = None
     return None
 
+# --- Depolama Arka Ucu ---
+# "firestore": gerçek Firestore (kimlik bilgisi gerekir); "memory" / "sqlite": aynı
+# arayüzü sunan yerel istemci (bkz. agents/local_store.py). Yerel arka uçlarda her
+# RPC'ye STORAGE_LATENCY_MS kadar yapay gecikme eklenebilir.
+STORAGE_BACKENDS = ("firestore", "memory", "sqlite")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore").strip().lower()
+STORAGE_SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", os.path.join(project_root_for_db, ".cache", "local_store.sqlite3"))
+STORAGE_LATENCY_MS = float(os.getenv("STORAGE_LATENCY_MS", "0"))
+
+
+def initialize_storage(backend: str = None):
+    """Yapılandırılan arka ucun istemcisini döndürür; firebase_db fonksiyonlarının `db_client`'ı budur."""
+    global db
+    backend = (backend or STORAGE_BACKEND).strip().lower()
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError("Bilinmeyen depolama arka ucu: '{}'. Seçenekler: {}".format(backend, ", ".join(STORAGE_BACKENDS)))
+    if backend == "firestore":
+        return initialize_firebase_app()
+    db = LocalFirestoreClient(path=STORAGE_SQLITE_PATH if backend == "sqlite" else None,
+                              latency=STORAGE_LATENCY_MS / 1000.0)
+    print(f"Yerel depolama kullanılıyor: {backend} (yapay gecikme {STORAGE_LATENCY_MS:g} ms).")
+    return db
+
+# --- Sayfalı Geçmiş Okuma ---
+# Konuşma ve ruh hali geçmişi zaman alanına göre sıralı sayfalar halinde okunur.
+# Her sayfa `page_size + 1` belge ister; fazladan gelen belge yalnızca bir sonraki
+# sayfanın varlığını gösterir. Oturum açılışında "en yeni N kayıt" modu kullanılır;
+# böylece yıllarca geçmişi olan kullanıcıda da okuma sayısı sınırlı kalır.
+HISTORY_PAGE_SIZE = int(os.getenv("FIREBASE_HISTORY_PAGE_SIZE", "200"))
+HISTORY_LATEST_LIMIT = int(os.getenv("FIREBASE_HISTORY_LATEST_LIMIT", "100"))
+
+
+class HistoryPage(list):
+    """
+    Bir geçmiş sayfası: kayıtlar her zaman eskiden yeniye sıralıdır (liste olarak
+    kullanılabilir).
+      cursor:   aynı yönde sonraki sayfa için start_after'a verilecek belge
+      has_more: o yönde okunmamış kayıt kaldı mı
+      offset:   ilk kaydın tüm geçmişteki sırası (bilinmiyorsa None)
+      ids:      kayıtların Firestore belge kimlikleri (aynı sırayla)
+    """
+
+    def __init__(self, entries=(), cursor=None, has_more=False, offset=None, ids=None):
+        super().__init__(entries)
+        self.cursor = cursor
+        self.has_more = has_more
+        self.offset = offset
+        self.ids = list(ids) if ids is not None else []
+
+
+def _history_collection(db_client, user_id: str, collection: str):
+    return db_client.collection('users').document(user_id).collection(collection)
+
+
+def load_history_page(db_client, user_id: str, collection: str, time_field: str,
+                      page_size: int = HISTORY_PAGE_SIZE, start_after=None, since=None,
+                      newest_first: bool = False) -> HistoryPage:
+    """
+    `collection` alt koleksiyonundan tek bir sayfa okur.
+    newest_first=True en yeni kayıtlardan geriye doğru sayfalar (cursor daha eski
+    kayıtları gösterir); since verilirse yalnızca `time_field` değeri ondan büyük
+    veya ona eşit kayıtlar okunur. Tek commit'teki tüm kayıtlar aynı sunucu zamanını
+    aldığından sınır eşit dahildir; daha önce okunan sınır kayıtları çağıran tarafından
+    belge kimliğiyle ayıklanır (bkz. newest_ids). Hata durumunda istisna yükseltilir.
+    """
+    direction = firestore.Query.DESCENDING if newest_first else firestore.Query.ASCENDING
+    query = _history_collection(db_client, user_id, collection)
+    if since is not None:
+        query = query.where(filter=firestore.FieldFilter(time_field, '>=', since))
+    query = query.order_by(time_field, direction=direction)
+    if start_after is not None:
+        query = query.start_after(start_after)
+    docs = list(query.limit(page_size + 1).stream())
+    has_more = len(docs) > page_size
+    docs = docs[:page_size]
+    cursor = docs[-1] if docs else None
+    if newest_first:
+        docs.reverse()
+    return HistoryPage([doc.to_dict() for doc in docs], cursor=cursor, has_more=has_more,
+                       ids=[doc.id for doc in docs])
+
+
+def newest_ids(page: HistoryPage, time_field: str) -> list:
+    """
+    Sayfadaki en yeni zamanı taşıyan kayıtların belge kimlikleri. Delta
+    senkronizasyonunda `since` ile birlikte `seen_ids` olarak verilir; böylece
+    aynı zamanı paylaşan kayıtlar ne atlanır ne de iki kez döner.
+    """
+    if not page or not page.ids:
+        return []
+    newest = page[-1].get(time_field)
+    return [doc_id for doc_id, entry in zip(page.ids, page) if entry.get(time_field) == newest]
+
+
+def _without_ids(page: HistoryPage, seen_ids) -> HistoryPage:
+    seen_ids = set(seen_ids)
+    kept = [(doc_id, entry) for doc_id, entry in zip(page.ids, page) if doc_id not in seen_ids]
+    return HistoryPage([entry for _doc_id, entry in kept], cursor=page.cursor, has_more=page.has_more,
+                       offset=page.offset, ids=[doc_id for doc_id, _entry in kept])
+
+
+def count_history(db_client, user_id: str, collection: str):
+    """Alt koleksiyondaki kayıt sayısı (sayma sorgusu; 1000 kayıt başına bir okuma). Hata olursa None."""
+    try:
+        result = _history_collection(db_client, user_id, collection).count().get()
+        return int(result[0][0].value)
+    except Exception as e:
+        print(f"UYARI: '{collection}' kayıt sayısı alınamadı: {e}")
+        return None
+
+
+def _fetch_history(db_client, user_id: str, collection: str, time_field: str,
+                   latest: int = None, since=None, seen_ids=()) -> HistoryPage:
+    page = _fetch_history_pages(db_client, user_id, collection, time_field, latest, since)
+    return _without_ids(page, seen_ids) if seen_ids else page
+
+
+def _fetch_history_pages(db_client, user_id: str, collection: str, time_field: str,
+                         latest: int = None, since=None) -> HistoryPage:
+    if latest:
+        page = load_history_page(db_client, user_id, collection, time_field,
+                                 page_size=latest, since=since, newest_first=True)
+        # Daha eski kayıt yoksa sayfa geçmişin başıdır; varsa sıra sayma sorgusuyla bulunur.
+        if since is None:
+            if not page.has_more:
+                page.offset = 0
+            else:
+                total = count_history(db_client, user_id, collection)
+                page.offset = None if total is None else max(0, total - len(page))
+        return page
+    page = HistoryPage(offset=0 if since is None else None)
+    cursor = None
+    while True:
+        chunk = load_history_page(db_client, user_id, collection, time_field,
+                                  start_after=cursor, since=since)
+        page.extend(chunk)
+        page.ids.extend(chunk.ids)
+        cursor = chunk.cursor
+        if not chunk.has_more:
+            break
+    page.cursor = cursor
+    return page
+
+
+# --- Yerel Geçmiş Aynası (bkz. agents/history_cache.py) ---
+# Boş bırakılırsa ayna kapatılır ve her yükleme doğrudan Firestore'dan yapılır.
+HISTORY_CACHE_PATH = os.getenv(
+    "FIREBASE_HISTORY_CACHE_PATH", os.path.join(project_root_for_db, ".cache", "history.sqlite3")
+)
+_history_cache = None
+_history_cache_lock = threading.Lock()
+
+
+def get_history_cache():
+    """Süreç genelinde tek yerel ayna; kapalıysa veya açılamazsa None."""
+    global _history_cache, HISTORY_CACHE_PATH
+    with _history_cache_lock:
+        if _history_cache is None and HISTORY_CACHE_PATH:
+            try:
+                _history_cache = HistoryCache(HISTORY_CACHE_PATH)
+            except Exception as e:
+                print(f"UYARI: Yerel geçmiş aynası açılamadı, Firestore'dan okunacak: {e}")
+                HISTORY_CACHE_PATH = ""
+        return _history_cache
+
+
+def _load_cached_history(cache, db_client, user_id: str, collection: str, time_field: str,
+                         latest: int = None) -> HistoryPage:
+    state = cache.sync_state(user_id, collection)
+    cached = cache.count(user_id, collection) if state is not None else 0
+    if state is None or (not state[1] and (not latest or cached < latest)):
+        # Soğuk ayna ya da istenen kayıtlar aynada yok: Firestore'dan okunup aynaya yazılır.
+        page = _fetch_history(db_client, user_id, collection, time_field, latest)
+        cache.store(user_id, collection, time_field, list(zip(page.ids, page)), complete=page.offset == 0)
+        return page
+
+    synced_until, complete = state
+    try:
+        # Yalnızca son senkronizasyon zamanında ve sonrasında yazılan belgeler okunur.
+        # Sınırdaki belgeler yeniden gelir; ayna belge kimliğiyle yazdığı için çoğalmaz.
+        delta = _fetch_history(db_client, user_id, collection, time_field, since=synced_until)
+        if delta:
+            cache.store(user_id, collection, time_field, list(zip(delta.ids, delta)))
+            cached = cache.count(user_id, collection)
+    except Exception as e:
+        print(f"UYARI: '{collection}' için Firestore ile senkronizasyon yapılamadı, yerel kopya kullanılıyor: {e}")
+
+    items = cache.items(user_id, collection, latest)
+    entries = [entry for _doc_id, entry in items]
+    ids = [doc_id for doc_id, _entry in items]
+    if not latest:
+        return HistoryPage(entries, offset=0, ids=ids)
+    has_more = cached > len(entries) or not complete
+    if complete:
+        offset = cached - len(entries)
+    elif has_more:
+        total = count_history(db_client, user_id, collection)
+        offset = None if total is None else max(0, total - len(entries))
+    else:
+        offset = 0
+    # Daha eski sayfalar Firestore'dan, en eski kayıttan geriye doğru okunur.
+    cursor = _cursor_snapshot(db_client, user_id, collection, time_field, ids[0], entries[0]) \
+        if has_more and entries else None
+    return HistoryPage(entries, cursor=cursor, has_more=has_more, offset=offset, ids=ids)
+
+
+def _cursor_snapshot(db_client, user_id: str, collection: str, time_field: str, doc_id: str, entry: dict):
+    # start_after'a verilen anlık görüntü (zaman, belge kimliği) ile sıralar; yalnızca zaman
+    # taşıyan bir sözlük aynı commit'te yazılıp aynı zamanı paylaşan kayıtları atlardı.
+    try:
+        snapshot = _history_collection(db_client, user_id, collection).document(doc_id).get()
+        if snapshot.exists:
+            return snapshot
+    except Exception as e:
+        print(f"UYARI: '{collection}' için sayfa imleci okunamadı, zaman imleci kullanılıyor: {e}")
+    return {time_field: entry[time_field]}
+
+
+def _load_history(db_client, user_id: str, collection: str, time_field: str, label: str,
+                  latest: int = None, since=None, seen_ids=()) -> HistoryPage:
+    if not db_client:
+        print(f"UYARI: Veritabanı istemcisi bulunamadığı için '{collection}' geçmişi yüklenemedi.")
+        return HistoryPage(offset=0)
+    try:
+        # Yerel istemci zaten yerel olduğundan aynaya gerek yoktur.
+        cache = None if isinstance(db_client, LocalFirestoreClient) else get_history_cache()
+        if cache is not None and since is None:
+            page = _load_cached_history(cache, db_client, user_id, collection, time_field, latest)
+        else:
+            page = _fetch_history(db_client, user_id, collection, time_field, latest, since, seen_ids)
+            if cache is not None and page:
+                cache.store(user_id, collection, time_field, list(zip(page.ids, page)))
+        print(f"{user_id} için {len(page)} {label} yüklendi.")
+        return page
+    except Exception as e:
+        print(f"HATA: '{collection}' geçmişi yükleme sırasında bir sorun oluştu: {e}")
+        return HistoryPage()
+
+
+# --- Toplu Silme ---
+# Alt koleksiyonlar tek bir WriteBatch'e sığmayabilir (Firestore sınırı 500 işlem).
+# Belge referansları sayfa sayfa listelenir, her sayfa en fazla 500 silmelik bir
+# batch olarak commit edilir ve aynı anda en fazla DELETE_MAX_WORKERS commit yolda
+# olur. Silme idempotent'tir: yarıda kalan bir silme tekrar çağrıldığında kalan
+# belgelerden devam eder. Kullanıcı belgesi en son, tüm alt koleksiyonlar
+# boşaltıldıktan sonra silinir.
+DELETE_BATCH_SIZE = 500
+DELETE_MAX_WORKERS = int(os.getenv("FIREBASE_DELETE_MAX_WORKERS", "4"))
+USER_SUBCOLLECTIONS = ('conversations', 'mood_history', 'memory')
+
+
+def _commit_deletes(db_client, refs, max_retries: int = 3) -> int:
+    for attempt in range(max_retries + 1):
+        try:
+            batch = db_client.batch()
+            for ref in refs:
+                batch.delete(ref)
+            batch.commit()
+            return len(refs)
+        except Exception:
+            if attempt >= max_retries:
+                raise
+            time.sleep(random.uniform(0, min(4.0, 0.5 * (2 ** attempt))))
+
+
+def delete_collection(db_client, collection_ref, batch_size: int = DELETE_BATCH_SIZE,
+                      max_workers: int = DELETE_MAX_WORKERS, on_progress=None) -> int:
+    """
+    Koleksiyondaki tüm belgeleri parça parça siler ve silinen belge sayısını döndürür.
+    Listeleme commit'ler sürerken devam eder; referanslar bellekte biriktirilmez.
+    on_progress(koleksiyon adı, şimdiye kadar silinen) her commit'ten sonra çağrılır.
+    Bir commit yeniden denemelere rağmen başarısız olursa istisna yükseltilir.
+    """
+    batch_size = max(1, min(DELETE_BATCH_SIZE, batch_size))
+    max_workers = max(1, max_workers)
+    name = getattr(collection_ref, 'id', str(collection_ref))
+    deleted = 0
+
+    def collect(done):
+        nonlocal deleted
+        for future in done:
+            deleted += future.result()
+            if on_progress is not None:
+                on_progress(name, deleted)
+
+    refs = iter(collection_ref.list_documents(page_size=batch_size))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        try:
+            while True:
+                chunk = list(itertools.islice(refs, batch_size))
+                if not chunk:
+                    break
+                if len(pending) >= max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(executor.submit(_commit_deletes, db_client, chunk))
+            done, pending = wait(pending)
+            collect(done)
+        finally:
+            for future in pending:
+                future.cancel()
+    return deleted
+
+
 # --- CRUD Fonksiyonları (değişmedi) ---
-def save_conversation(db_client, user_id: str, conversation_entry: dict):
+def save_conversation(db_client, user_id: str, conversation_entry: dict, doc_id: str = None):
     if db_client: 
         try:
-            doc_ref = db_client.collection('users').document(user_id).collection('conversations').document()
+            doc_ref = db_client.collection('users').document(user_id).collection('conversations').document(doc_id)
             doc_ref.set(conversation_entry)
             print(f"Konuşma başarıyla kaydedildi: {doc_ref.id}")
             return True
@@ -87,49 +404,48 @@ def save_conversation(db_client, user_id: str, conversation_entry: dict):
     print(f"UYARI: Veritabanı istemcisi bulunamadığı için konuşma kaydedilemedi.")
     return False
 
-def load_conversations(db_client, user_id: str) -> list:
-    conversations = []
-    if db_client: 
-        try:
-            docs = db_client.collection('users').document(user_id).collection('conversations').order_by('time', direction=firestore.Query.ASCENDING).stream()
-            for doc in docs:
-                entry = doc.to_dict()
-                conversations.append(entry)
-            print(f"{user_id} için {len(conversations)} konuşma yüklendi.")
-        except Exception as e:
-            print(f"HATA: Konuşma yükleme sırasında bir sorun oluştu: {e}")
-    else:
-        print(f"UYARI: Veritabanı istemcisi bulunamadığı için konuşmalar yüklenemedi.")
-    return conversations
+def load_conversations(db_client, user_id: str, latest: int = None, since=None, seen_ids=()) -> list:
+    # latest=N: yalnızca en yeni N konuşma; since: bu zamandaki ve sonraki konuşmalar (delta
+    # senkronizasyonu), seen_ids: since zamanındaki zaten okunmuş belgeler (bkz. newest_ids).
+    # İkisi de verilmezse tüm geçmiş sayfa sayfa okunur.
+    return _load_history(db_client, user_id, 'conversations', 'time', 'konuşma', latest, since, seen_ids)
 
-def delete_user_data(db_client, user_id: str):
+def delete_user_data(db_client, user_id: str, on_progress=None, write_queue: "WriteBehindQueue" = None,
+                     session_pool=None):
+    # Kullanıcının tüm alt koleksiyonlarını parça parça siler (bkz. delete_collection).
+    # Hata olursa False döner; aynı çağrı tekrarlandığında kalan belgelerden devam eder.
+    # Silmeden önce kullanıcının bellekteki oturumu (session_pool) çıkarılır ve yazma
+    # kuyruğundaki kayıtları (write_queue) bırakılır; böylece silinen veri arka plandaki
+    # bir yazma ya da özet kaydıyla geri gelmez. Yerel ayna her durumda temizlenir.
     if db_client: 
+        if session_pool is not None:
+            session_pool.remove(user_id)
+        if write_queue is not None:
+            write_queue.purge(user_id)
         try:
-            conv_ref = db_client.collection('users').document(user_id).collection('conversations')
-            batch = db_client.batch()
-            for doc in conv_ref.list_documents():
-                batch.delete(doc)
-            batch.commit()
-
-            mood_ref = db_client.collection('users').document(user_id).collection('mood_history')
-            batch = db_client.batch()
-            for doc in mood_ref.list_documents():
-                batch.delete(doc)
-            batch.commit()
+            user_ref = db_client.collection('users').document(user_id)
+            deleted = 0
+            for collection in USER_SUBCOLLECTIONS:
+                deleted += delete_collection(db_client, user_ref.collection(collection), on_progress=on_progress)
             
-            db_client.collection('users').document(user_id).delete()
-            print(f"Kullanıcı {user_id} verileri başarıyla silindi.")
+            user_ref.delete()
+            print(f"Kullanıcı {user_id} verileri başarıyla silindi ({deleted} belge).")
             return True
         except Exception as e:
             print(f"HATA: Kullanıcı verisi silme sırasında bir sorun oluştu: {e}")
             return False
+        finally:
+            # Yarım kalan silmede de ayna Firestore'la uyuşmaz; bir sonraki okuma baştan kurar.
+            cache = get_history_cache()
+            if cache is not None:
+                cache.invalidate(user_id)
     print(f"UYARI: Veritabanı istemcisi bulunamadığı için kullanıcı verisi silinemedi.")
     return False
 
-def save_mood_entry(db_client, user_id: str, mood_entry: dict):
+def save_mood_entry(db_client, user_id: str, mood_entry: dict, doc_id: str = None):
     if db_client: 
         try:
-            doc_ref = db_client.collection('users').document(user_id).collection('mood_history').document()
+            doc_ref = db_client.collection('users').document(user_id).collection('mood_history').document(doc_id)
             doc_ref.set(mood_entry)
             print("Ruh hali başarıyla kaydedildi.")
             return True
@@ -139,17 +455,223 @@ def save_mood_entry(db_client, user_id: str, mood_entry: dict):
     print(f"UYARI: Veritabanı istemcisi bulunamadığı için ruh hali kaydedilemedi.")
     return False
 
-def load_mood_history(db_client, user_id: str) -> list:
-    mood_history = []
+async def asave_turn(db_client, user_id: str, conversation_entry: dict, mood_entry: dict = None):
+    # Bir turun konuşma ve ruh hali kayıtlarını iş parçacıklarında eşzamanlı yazar.
+    # EmotionalSupportAgent.aprocess_user_input(persist=...) ile yanıt yolunun dışında çalıştırılır.
+    writes = [asyncio.to_thread(save_conversation, db_client, user_id, conversation_entry)]
+    if mood_entry is not None:
+        writes.append(asyncio.to_thread(save_mood_entry, db_client, user_id, mood_entry))
+    return all(await asyncio.gather(*writes))
+
+def load_mood_history(db_client, user_id: str, latest: int = None, since=None, seen_ids=()) -> list:
+    return _load_history(db_client, user_id, 'mood_history', 'zaman', 'ruh hali kaydı', latest, since, seen_ids)
+
+# --- Arka Planda Toplu Yazma (write-behind) ---
+# Tur kayıtları Streamlit iş parçacığında tek tek yazılmak yerine sınırlı bir
+# kuyruğa konur; arka plandaki yazıcı bunları WriteBatch commit'lerinde birleştirir
+# (boyut veya süre dolunca). Belge kimlikleri istemcide üretilir: belirsiz biten
+# bir commit yeniden denendiğinde aynı belgeler üzerine yazılır, kayıt çoğalmaz.
+WRITE_BATCH_SIZE = min(500, int(os.getenv("FIREBASE_WRITE_BATCH_SIZE", "100")))  # Firestore sınırı: 500
+WRITE_FLUSH_INTERVAL_SECONDS = float(os.getenv("FIREBASE_WRITE_FLUSH_INTERVAL", "1.0"))
+WRITE_QUEUE_MAX_PENDING = int(os.getenv("FIREBASE_WRITE_QUEUE_SIZE", "1000"))
+WRITE_QUEUE_PUT_TIMEOUT_SECONDS = float(os.getenv("FIREBASE_WRITE_PUT_TIMEOUT", "2.0"))
+WRITE_MAX_RETRIES = 3
+
+
+def new_document_id() -> str:
+    return uuid.uuid4().hex
+
+
+class WriteBehindQueue:
+    """
+    Sınırlı, arka planda toplu yazan kayıt kuyruğu.
+
+    - enqueue() kaydı kuyruğa koyar ve belge kimliğini hemen döndürür.
+    - Kuyruk doluysa çağıran en fazla `put_timeout` saniye bekler (geri basınç);
+      yer açılmazsa kayıt aynı kimlikle doğrudan (senkron) yazılır, kaybolmaz.
+    - Yazıcı, ilk kayıttan sonra `flush_interval` saniye ya da `batch_size` kayıt
+      dolana kadar toplar ve tek bir batch.commit() yapar.
+    - close() kuyruktaki ve yoldaki tüm kayıtları yazıp yazıcıyı durdurur;
+      süreç kapanırken atexit ile çağrılır.
+    - purge(user_id) kullanıcının o ana kadar kuyruğa konmuş kayıtlarını bırakır ve
+      yoldaki commit'in bitmesini bekler; kullanıcı verisi silinmeden önce çağrılır.
+    """
+
+    def __init__(self, db_client, batch_size: int = WRITE_BATCH_SIZE,
+                 flush_interval: float = WRITE_FLUSH_INTERVAL_SECONDS,
+                 max_pending: int = WRITE_QUEUE_MAX_PENDING,
+                 put_timeout: float = WRITE_QUEUE_PUT_TIMEOUT_SECONDS,
+                 max_retries: int = WRITE_MAX_RETRIES):
+        self.db_client = db_client
+        self.batch_size = max(1, min(500, batch_size))
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self._queue = queue.Queue(maxsize=max(1, max_pending))
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        # Commit'ler bu kilitle yapılır; purge() yoldaki commit'in bitmesini bununla bekler.
+        self._commit_lock = threading.Lock()
+        # Kayıt sıra numaraları ve kullanıcı -> bu numaraya kadarki kayıtları bırak
+        self._sequence = itertools.count(1)
+        self._purged = {}
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "retries": 0,
+                      "failed": 0, "sync_fallbacks": 0, "purged": 0, "max_depth": 0}
+        self._worker = threading.Thread(target=self._run, name="firestore-write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def _add(self, **values):
+        with self._lock:
+            for key, value in values.items():
+                self.stats[key] += value
+
+    def report(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["pending"] = self._queue.unfinished_tasks
+        stats["avg_batch_size"] = round(stats["written"] / stats["batches"], 1) if stats["batches"] else 0.0
+        return stats
+
+    # --- Üretici tarafı ---
+    def enqueue(self, user_id: str, collection: str, entry: dict, doc_id: str = None) -> str:
+        """Kaydı kuyruğa koyar; `users/{user_id}/{collection}/{doc_id}` belgesinin kimliğini döndürür."""
+        doc_id = doc_id or new_document_id()
+        record = (next(self._sequence), user_id, collection, doc_id, entry)
+        if not self._closed.is_set():
+            try:
+                self._queue.put(record, timeout=self.put_timeout)
+                self._add(enqueued=1)
+                with self._lock:
+                    self.stats["max_depth"] = max(self.stats["max_depth"], self._queue.qsize())
+                return doc_id
+            except queue.Full:
+                print(f"UYARI: Yazma kuyruğu dolu, '{collection}' kaydı doğrudan yazılıyor.")
+        self._add(sync_fallbacks=1)
+        self._commit([record])
+        return doc_id
+
+    def enqueue_turn(self, user_id: str, conversation_entry: dict, mood_entry: dict = None) -> bool:
+        """Bir turun konuşma ve (varsa) ruh hali kayıtlarını kuyruğa koyar."""
+        if not self.db_client:
+            print(f"UYARI: Veritabanı istemcisi bulunamadığı için tur kaydedilemedi.")
+            return False
+        self.enqueue(user_id, 'conversations', conversation_entry)
+        if mood_entry is not None:
+            self.enqueue(user_id, 'mood_history', mood_entry)
+        return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """Kuyruktaki tüm kayıtlar yazılana (veya bırakılana) kadar bekler."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def purge(self, user_id: str):
+        """
+        Kullanıcının şu ana kadar kuyruğa konmuş kayıtlarını yazılmadan bırakır.
+        Dönüşte yoldaki commit de bitmiştir; bu yüzden silme işleminden sonra eski
+        kayıtlar geri yazılmaz. Sonradan kuyruğa konan kayıtlar normal yazılır.
+        """
+        with self._lock:
+            self._purged[user_id] = next(self._sequence)
+        with self._commit_lock:
+            pass
+
+    def _drop_purged(self, records):
+        with self._lock:
+            kept = [record for record in records if record[0] > self._purged.get(record[1], 0)]
+            self.stats["purged"] += len(records) - len(kept)
+        return kept
+
+    def close(self, timeout: float = 10.0):
+        """Yeni kayıt almayı bırakır, kalanları yazar ve yazıcıyı durdurur."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._worker.join(timeout)
+        if self._worker.is_alive():
+            print(f"UYARI: Yazma kuyruğu {timeout} sn içinde boşaltılamadı; {self._queue.unfinished_tasks} kayıt bekliyor.")
+
+    # --- Yazıcı tarafı ---
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._closed.is_set():
+                    return
+                continue
+            records = [first]
+            # Kapanışta beklemeden, eldekilerle hemen commit edilir.
+            flush_at = time.monotonic() + (0 if self._closed.is_set() else self.flush_interval)
+            while len(records) < self.batch_size:
+                wait = flush_at - time.monotonic()
+                try:
+                    # Kısa dilimlerle beklenir; close() uzun bir toplama aralığını da hemen keser.
+                    records.append(self._queue.get(timeout=min(wait, 0.1)) if wait > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    if wait <= 0.1 or self._closed.is_set():
+                        break
+            try:
+                self._commit(records)
+            finally:
+                for _ in records:
+                    self._queue.task_done()
+
+    def _commit(self, records) -> bool:
+        with self._commit_lock:
+            records = self._drop_purged(records)
+            return self._commit_with_retries(records) if records else True
+
+    def _commit_with_retries(self, records) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                batch = self.db_client.batch()
+                for _sequence, user_id, collection, doc_id, entry in records:
+                    batch.set(_history_collection(self.db_client, user_id, collection).document(doc_id), entry)
+                batch.commit()
+                self._add(written=len(records), batches=1)
+                return True
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    self._add(failed=len(records))
+                    print(f"HATA: {len(records)} kayıtlık toplu yazma başarısız oldu: {e}")
+                    return False
+                self._add(retries=1)
+                time.sleep(random.uniform(0, min(4.0, 0.5 * (2 ** attempt))))
+        return False
+
+
+# --- Konuşma Özeti (token bütçeli bellek için) ---
+# Özet, users/{user_id}/memory/summary belgesinde tutulur:
+#   summary: metin, summarized_turns: özete katlanmış konuşma sayısı
+def save_memory_summary(db_client, user_id: str, summary_state: dict):
     if db_client: 
         try:
-            docs = db_client.collection('users').document(user_id).collection('mood_history').order_by('zaman', direction=firestore.Query.ASCENDING).stream()
-            for doc in docs:
-                entry = doc.to_dict()
-                mood_history.append(entry)
-            print(f"{user_id} için {len(mood_history)} ruh hali kaydı yüklendi.")
+            doc_ref = db_client.collection('users').document(user_id).collection('memory').document('summary')
+            doc_ref.set(dict(summary_state, updated_at=firestore.SERVER_TIMESTAMP))
+            print(f"Konuşma özeti kaydedildi ({summary_state.get('summarized_turns', 0)} tur).")
+            return True
         except Exception as e:
-            print(f"HATA: Ruh hali geçmişi yükleme sırasında bir sorun oluştu: {e}")
+            print(f"HATA: Konuşma özeti kaydetme sırasında bir sorun oluştu: {e}")
+            return False
+    print(f"UYARI: Veritabanı istemcisi bulunamadığı için konuşma özeti kaydedilemedi.")
+    return False
+
+def load_memory_summary(db_client, user_id: str):
+    if db_client: 
+        try:
+            doc = db_client.collection('users').document(user_id).collection('memory').document('summary').get()
+            if doc.exists:
+                return doc.to_dict()
+        except Exception as e:
+            print(f"HATA: Konuşma özeti yükleme sırasında bir sorun oluştu: {e}")
     else:
-        print(f"UYARI: Veritabanı istemcisi bulunamadığı için ruh hali geçmişi yüklenemedi.")
-    return mood_history
\ No newline at end of file
+        print(f"UYARI: Veritabanı istemcisi bulunamadığı için konuşma özeti yüklenemedi.")
+    return None
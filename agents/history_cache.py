@@ -0,0 +1,176 @@
+# ai-emotion-support/agents/history_cache.py
+# Firestore'daki kullanıcı geçmişinin (conversations, mood_history) yerel SQLite
+# aynası. firebase_db.load_conversations / load_mood_history önce buradan okur ve
+# Firestore'dan yalnızca son senkronizasyondan sonra yazılmış belgeleri ister;
+# böylece tekrar gelen kullanıcının oturumu milisaniyeler içinde açılır ve
+# faturalanan okuma sayısı yeni kayıt sayısı kadar olur.
+#
+# Dosya WAL modunda açılır (okumalar yazmaları beklemez). Belgeler (kullanıcı,
+# koleksiyon, belge kimliği) ile saklanır; aynı belge tekrar gelirse üzerine yazılır.
+# `complete` bayrağı kullanıcının o koleksiyondaki geçmişinin baştan itibaren
+# aynada olup olmadığını gösterir (yalnızca en yeni N kayıt okunduysa 0).
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+_DATETIME_KEY = "$datetime"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    user_id TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, collection, doc_id)
+);
+CREATE INDEX IF NOT EXISTS history_by_time ON history (user_id, collection, ts);
+CREATE TABLE IF NOT EXISTS sync_state (
+    user_id TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    synced_until TEXT,
+    synced_ts REAL,
+    complete INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, collection)
+);
+"""
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {_DATETIME_KEY: value.isoformat()}
+    raise TypeError("JSON'a çevrilemeyen değer: {!r}".format(type(value).__name__))
+
+
+def _decode(obj: Dict[str, Any]):
+    if len(obj) == 1 and _DATETIME_KEY in obj:
+        return datetime.fromisoformat(obj[_DATETIME_KEY])
+    return obj
+
+
+def dump_entry(entry: Dict[str, Any]) -> str:
+    """Kaydı JSON'a çevirir; datetime değerleri saat dilimiyle korunur."""
+    return json.dumps(entry, default=_encode)
+
+
+def load_entry(text: str) -> Dict[str, Any]:
+    return json.loads(text, object_hook=_decode)
+
+
+def _timestamp(value) -> float:
+    return value.timestamp() if hasattr(value, "timestamp") else float(value)
+
+
+class HistoryCache:
+    """
+    Kullanıcı geçmişinin SQLite aynası. Tek bağlantı bir kilitle paylaşılır;
+    Streamlit'in iş parçacıkları ve arka plandaki yazıcı güvenle kullanabilir.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Senkronizasyon durumu ---
+    def sync_state(self, user_id: str, collection: str) -> Optional[Tuple[Optional[datetime], bool]]:
+        """(synced_until, complete) veya ayna hiç kurulmadıysa None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_until, complete FROM sync_state WHERE user_id = ? AND collection = ?",
+                (user_id, collection),
+            ).fetchone()
+        if row is None:
+            return None
+        synced_until = datetime.fromisoformat(row[0]) if row[0] else None
+        return synced_until, bool(row[1])
+
+    # --- Yazma ---
+    def store(self, user_id: str, collection: str, time_field: str, docs: List[Tuple[str, dict]],
+              complete: Optional[bool] = None):
+        """
+        (belge kimliği, kayıt) çiftlerini aynaya yazar ve senkronizasyon zamanını en
+        yeni kaydın zamanına ilerletir. `complete` verilirse bayrak güncellenir.
+        """
+        rows = [
+            (user_id, collection, doc_id, _timestamp(entry[time_field]), dump_entry(entry))
+            for doc_id, entry in docs if entry.get(time_field) is not None
+        ]
+        newest = max((entry[time_field] for _, entry in docs if entry.get(time_field) is not None),
+                     key=_timestamp, default=None)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO history (user_id, collection, doc_id, ts, data) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO sync_state (user_id, collection, complete) VALUES (?, ?, 0)",
+                    (user_id, collection),
+                )
+                if newest is not None:
+                    # Senkronizasyon noktası yalnızca ileri gider; eski sayfalar onu geri almaz.
+                    self._conn.execute(
+                        "UPDATE sync_state SET synced_until = ?, synced_ts = ? WHERE user_id = ? AND collection = ? "
+                        "AND (synced_ts IS NULL OR synced_ts < ?)",
+                        (newest.isoformat(), _timestamp(newest), user_id, collection, _timestamp(newest)),
+                    )
+                if complete is not None:
+                    self._conn.execute(
+                        "UPDATE sync_state SET complete = ? WHERE user_id = ? AND collection = ?",
+                        (int(complete), user_id, collection),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def invalidate(self, user_id: str):
+        """Kullanıcının tüm aynasını siler (örn. delete_user_data sonrası)."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM history WHERE user_id = ?", (user_id,))
+            self._conn.execute("DELETE FROM sync_state WHERE user_id = ?", (user_id,))
+            self._conn.execute("COMMIT")
+
+    # --- Okuma ---
+    def count(self, user_id: str, collection: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM history WHERE user_id = ? AND collection = ?", (user_id, collection)
+            ).fetchone()[0]
+
+    def items(self, user_id: str, collection: str, latest: Optional[int] = None) -> List[Tuple[str, dict]]:
+        """Aynadaki (belge kimliği, kayıt) çiftleri eskiden yeniye; latest verilirse yalnızca en yeni `latest` kayıt."""
+        with self._lock:
+            if latest:
+                rows = self._conn.execute(
+                    "SELECT doc_id, data FROM history WHERE user_id = ? AND collection = ? "
+                    "ORDER BY ts DESC, doc_id DESC LIMIT ?",
+                    (user_id, collection, latest),
+                ).fetchall()
+                rows.reverse()
+            else:
+                rows = self._conn.execute(
+                    "SELECT doc_id, data FROM history WHERE user_id = ? AND collection = ? ORDER BY ts, doc_id",
+                    (user_id, collection),
+                ).fetchall()
+        return [(row[0], load_entry(row[1])) for row in rows]
+
+    def entries(self, user_id: str, collection: str, latest: Optional[int] = None) -> List[dict]:
+        """Aynadaki kayıtlar eskiden yeniye; latest verilirse yalnızca en yeni `latest` kayıt."""
+        return [entry for _doc_id, entry in self.items(user_id, collection, latest)]
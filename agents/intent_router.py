@@ -0,0 +1,226 @@
+# ai-emotion-support/agents/intent_router.py
+# Agent döngüsünün önünde çalışan yerel, deterministik niyet sınıflandırıcı.
+# "nefes egzersizi öner", "meditasyon" gibi tek bir araçla karşılanabilecek kısa
+# istekler anahtar kelime puanlamasıyla tanınır; güven yüksekse araç doğrudan
+# çağrılır ve LLM agent döngüsü (en az iki LLM çağrısı) atlanır. Emin olunamayan
+# her durumda tam agent'a dönülür. Rota başına isabet oranı ve gecikme raporlanır.
+# Rota, istek ve olumsuzlama terimleri ortak anahtar kelime motorunda
+# (agents/keyword_engine.py) tek otomata derlenir; mesaj tek geçişte taranır.
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from rag.text_normalize import tokenize, turkish_casefold
+
+from .crisis_detector import detect_crisis
+from .keyword_engine import KeywordMatcher
+
+AGENT_ROUTE = "agent"
+
+# Hızlı yol yalnızca kısa, açık isteklerde kullanılır; uzun duygusal paylaşımlar
+# empatik yanıt gerektirdiği için her zaman agent'a gider. Mesaj ne kadar kısa
+# olursa olsun istek kalıbı içermiyorsa ("meditasyon", "nefes alamıyorum") agent'a gider.
+MAX_FAST_PATH_TOKENS = 12
+MIN_CONFIDENCE_SCORE = 2.0
+MIN_SCORE_MARGIN = 1.0
+
+
+class IntentRoute:
+    """
+    Bir aracı temsil eden rota. Anahtar kelimeler (tek veya çok kelimeli) kelime
+    başından eşleşir ve ek alabilir; böylece "nefes" kelimesi "nefesimi" ile de eşleşir.
+    İhtiyaç ve duygu seçimleri puanı artırır ancak tek başına rota seçtirmez.
+    """
+
+    def __init__(self, name: str, tool_name: str, keywords: Dict[str, float],
+                 need_boosts: Dict[str, float] = None, emotion_boosts: Dict[str, float] = None):
+        self.name = name
+        self.tool_name = tool_name
+        self.keywords = dict(keywords)
+        self.need_boosts = {turkish_casefold(k): v for k, v in (need_boosts or {}).items()}
+        self.emotion_boosts = {turkish_casefold(k): v for k, v in (emotion_boosts or {}).items()}
+
+    def keyword_score(self, found: Dict[str, List[str]]) -> float:
+        """KeywordMatcher.find çıktısında bu rotanın eşleşen terimlerinin ağırlık toplamı."""
+        return sum(self.keywords[term] for term in found.get(self.name, ()))
+
+
+# İstek bildiren kalıplar ("öner", "yapalım" ...). Hızlı yol için en az biri gerekir.
+REQUEST_TERMS = ("öner", "öneri", "yapalım", "yapmak istiyorum", "ister misin", "gösterir", "göster", "ver", "lazım")
+REQUEST_BONUS = 0.5
+
+# Olumsuzlama ve yapamama bildiren ifadeler hızlı yolu kapatır: "spor yapmak
+# istemiyorum", "yürüyüş yapamıyorum", "nefes alamıyorum". Ekler kelime ortasında
+# da aranır; ASCII'ye indirgeme sayesinde "-mıyor/-miyor" ve "-muyor/-müyor" birlikte yakalanır.
+NEGATION_TERMS = ("istemem", "istemez", "yapamam", "alamam", "edemem", "veremem", "değil")
+NEGATION_SUFFIXES = ("mıyor", "müyor")
+
+# Ortak motorda rota adlarıyla çakışmayan iç kategori adları
+_REQUEST_CATEGORY = "_request"
+_NEGATION_CATEGORY = "_negation"
+_NEGATION_SUFFIX_CATEGORY = "_negation_suffix"
+
+DEFAULT_ROUTES = [
+    IntentRoute(
+        "breathing", "BreathingExercise",
+        {"nefes": 2.0, "nefes egzersiz": 1.0, "4-7-8": 2.0, "karın nefes": 1.0, "soluk": 1.5, "panik atak": 1.0},
+        need_boosts={"Stresle başa çıkmak için bir yöntem arıyorum": 0.5},
+        emotion_boosts={"Endişeli": 0.5, "Stresli": 0.5},
+    ),
+    IntentRoute(
+        "meditation", "MeditationSuggestion",
+        {"meditasyon": 2.5, "farkındalık": 1.5, "mindfulness": 2.5, "rehberli": 0.5},
+        need_boosts={"Odaklanmama yardımcı ol": 0.5},
+        emotion_boosts={"Stresli": 0.25, "Endişeli": 0.25},
+    ),
+    IntentRoute(
+        "physical_activity", "PhysicalActivity",
+        {"fiziksel aktivite": 2.5, "yürüyüş": 2.0, "spor": 2.0, "koşu": 2.0, "hareket": 1.5, "esneme": 1.5,
+         "germe": 1.5},
+        need_boosts={"Biraz motivasyona ihtiyacım var": 0.5},
+        emotion_boosts={"Yorgun": 0.5},
+    ),
+    IntentRoute(
+        "self_care", "SelfCareActivities",
+        {"öz bakım": 2.5, "özbakım": 2.5, "kendime iyi bak": 2.0, "kendimi şımart": 2.0, "kendime vakit": 1.5},
+        need_boosts={"Kendimi daha iyi hissetmek istiyorum": 0.5},
+    ),
+    IntentRoute(
+        "professional_help", "ProfessionalHelp",
+        {"psikolog": 2.5, "terapist": 2.5, "terapi": 2.0, "psikiyatrist": 2.5, "profesyonel yardım": 2.5},
+    ),
+]
+
+
+class IntentDecision:
+    """Sınıflandırma sonucu. route None ise mesaj tam agent'a gider."""
+
+    def __init__(self, route: Optional[IntentRoute], scores: Dict[str, float], reason: str):
+        self.route = route
+        self.scores = scores
+        self.reason = reason
+
+    @property
+    def route_name(self) -> str:
+        return self.route.name if self.route is not None else AGENT_ROUTE
+
+    def __repr__(self):
+        return "IntentDecision(route={!r}, reason={!r}, scores={})".format(self.route_name, self.reason, self.scores)
+
+
+class IntentRouter:
+    """
+    Kullanıcı metni + formdaki ihtiyaç/duygu üzerinden rota puanlayan sınıflandırıcı.
+    Metin açık bir istek içeriyor, olumsuzlama içermiyor, en yüksek puan
+    MIN_CONFIDENCE_SCORE'u ve ikinci rotayı MIN_SCORE_MARGIN kadar geçiyor ve
+    metinde en az bir anahtar kelime varsa hızlı yol seçilir.
+    """
+
+    def __init__(self, routes: List[IntentRoute] = None, max_tokens: int = MAX_FAST_PATH_TOKENS,
+                 min_score: float = MIN_CONFIDENCE_SCORE, min_margin: float = MIN_SCORE_MARGIN):
+        self.routes = list(routes if routes is not None else DEFAULT_ROUTES)
+        self.max_tokens = max_tokens
+        self.min_score = min_score
+        self.min_margin = min_margin
+        lexicon = {route.name: tuple(route.keywords) for route in self.routes}
+        lexicon[_REQUEST_CATEGORY] = REQUEST_TERMS
+        lexicon[_NEGATION_CATEGORY] = NEGATION_TERMS
+        lexicon[_NEGATION_SUFFIX_CATEGORY] = NEGATION_SUFFIXES
+        self._matcher = KeywordMatcher(lexicon, infix_categories=(_NEGATION_SUFFIX_CATEGORY,))
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._latency_totals: Dict[str, float] = {}
+
+    def classify(self, user_input: str, emotion_data: Optional[Dict] = None) -> IntentDecision:
+        tokens = tokenize(user_input or "")
+        if not tokens:
+            return IntentDecision(None, {}, "empty")
+        # Kriz sözlüğüyle eşleşen mesajlar hiçbir zaman hızlı yola alınmaz.
+        if detect_crisis(user_input).is_crisis:
+            return IntentDecision(None, {}, "veto")
+        if len(tokens) > self.max_tokens:
+            return IntentDecision(None, {}, "too_long")
+
+        found = self._matcher.find(user_input)
+        if _NEGATION_CATEGORY in found or _NEGATION_SUFFIX_CATEGORY in found:
+            return IntentDecision(None, {}, "negated")
+        if _REQUEST_CATEGORY not in found:
+            return IntentDecision(None, {}, "not_a_request")
+
+        emotion = turkish_casefold((emotion_data or {}).get("selected_emotion") or "")
+        need = turkish_casefold((emotion_data or {}).get("needs") or "")
+        scores: Dict[str, float] = {}
+        keyword_hits: Dict[str, float] = {}
+        for route in self.routes:
+            keyword_score = route.keyword_score(found)
+            keyword_hits[route.name] = keyword_score
+            score = keyword_score + route.need_boosts.get(need, 0.0) + route.emotion_boosts.get(emotion, 0.0)
+            scores[route.name] = score + (REQUEST_BONUS if keyword_score else 0.0)
+
+        ranked: List[Tuple[str, float]] = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best_name, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if not keyword_hits[best_name]:
+            return IntentDecision(None, scores, "no_keyword")
+        if best_score < self.min_score:
+            return IntentDecision(None, scores, "low_score")
+        if best_score - runner_up < self.min_margin:
+            return IntentDecision(None, scores, "ambiguous")
+        route = next(route for route in self.routes if route.name == best_name)
+        return IntentDecision(route, scores, "confident")
+
+    # --- İstatistikler ---
+    def record(self, route_name: str, seconds: float):
+        """Bir turun hangi rotadan ve kaç saniyede yanıtlandığını kaydeder."""
+        with self._lock:
+            self._counts[route_name] = self._counts.get(route_name, 0) + 1
+            self._latency_totals[route_name] = self._latency_totals.get(route_name, 0.0) + seconds
+
+    def report(self) -> Dict[str, object]:
+        """
+        Rota başına isabet sayısı/oranı ve ortalama gecikme ile hızlı yolun
+        agent'a göre kazandırdığı tahmini toplam süreyi döndürür.
+        """
+        with self._lock:
+            counts = dict(self._counts)
+            totals = dict(self._latency_totals)
+        total = sum(counts.values())
+        routes = {
+            name: {
+                "hits": count,
+                "hit_rate": round(count / total, 3) if total else 0.0,
+                "avg_latency_seconds": round(totals[name] / count, 3) if count else 0.0,
+            }
+            for name, count in sorted(counts.items())
+        }
+        agent_count = counts.get(AGENT_ROUTE, 0)
+        fast_count = total - agent_count
+        saved = 0.0
+        if agent_count and fast_count:
+            agent_avg = totals[AGENT_ROUTE] / agent_count
+            fast_total = sum(seconds for name, seconds in totals.items() if name != AGENT_ROUTE)
+            saved = agent_avg * fast_count - fast_total
+        return {
+            "total_turns": total,
+            "fast_path_rate": round(fast_count / total, 3) if total else 0.0,
+            "routes": routes,
+            "estimated_seconds_saved": round(saved, 2),
+        }
+
+
+# Hızlı yol yanıtlarında araç çıktısının önüne eklenen kısa, şablon açılışlar
+TEMPLATE_OPENERS = {
+    "endişeli": "Endişeli hissettiğini duyduğuma üzüldüm; bu his çok anlaşılır.",
+    "stresli": "Stresin ağırlığını hissettiğin bir dönemdesin gibi görünüyor; bunu fark etmen bile önemli.",
+    "üzgün": "Üzgün hissetmen çok insani, burada seninleyim.",
+    "yorgun": "Yorgunluğunu hissedebiliyorum; kendine nazik davranmayı hak ediyorsun.",
+    "kızgın": "Öfke hissetmek anlaşılır; onu sakince fark etmek iyi bir başlangıç.",
+}
+DEFAULT_OPENER = "Bunu istemen çok güzel; kendine zaman ayırman önemli."
+TEMPLATE_CLOSING = "Kendini nasıl hissedersen hisset, burada seni desteklemeye devam edeceğim."
+
+
+def template_response(tool_output: str, emotion_data: Optional[Dict] = None) -> str:
+    """Araç çıktısını LLM çağrısı olmadan kısa bir açılış ve kapanışla sarar."""
+    emotion = turkish_casefold((emotion_data or {}).get("selected_emotion") or "")
+    opener = TEMPLATE_OPENERS.get(emotion, DEFAULT_OPENER)
+    return "{}\n{}\n{}".format(opener, tool_output.strip("\n"), TEMPLATE_CLOSING)
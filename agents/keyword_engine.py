@@ -0,0 +1,117 @@
+# ai-emotion-support/agents/keyword_engine.py
+# Araçların ve planlayıcının ortak kullandığı anahtar kelime motoru.
+# Merkezi sözlükteki tüm terimler açılışta tek bir Aho-Corasick otomatına derlenir;
+# bir mesaj, sözlük ne kadar büyürse büyüsün tek geçişte (O(n)) taranır ve eşleşen
+# tüm kategoriler birlikte döner. Metin ve terimler Türkçe kurallarıyla küçük harfe
+# çevrilip ASCII'ye indirgenir (bkz. rag.text_normalize.ascii_fold); böylece "STRES",
+# "Endişe" ve "endise" aynı şekilde eşleşir.
+#
+# Terimler kelime başından eşleşir ve ek alabilir: "stres" -> "stresliyim",
+# "kötü" -> "kötüyüm"; ancak "anksiyete" içindeki "siyet" gibi kelime ortası eşleşmez.
+# Ek aramak için derlenen kategoriler (infix_categories) kelime ortasında da eşleşir.
+from collections import deque
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+from rag.text_normalize import ascii_fold
+
+# Kategori -> terimler. Yeni terimler buraya eklenir; tarama maliyeti terim sayısıyla artmaz.
+LEXICON: Dict[str, Tuple[str, ...]] = {
+    "stress": ("stres", "gergin", "baskı altında", "bunaldım"),
+    "anxiety": ("endişe", "kaygı", "korku", "korkuyorum", "anksiyete", "panik"),
+    "sadness": ("üzgün", "üzüntü", "depresif", "kötü", "mutsuz", "ağlıyorum"),
+    "low_energy": ("yorgun", "enerji", "bitkin", "halsiz", "tükenmiş"),
+    "high_energy": ("aktif", "hareket"),
+    "motivation": ("motivasyon", "enerji", "isteksiz", "erteliyorum"),
+}
+
+
+class KeywordMatcher:
+    """
+    Kategori -> terimler sözlüğünden derlenen Aho-Corasick otomatı.
+    Örnekler iş parçacıkları arasında paylaşılabilir; derlemeden sonra değişmez.
+    infix_categories içindeki kategorilerin terimleri kelime ortasında da eşleşir
+    (örn. olumsuzluk eki "-mıyor": "yapamıyorum", "istemiyorum").
+    """
+
+    def __init__(self, lexicon: Dict[str, Iterable[str]], infix_categories: Iterable[str] = ()):
+        # Durum 0 köktür. _goto[durum][karakter] -> sonraki durum
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Durumda biten terimler: (terim uzunluğu, kategori, özgün terim)
+        self._outputs: List[List[Tuple[int, str, str]]] = [[]]
+        self.categories = tuple(lexicon)
+        self._infix = frozenset(infix_categories)
+        for category, terms in lexicon.items():
+            for term in terms:
+                self._add(ascii_fold(term).strip(), category, term)
+        self._build_failure_links()
+
+    def _add(self, folded: str, category: str, term: str):
+        if not folded:
+            return
+        state = 0
+        for char in folded:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append((len(folded), category, term))
+
+    def _build_failure_links(self):
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                # Sonek terimlerin çıktıları da bu durumda raporlanır
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def find(self, text: str) -> Dict[str, List[str]]:
+        """Metni tek geçişte tarar; kategori -> eşleşen terimler (sözlükteki yazımıyla) döndürür."""
+        folded = ascii_fold(text or "")
+        goto, fail, outputs, infix = self._goto, self._fail, self._outputs, self._infix
+        found: Dict[str, List[str]] = {}
+        state = 0
+        for index, char in enumerate(folded):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, category, term in outputs[state]:
+                start = index - length + 1
+                # Yalnızca kelime başından başlayan eşleşmeler sayılır
+                if start and folded[start - 1].isalnum() and category not in infix:
+                    continue
+                terms = found.setdefault(category, [])
+                if term not in terms:
+                    terms.append(term)
+        return found
+
+    def match_categories(self, text: str) -> FrozenSet[str]:
+        return frozenset(self.find(text))
+
+
+_DEFAULT_MATCHER = KeywordMatcher(LEXICON)
+
+
+@lru_cache(maxsize=512)
+def match_categories(text: str) -> FrozenSet[str]:
+    """
+    Merkezi sözlükle eşleşen kategorileri döndürür. Aynı mesaj hem planlayıcı hem
+    araçlar tarafından sorulduğunda tarama bir kez yapılır.
+    """
+    return _DEFAULT_MATCHER.match_categories(text)
+
+
+def find_keywords(text: str) -> Dict[str, List[str]]:
+    """Merkezi sözlükle eşleşen kategorileri ve terimleri döndürür."""
+    return _DEFAULT_MATCHER.find(text)
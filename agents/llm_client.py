@@ -0,0 +1,162 @@
+# ai-emotion-support/agents/llm_client.py
+# Sohbet modelinin önüne konan dayanıklılık katmanı (bkz. rag/resilience.py):
+# süreç başına sınırlı eşzamanlı istek, tekrar denenebilir hatalarda jitter'lı
+# yeniden deneme, kesintide hızlı hata veren devre kesici ve kuyruk/gecikme
+# metrikleri. ResilientChatModel bir BaseChatModel olduğu için agent, özetleyici
+# ve hızlı yol onu doğrudan kullanır. SimulatedChatModel gecikme ve hata enjekte
+# eden yerel sahte modeldir; katman ağ olmadan denenebilir.
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, Field, PrivateAttr
+
+from rag.embedding_scheduler import SimulatedRateLimitError
+from rag.resilience import CircuitBreaker, ResiliencePolicy
+
+# Süreç genelinde LLM'e aynı anda giden en fazla istek, deneme başına süre sınırı,
+# yeniden deneme sayısı ve devre kesicinin açılması için gereken ardışık hata sayısı
+LLM_MAX_IN_FLIGHT = int(os.getenv("AGENT_LLM_MAX_IN_FLIGHT", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("AGENT_LLM_TIMEOUT", "15"))
+LLM_MAX_RETRIES = int(os.getenv("AGENT_LLM_MAX_RETRIES", "2"))
+LLM_CIRCUIT_FAILURES = int(os.getenv("AGENT_LLM_CIRCUIT_FAILURES", "5"))
+
+
+_shared_policy: Optional[ResiliencePolicy] = None
+_shared_policy_lock = threading.Lock()
+
+
+def create_llm_policy() -> ResiliencePolicy:
+    return ResiliencePolicy(
+        "llm",
+        max_in_flight=LLM_MAX_IN_FLIGHT,
+        max_retries=LLM_MAX_RETRIES,
+        attempt_timeout=LLM_TIMEOUT_SECONDS,
+        breaker=CircuitBreaker(failure_threshold=LLM_CIRCUIT_FAILURES),
+    )
+
+
+def shared_llm_policy() -> ResiliencePolicy:
+    """Süreç genelinde tek LLM politikası; eşzamanlılık sınırı tüm modellerce paylaşılır."""
+    global _shared_policy
+    with _shared_policy_lock:
+        if _shared_policy is None:
+            _shared_policy = create_llm_policy()
+        return _shared_policy
+
+
+class ResilientChatModel(BaseChatModel):
+    """
+    Herhangi bir sohbet modelini ResiliencePolicy altında çalıştıran sarmalayıcı.
+    bind(functions=...) ile verilen argümanlar alttaki modele aynen iletilir.
+    Akışta (stream) yeniden deneme yalnızca ilk parça gelmeden önce yapılır;
+    kullanıcıya yarım yanıt gösterildikten sonra tekrar denenmez.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    inner: BaseChatModel
+    policy: ResiliencePolicy = Field(default_factory=shared_llm_policy, exclude=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return "resilient-" + self.inner._llm_type
+
+    def _should_stream(self, *, async_api: bool, run_manager=None, **kwargs: Any) -> bool:
+        # Alttaki model akışı desteklemiyorsa tek parça (invoke) yoluna düşülür.
+        return self.inner._should_stream(async_api=async_api, run_manager=run_manager, **kwargs)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        return self.policy.call(self.inner._generate, messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        return await self.policy.acall(self.inner._agenerate, messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        def open_stream():
+            # İlk parça politika altında alınır (eşzamanlılık sınırı ve yeniden deneme
+            # ilk parçaya kadar geçerlidir); kalan parçalar aynı akıştan okunur.
+            chunks = self.inner._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return chunks, next(chunks, None)
+
+        chunks, first = self.policy.call(open_stream)
+        if first is None:
+            return
+        yield first
+        yield from chunks
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async def open_stream():
+            chunks = self.inner._astream(messages, stop=stop, run_manager=run_manager, **kwargs).__aiter__()
+            try:
+                return chunks, await chunks.__anext__()
+            except StopAsyncIteration:
+                return chunks, None
+
+        chunks, first = await self.policy.acall(open_stream)
+        if first is None:
+            return
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    def report(self):
+        return self.policy.report()
+
+
+class SimulatedChatModel(BaseChatModel):
+    """
+    Dayanıklılık katmanını denemek için yerel sahte sohbet modeli. Her çağrıda
+    `latency` saniye bekler; `error_rate` olasılıkla (veya ilk `fail_first`
+    çağrıda) SimulatedRateLimitError fırlatır. Yanıtlar `responses` listesinden
+    sırayla döner.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    responses: List[str] = Field(default_factory=lambda: ["Seni duyuyorum, buradayım."])
+    latency: float = 0.05
+    error_rate: float = 0.0
+    fail_first: int = 0
+    seed: Optional[int] = None
+    calls: int = 0
+
+    _random: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._random = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated-chat"
+
+    def _next_response(self) -> str:
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+            fail = call <= self.fail_first or self._random.random() < self.error_rate
+        time.sleep(self.latency)
+        if fail:
+            raise SimulatedRateLimitError("429 Resource has been exhausted (simulated)")
+        return self.responses[(call - 1) % len(self.responses)]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._next_response()))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for word in self._next_response().split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
@@ -0,0 +1,378 @@
+# ai-emotion-support/agents/local_store.py
+# Firestore istemcisinin yerel karşılığı. firebase_db'deki tüm fonksiyonlar
+# `db_client` parametresi üzerinden çalıştığı için, aynı arayüzü (collection /
+# document / set / get / delete / batch / where / order_by / start_after / limit /
+# stream / count / list_documents) sunan bu istemci verildiğinde uygulama kimlik
+# bilgisi ve ağ olmadan çalışır. Belgeler bellekte veya bir SQLite dosyasında
+# tutulur; `latency` ile her uzak çağrıya (RPC) yapay gecikme eklenerek depolama
+# maliyeti tur akışı içinde ölçülebilir. Seçim firebase_db.initialize_storage()
+# içinde STORAGE_BACKEND ile yapılır.
+import copy
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from firebase_admin import firestore
+
+from .history_cache import dump_entry, load_entry
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+def _parent(path: str) -> str:
+    return path.rsplit("/", 1)[0]
+
+
+# --- Belge depoları ---
+class _MemoryDocuments:
+    """Koleksiyon yolu -> {belge kimliği: veri}."""
+
+    def __init__(self):
+        self._collections: Dict[str, Dict[str, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[dict]:
+        with self._lock:
+            return self._collections.get(_parent(path), {}).get(path.rsplit("/", 1)[1])
+
+    def children(self, collection_path: str) -> List[Tuple[str, dict]]:
+        with self._lock:
+            return list(self._collections.get(collection_path, {}).items())
+
+    def apply(self, writes: List[Tuple[str, Optional[dict]]]):
+        """Yazmaları tek seferde uygular; veri None ise belge silinir."""
+        with self._lock:
+            for path, data in writes:
+                parent, doc_id = path.rsplit("/", 1)
+                if data is None:
+                    self._collections.get(parent, {}).pop(doc_id, None)
+                else:
+                    self._collections.setdefault(parent, {})[doc_id] = copy.deepcopy(data)
+
+
+class _SqliteDocuments:
+    """Belgeleri (yol, üst koleksiyon, JSON veri) satırları olarak WAL modlu SQLite'ta tutar."""
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " path TEXT PRIMARY KEY, parent TEXT NOT NULL, data TEXT NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS documents_by_parent ON documents (parent);"
+            )
+
+    def get(self, path: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM documents WHERE path = ?", (path,)).fetchone()
+        return load_entry(row[0]) if row else None
+
+    def children(self, collection_path: str) -> List[Tuple[str, dict]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, data FROM documents WHERE parent = ?", (collection_path,)
+            ).fetchall()
+        return [(path.rsplit("/", 1)[1], load_entry(data)) for path, data in rows]
+
+    def apply(self, writes: List[Tuple[str, Optional[dict]]]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for path, data in writes:
+                    if data is None:
+                        self._conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+                    else:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO documents (path, parent, data) VALUES (?, ?, ?)",
+                            (path, _parent(path), dump_entry(data)),
+                        )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+# --- Firestore benzeri istemci ---
+class LocalFirestoreClient:
+    """
+    firebase_db fonksiyonlarının kullandığı Firestore alt kümesinin yerel uygulaması.
+    path verilmezse belgeler bellekte, verilirse o SQLite dosyasında tutulur.
+    Her RPC (get, set, commit, sorgu, sayfa listeleme, sayma) `latency` saniye sürer.
+    """
+
+    def __init__(self, path: Optional[str] = None, latency: float = 0.0):
+        self.backend = "sqlite" if path else "memory"
+        self._documents = _SqliteDocuments(path) if path else _MemoryDocuments()
+        self.latency = max(0.0, latency)
+        self._lock = threading.Lock()
+        self.stats = {"rpcs": 0, "reads": 0, "writes": 0, "seconds": 0.0}
+
+    def collection(self, name: str) -> "LocalCollection":
+        return LocalCollection(self, name)
+
+    def batch(self) -> "LocalWriteBatch":
+        return LocalWriteBatch(self)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["seconds"] = round(stats["seconds"], 3)
+        stats["backend"] = self.backend
+        stats["latency_ms"] = round(self.latency * 1000, 1)
+        return stats
+
+    # --- İç ---
+    def _rpc(self, reads: int = 0, writes: int = 0):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.stats["rpcs"] += 1
+            self.stats["reads"] += reads
+            self.stats["writes"] += writes
+            self.stats["seconds"] += self.latency
+
+    def _commit(self, writes: List[Tuple[str, Optional[dict]]]):
+        # Aynı commit'teki tüm sunucu zaman damgaları aynı değeri alır (Firestore gibi).
+        now = datetime.now(timezone.utc)
+        resolved = [
+            (path, None if data is None else {
+                key: now if value is firestore.SERVER_TIMESTAMP else value for key, value in data.items()
+            })
+            for path, data in writes
+        ]
+        self._rpc(writes=len(writes))
+        self._documents.apply(resolved)
+
+
+class LocalDocumentSnapshot:
+    def __init__(self, reference: "LocalDocumentReference", data: Optional[dict]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def get(self, field: str):
+        return (self._data or {}).get(field)
+
+    def to_dict(self) -> Optional[dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class LocalDocumentReference:
+    def __init__(self, client: LocalFirestoreClient, path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[1]
+
+    def collection(self, name: str) -> "LocalCollection":
+        return LocalCollection(self._client, "{}/{}".format(self.path, name))
+
+    def set(self, data: dict):
+        self._client._commit([(self.path, data)])
+
+    def delete(self):
+        self._client._commit([(self.path, None)])
+
+    def get(self) -> LocalDocumentSnapshot:
+        self._client._rpc(reads=1)
+        return LocalDocumentSnapshot(self, self._client._documents.get(self.path))
+
+
+class LocalWriteBatch:
+    def __init__(self, client: LocalFirestoreClient):
+        self._client = client
+        self._writes: List[Tuple[str, Optional[dict]]] = []
+
+    def set(self, reference: LocalDocumentReference, data: dict):
+        self._writes.append((reference.path, data))
+
+    def delete(self, reference: LocalDocumentReference):
+        self._writes.append((reference.path, None))
+
+    def commit(self):
+        if len(self._writes) > 500:
+            raise ValueError("Bir batch en fazla 500 işlem içerebilir ({}).".format(len(self._writes)))
+        self._client._commit(self._writes)
+
+
+class _AggregateResult:
+    def __init__(self, value: int):
+        self.value = value
+
+
+class _CountQuery:
+    def __init__(self, query: "LocalQuery"):
+        self._query = query
+
+    def get(self):
+        count = len(self._query._matching())
+        # Firestore sayma sorgusunu 1000 kayıt başına bir okuma olarak faturalar.
+        self._query._client._rpc(reads=max(1, math.ceil(count / 1000)))
+        return [[_AggregateResult(count)]]
+
+
+class LocalQuery:
+    def __init__(self, client: LocalFirestoreClient, path: str):
+        self._client = client
+        self._path = path
+        self._filters: List[Tuple[str, str, Any]] = []
+        self._order: Optional[Tuple[str, bool]] = None
+        self._start_after = None
+        self._limit: Optional[int] = None
+
+    def _copy(self) -> "LocalQuery":
+        query = LocalQuery(self._client, self._path)
+        query._filters = list(self._filters)
+        query._order, query._start_after, query._limit = self._order, self._start_after, self._limit
+        return query
+
+    def where(self, field_path: str = None, op_string: str = None, value: Any = None, *, filter=None) -> "LocalQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        query = self._copy()
+        query._filters.append((field_path, op_string, value))
+        return query
+
+    def order_by(self, field_path: str, direction: str = firestore.Query.ASCENDING) -> "LocalQuery":
+        query = self._copy()
+        query._order = (field_path, direction == firestore.Query.DESCENDING)
+        return query
+
+    def start_after(self, document_fields_or_snapshot) -> "LocalQuery":
+        query = self._copy()
+        query._start_after = document_fields_or_snapshot
+        return query
+
+    def limit(self, count: int) -> "LocalQuery":
+        query = self._copy()
+        query._limit = count
+        return query
+
+    def count(self) -> _CountQuery:
+        return _CountQuery(self)
+
+    def _matching(self) -> List[Tuple[str, dict]]:
+        docs = self._client._documents.children(self._path)
+        for field, op, value in self._filters:
+            compare = _OPERATORS[op]
+            docs = [(doc_id, data) for doc_id, data in docs if field in data and compare(data[field], value)]
+        if self._order is None:
+            docs.sort(key=lambda item: item[0])
+            return docs
+        field, descending = self._order
+        # Alanı olmayan belgeler sıralı sorguda yer almaz; eşit değerlerde belge kimliği belirleyicidir.
+        docs = [(doc_id, data) for doc_id, data in docs if field in data]
+        docs.sort(key=lambda item: (item[1][field], item[0]), reverse=descending)
+        if self._start_after is not None:
+            if isinstance(self._start_after, LocalDocumentSnapshot):
+                anchor = (self._start_after.get(field), self._start_after.id)
+                key = lambda item: (item[1][field], item[0])
+            else:
+                anchor = self._start_after[field]
+                key = lambda item: item[1][field]
+            docs = [item for item in docs if (key(item) < anchor if descending else key(item) > anchor)]
+        return docs
+
+    def stream(self) -> Iterator[LocalDocumentSnapshot]:
+        docs = self._matching()
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        self._client._rpc(reads=max(1, len(docs)))
+        for doc_id, data in docs:
+            yield LocalDocumentSnapshot(LocalDocumentReference(self._client, "{}/{}".format(self._path, doc_id)), data)
+
+
+class LocalCollection(LocalQuery):
+    def __init__(self, client: LocalFirestoreClient, path: str):
+        super().__init__(client, path)
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: Optional[str] = None) -> LocalDocumentReference:
+        return LocalDocumentReference(self._client, "{}/{}".format(self._path, document_id or uuid.uuid4().hex[:20]))
+
+    def list_documents(self, page_size: Optional[int] = None) -> Iterator[LocalDocumentReference]:
+        doc_ids = sorted(doc_id for doc_id, _ in self._client._documents.children(self._path))
+        page_size = page_size or max(1, len(doc_ids))
+        for start in range(0, len(doc_ids), page_size):
+            self._client._rpc()
+            for doc_id in doc_ids[start:start + page_size]:
+                yield LocalDocumentReference(self._client, "{}/{}".format(self._path, doc_id))
+
+
+def benchmark(turns: int = 200, latency: float = 0.02, path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Tur akışındaki depolama maliyetini yerel istemciyle ölçer: doğrudan kayıt
+    (save_conversation + save_mood_entry) ile arka plan kuyruğuna koymanın tur
+    başına süresi, en yeni kayıtların yüklenmesi ve kullanıcı verisinin silinmesi.
+    """
+    from . import firebase_db
+
+    client = LocalFirestoreClient(path=path, latency=latency)
+    conversation = {"user_message": "Bugün biraz stresliyim.", "ai_response": "Seni duyuyorum.",
+                    "time": firestore.SERVER_TIMESTAMP}
+    mood = {"duygu_siddeti": 3, "selected_emotion": "Stresli", "zaman": firestore.SERVER_TIMESTAMP}
+
+    def per_turn_ms(seconds: float) -> float:
+        return round(seconds / turns * 1000, 3)
+
+    started = time.perf_counter()
+    for _ in range(turns):
+        firebase_db.save_conversation(client, "bench_sync", conversation)
+        firebase_db.save_mood_entry(client, "bench_sync", mood)
+    sync_seconds = time.perf_counter() - started
+
+    queue = firebase_db.WriteBehindQueue(client)
+    started = time.perf_counter()
+    for _ in range(turns):
+        queue.enqueue_turn("bench_queue", conversation, mood)
+    enqueue_seconds = time.perf_counter() - started
+    queue.close()
+
+    rpcs_before = client.report()["rpcs"]
+    started = time.perf_counter()
+    loaded = firebase_db.load_conversations(client, "bench_queue", latest=firebase_db.HISTORY_LATEST_LIMIT)
+    load_seconds = time.perf_counter() - started
+    load_rpcs = client.report()["rpcs"] - rpcs_before
+
+    started = time.perf_counter()
+    firebase_db.delete_user_data(client, "bench_sync")
+    delete_seconds = time.perf_counter() - started
+
+    return {
+        "turns": turns,
+        "latency_ms": round(latency * 1000, 1),
+        "sync_save_ms_per_turn": per_turn_ms(sync_seconds),
+        "queued_save_ms_per_turn": per_turn_ms(enqueue_seconds),
+        "queue": queue.report(),
+        "load_latest_ms": round(load_seconds * 1000, 2),
+        "load_latest_rpcs": load_rpcs,
+        "loaded": len(loaded),
+        "delete_ms": round(delete_seconds * 1000, 2),
+        "client": client.report(),
+    }
+
+
+if __name__ == "__main__":
+    import json
+
+    print(json.dumps(benchmark(), ensure_ascii=False, indent=2))
@@ -0,0 +1,212 @@
+# ai-emotion-support/agents/session_manager.py
+# Kullanıcı başına hafif oturum nesneleri (konuşma belleği + duygu profili) ve
+# bunları tutan sınırlı, LRU tahliyeli havuz. Ağır ve durumsuz kısımlar (LLM
+# istemcisi, araçlar, prompt, AgentExecutor) EmotionalSupportAgent içinde bir
+# kez kurulur ve tüm oturumlarca paylaşılır; her kullanıcının durumu burada tutulur.
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain.memory import ConversationBufferMemory
+
+from .conversation_memory import RollingSummaryMemory, Summarizer
+from .emotion_trend import EmotionTrend
+
+# Havuzda aynı anda tutulacak en fazla oturum ve boşta kalma süresi (saniye)
+DEFAULT_MAX_SESSIONS = 256
+DEFAULT_IDLE_TTL_SECONDS = 30 * 60
+
+# Bellek modu: "summary" (son turlar + artımlı özet, istem boyutu sabit) veya
+# "buffer" (tüm konuşma olduğu gibi; eski davranış)
+MEMORY_MODES = ("summary", "buffer")
+DEFAULT_MEMORY_MODE = os.getenv("AGENT_MEMORY_MODE", "summary").strip().lower()
+
+
+def new_user_profile() -> Dict[str, Any]:
+    return {"emotion_trend": EmotionTrend(), "preferred_support_types": [], "crisis_indicators": []}
+
+
+def new_conversation_memory() -> ConversationBufferMemory:
+    return ConversationBufferMemory(
+        memory_key="chat_history", return_messages=True,
+        output_key="output", input_key="input",
+    )
+
+
+def create_memory(mode: str = None, summarizer: Optional[Summarizer] = None,
+                  on_summary_updated: Optional[Callable[[Dict[str, Any]], None]] = None):
+    """Seçilen moda göre oturum belleği oluşturur."""
+    mode = (mode or DEFAULT_MEMORY_MODE).strip().lower()
+    if mode not in MEMORY_MODES:
+        raise ValueError("Bilinmeyen bellek modu: '{}'. Seçenekler: {}".format(mode, ", ".join(MEMORY_MODES)))
+    if mode == "buffer":
+        return new_conversation_memory()
+    return RollingSummaryMemory(summarizer=summarizer, on_summary_updated=on_summary_updated)
+
+
+class AgentSession:
+    """
+    Tek bir kullanıcının konuşma belleği ve duygu profili. Aynı oturuma gelen
+    istekler `lock` (asenkron API'de `async_lock`) ile sıraya sokulur; farklı
+    oturumlar birbirini beklemez.
+    """
+
+    def __init__(self, user_id: str, memory=None):
+        self.user_id = user_id
+        self.memory = memory if memory is not None else new_conversation_memory()
+        self.user_profile = new_user_profile()
+        self.lock = threading.RLock()
+        self.async_lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def load_conversations(self, conversations: List[dict], summary_state: Optional[Dict[str, Any]] = None):
+        """
+        Kayıtlı konuşmaları (user_message / ai_response) belleğe yeniden yükler.
+        Özetleyen bellek, kayıtlı özetin kapsadığı turları tekrar işlemez. Liste
+        geçmişin son sayfasıysa (firebase_db.HistoryPage) sayfanın `offset`'i kullanılır.
+        """
+        if hasattr(self.memory, "load_history"):
+            self.memory.load_history(conversations, summary_state, offset=getattr(conversations, "offset", 0))
+            return
+        self.memory.clear()
+        for entry in conversations:
+            self.memory.chat_memory.add_user_message(entry["user_message"])
+            self.memory.chat_memory.add_ai_message(entry["ai_response"])
+
+    def load_mood_history(self, mood_history: List[dict]):
+        """Kayıtlı ruh hali geçmişiyle (eskiden yeniye) duygu eğilimini kurar."""
+        self.user_profile["emotion_trend"].seed(mood_history)
+
+    def clear(self):
+        self.memory.clear()
+        self.user_profile = new_user_profile()
+
+
+class SessionPool:
+    """
+    Kullanıcı kimliğine göre AgentSession havuzu.
+
+    - En fazla `max_sessions` oturum tutulur; aşılınca en uzun süredir
+      kullanılmayan (LRU) oturum tahliye edilir.
+    - `idle_ttl` saniyeden uzun süredir kullanılmayan oturumlar her erişimde süpürülür.
+    - Havuzda olmayan (hiç açılmamış veya tahliye edilmiş) bir oturum istendiğinde
+      `loader(user_id)` ile kalıcı depodan konuşmalar okunup bellek yeniden kurulur.
+    - "summary" modunda özet durumu `summary_loader(user_id)` ile okunur ve özet her
+      güncellendiğinde `summary_saver(user_id, state)` ile kalıcı depoya yazılır.
+    - Duygu eğilimi `mood_loader(user_id)` ile okunan ruh hali geçmişinden kurulur.
+    """
+
+    def __init__(self, loader: Optional[Callable[[str], List[dict]]] = None,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS, idle_ttl: float = DEFAULT_IDLE_TTL_SECONDS,
+                 memory_mode: str = None, summarizer: Optional[Summarizer] = None,
+                 summary_loader: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+                 summary_saver: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+                 mood_loader: Optional[Callable[[str], List[dict]]] = None):
+        self.loader = loader
+        self.mood_loader = mood_loader
+        self.memory_mode = memory_mode
+        self.summarizer = summarizer
+        self.summary_loader = summary_loader
+        self.summary_saver = summary_saver
+        self.max_sessions = max(1, max_sessions)
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, AgentSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "rehydrated": 0, "evicted_lru": 0, "evicted_idle": 0}
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, user_id: str):
+        return user_id in self._sessions
+
+    def get(self, user_id: str, conversations: Optional[List[dict]] = None,
+            mood_history: Optional[List[dict]] = None) -> AgentSession:
+        """
+        Kullanıcının oturumunu döndürür, yoksa oluşturur. Yeni oturumun belleği
+        verilen `conversations` listesinden, o da yoksa loader'dan doldurulur;
+        duygu eğilimi de aynı şekilde `mood_history` veya mood_loader'dan kurulur.
+        """
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(user_id)
+            if session is not None:
+                self._sessions.move_to_end(user_id)
+                session.touch()
+                self.stats["hits"] += 1
+                return session
+
+        # Depodan okuma havuz kilidi dışında yapılır; yavaş bir Firestore çağrısı
+        # diğer kullanıcıların oturumlarına erişimi bekletmemelidir.
+        session = AgentSession(user_id, memory=self._new_memory(user_id))
+        if conversations is None and self.loader is not None:
+            conversations = self.loader(user_id)
+        if conversations:
+            summary_state = self.summary_loader(user_id) if self.summary_loader is not None else None
+            session.load_conversations(conversations, summary_state)
+            self.stats["rehydrated"] += 1
+        if mood_history is None and self.mood_loader is not None:
+            mood_history = self.mood_loader(user_id)
+        if mood_history:
+            session.load_mood_history(mood_history)
+
+        with self._lock:
+            existing = self._sessions.get(user_id)
+            if existing is not None:
+                # Başka bir istek aynı oturumu bu arada oluşturdu; onunkini kullan.
+                self._sessions.move_to_end(user_id)
+                existing.touch()
+                return existing
+            self._sessions[user_id] = session
+            self._evict_lru()
+        return session
+
+    def _new_memory(self, user_id: str):
+        on_summary_updated = None
+        if self.summary_saver is not None:
+            def on_summary_updated(state):
+                self.summary_saver(user_id, state)
+        return create_memory(self.memory_mode, self.summarizer, on_summary_updated)
+
+    def remove(self, user_id: str) -> bool:
+        """
+        Oturumu havuzdan çıkarır (örn. kullanıcı verisi silindiğinde). Belleği de
+        temizlenir; arka planda süren bir özet katlaması sonucunu kaydetmez.
+        """
+        with self._lock:
+            session = self._sessions.pop(user_id, None)
+        if session is None:
+            return False
+        session.memory.clear()
+        return True
+
+    def _evict_idle(self):
+        if not self.idle_ttl:
+            return
+        now = time.monotonic()
+        # OrderedDict kullanım sırasına göre tutulduğu için en eski oturumlar baştadır.
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used < self.idle_ttl:
+                break
+            del self._sessions[user_id]
+            self.stats["evicted_idle"] += 1
+
+    def _evict_lru(self):
+        # Şu anda bir istek işleyen oturumlar atlanır; en eski boştaki oturum tahliye edilir.
+        skipped = 0
+        while len(self._sessions) > self.max_sessions and skipped < len(self._sessions):
+            user_id, session = next(iter(self._sessions.items()))
+            if not session.lock.acquire(blocking=False):
+                self._sessions.move_to_end(user_id)
+                skipped += 1
+                continue
+            session.lock.release()
+            del self._sessions[user_id]
+            self.stats["evicted_lru"] += 1
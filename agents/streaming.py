@@ -0,0 +1,45 @@
+# ai-emotion-support/agents/streaming.py
+# Agent yanıtını parça parça arayüze taşımak için olay (event) tipleri ve
+# LangChain callback'lerini bir kuyruğa aktaran işleyici. Agent yürütmesi ayrı
+# bir iş parçacığında çalışır; arayüz tarafı kuyruktan gelen olayları tüketir.
+import queue
+from typing import Any, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Olay tipleri
+EVENT_TOKEN = "token"            # {"type": "token", "text": "..."}
+EVENT_TOOL_START = "tool_start"  # {"type": "tool_start", "name": "...", "input": "..."}
+EVENT_TOOL_END = "tool_end"      # {"type": "tool_end", "name": "..."}
+EVENT_DONE = "done"              # {"type": "done", "result": {... process_user_input çıktısı ...}}
+EVENT_CRISIS = "crisis"          # {"type": "crisis", "text": "..."}  akut kriz kaynakları, LLM'den önce
+
+# Kuyrukta yürütmenin bittiğini bildiren işaret
+_END_OF_STREAM = object()
+
+
+class QueueCallbackHandler(BaseCallbackHandler):
+    """LLM token'larını ve araç çağrılarını olay sözlükleri olarak kuyruğa yazar."""
+
+    def __init__(self, events: "queue.Queue"):
+        self.events = events
+        self._tool_names: Dict[Any, str] = {}
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if token:
+            self.events.put({"type": EVENT_TOKEN, "text": token})
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id=None, **kwargs: Any) -> None:
+        name = (serialized or {}).get("name", "araç")
+        self._tool_names[run_id] = name
+        self.events.put({"type": EVENT_TOOL_START, "name": name, "input": input_str})
+
+    def on_tool_end(self, output: Any, *, run_id=None, **kwargs: Any) -> None:
+        self.events.put({"type": EVENT_TOOL_END, "name": self._tool_names.pop(run_id, "araç")})
+
+    def finish(self):
+        self.events.put(_END_OF_STREAM)
+
+
+def is_end_of_stream(item: Optional[Any]) -> bool:
+    return item is _END_OF_STREAM
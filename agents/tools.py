@@ -3,6 +3,8 @@ from typing import List, Dict, Any
 import json
 import random
 
+from .keyword_engine import match_categories
+
 def suggest_meditation_tool(input_text: str) -> str:
     """
     Kullanıcıya empatik bir yanıt verildikten ve duygusal durumu anlaşıldıktan SONRA,
@@ -43,12 +45,12 @@ def suggest_meditation_tool(input_text: str) -> str:
     # Girdi metnine göre uygun meditasyonu seç
     selected_meditation = meditations["genel"]  # varsayılan
     
-    input_lower = input_text.lower()
-    if "stres" in input_lower or "gergin" in input_lower:
+    categories = match_categories(input_text)
+    if "stress" in categories:
         selected_meditation = meditations["stres"]
-    elif "endişe" in input_lower or "kaygı" in input_lower or "korku" in input_lower:
+    elif "anxiety" in categories:
         selected_meditation = meditations["endişe"]
-    elif "üzgün" in input_lower or "depresif" in input_lower or "kötü" in input_lower:
+    elif "sadness" in categories:
         selected_meditation = meditations["üzüntü"]
     
     return f"""
@@ -137,10 +139,10 @@ def suggest_physical_activity(input_text: str) -> str:
     }
     
     # Girdi metnine göre enerji seviyesini tahmin et
-    input_lower = input_text.lower()
-    if "yorgun" in input_lower or "enerji" in input_lower or "bitkin" in input_lower:
+    categories = match_categories(input_text)
+    if "low_energy" in categories:
         energy_level = "düşük_enerji"
-    elif "aktif" in input_lower or "hareket" in input_lower:
+    elif "high_energy" in categories:
         energy_level = "yüksek_enerji"
     else:
         energy_level = "orta_enerji"
@@ -28,8 +28,9 @@ from streamlit_lottie import st_lottie
 import streamlit.components.v1 as components
 
 # firebase_db'den sadece fonksiyonları ve initialize_firebase_app'ı import ediyoruz.
-from agents.firebase_db import save_conversation, load_conversations, delete_user_data, save_mood_entry, load_mood_history, firestore, initialize_firebase_app 
+from agents.firebase_db import save_conversation, load_conversations, delete_user_data, save_mood_entry, load_mood_history, firestore, initialize_firebase_app, initialize_storage, save_memory_summary, load_memory_summary, load_history_page, newest_ids, HISTORY_LATEST_LIMIT, HISTORY_PAGE_SIZE, WriteBehindQueue, WRITE_FLUSH_INTERVAL_SECONDS
 from agents.agent_logic import EmotionalSupportAgent 
+from agents.session_manager import SessionPool
 from rag.rag_service import get_rag_retriever, reset_chroma_db
 
 
@@ -38,8 +39,8 @@ from rag.rag_service import get_rag_retriever, reset_chroma_db
 @st.cache_resource
 def setup_firebase_connection():
     """Firebase bağlantısını kurar ve Firestore istemcisini döndürür."""
-    # Firebase bağlantısını başlat
-    db_client = initialize_firebase_app() 
+    # Firebase bağlantısını (veya STORAGE_BACKEND ile seçilen yerel depoyu) başlat
+    db_client = initialize_storage() 
     return db_client 
 
 # Uygulama başladığında Firebase'i başlat ve istemcisini al
@@ -50,10 +51,19 @@ if "db_client" not in st.session_state:
     st.session_state.db_client = firebase_db_client
 
 if st.session_state.db_client is None:
-    st.error("❌ Firebase bağlantısı kurulamadı! Lütfen .env dosyasını ve anahtar yolunu kontrol edin.")
+    st.error("❌ Firebase bağlantısı kurulamadı! Lütfen .env dosyasını ve anahtar yolunu kontrol edin (çevrimdışı çalışmak için STORAGE_BACKEND=memory veya sqlite).")
     st.stop()
 
 
+# --- ARKA PLANDA KAYIT KUYRUĞU ---
+# Tur kayıtları yanıt yolunda beklenmeden toplu olarak yazılır (bkz. firebase_db.WriteBehindQueue).
+@st.cache_resource
+def initialize_write_queue():
+    return WriteBehindQueue(firebase_db_client)
+
+write_queue = initialize_write_queue()
+
+
 # --- AGENT BAŞLATMA (CACHE-UYUMLU) ---
 # Agent'ı Firebase bağlantısı kurulduktan ve hata kontrolü yapıldıktan sonra başlatmalıyız.
 @st.cache_resource
@@ -85,6 +95,24 @@ elif isinstance(agent_instance, Exception):
     st.error(f"❌ Agent başlatılırken bir hata oluştu: {agent_instance}"); st.stop()
 
 
+# --- KULLANICI OTURUM HAVUZU ---
+# Agent (LLM, araçlar, prompt) tüm kullanıcılarca paylaşılır; her kullanıcının
+# konuşma belleği ve profili bu havuzdaki kendi oturumunda tutulur. Tahliye edilen
+# oturumlar tekrar istendiğinde Firestore'daki en yeni konuşmalardan yeniden kurulur.
+# Bellek son turları ve eski turların özetini tutar; özet Firestore'da saklanır.
+@st.cache_resource
+def initialize_session_pool():
+    return SessionPool(
+        loader=lambda user_id: load_conversations(firebase_db_client, user_id, latest=HISTORY_LATEST_LIMIT),
+        summarizer=agent_instance.summarize_conversation,
+        summary_loader=lambda user_id: load_memory_summary(firebase_db_client, user_id),
+        summary_saver=lambda user_id, state: save_memory_summary(firebase_db_client, user_id, state),
+        mood_loader=lambda user_id: load_mood_history(firebase_db_client, user_id, latest=HISTORY_LATEST_LIMIT),
+    )
+
+session_pool = initialize_session_pool()
+
+
 # --- SAYFA YAPILANDIRMASI VE TASARIM ---
 st.set_page_config(
     page_title="AI Destek Aracı",
@@ -264,48 +292,84 @@ def show_emotion_input_form():
         "needs": needs_value
     }
 
+def stream_agent_response(agent, form_data, user_session):
+    """
+    Agent yanıtını token token ekrana yazar ve process_user_input ile aynı biçimdeki
+    sonucu döndürür. Araç çağrıları sırasında kısa bir durum satırı gösterilir.
+    """
+    crisis_placeholder = st.empty()
+    status_placeholder = st.empty()
+    text_placeholder = st.empty()
+    streamed_text = ""
+    response = None
+    for event in agent.stream_user_input(form_data['user_input'], emotion_data=form_data, session=user_session):
+        if event["type"] == "crisis":
+            # Kriz kaynakları LLM yanıtı beklenmeden gösterilir ve araç çağrılarında silinmez.
+            crisis_placeholder.markdown(event["text"])
+        elif event["type"] == "token":
+            streamed_text += event["text"]
+            text_placeholder.markdown(streamed_text + "▌")
+        elif event["type"] == "tool_start":
+            # Araçtan önce üretilen metin ara düşüncedir; nihai yanıt araçtan sonra gelir.
+            streamed_text = ""
+            text_placeholder.empty()
+            status_placeholder.caption(f"🔧 {event['name']} kullanılıyor...")
+        elif event["type"] == "tool_end":
+            status_placeholder.empty()
+        elif event["type"] == "done":
+            response = event["result"]
+    # Nihai yanıt show_agent_response() tarafından gösterilir.
+    crisis_placeholder.empty()
+    status_placeholder.empty()
+    text_placeholder.empty()
+    return response
+
+def save_agent_turn(form_data, response):
+    """Tamamlanan yanıtı Firestore'a ve session_state'e kaydeder."""
+    st.session_state.last_response = response
+    
+    current_user_id = st.session_state.user_id
+    
+    
+    # --- VERİTABANI KAYIT BAŞLANGICI ---
+    conversation_entry = {
+        "user_id": current_user_id,
+        "user_message": form_data['user_input'],
+        "ai_response": response['response'],
+        "time": firestore.SERVER_TIMESTAMP 
+    }
+
+    mood_entry = {
+        "user_id": current_user_id,
+        "zaman": firestore.SERVER_TIMESTAMP,
+        "duygu_siddeti": form_data['intensity'],
+        "selected_emotion": form_data['selected_emotion']
+    }
+    # Kayıtlar arka plandaki kuyruğa konur; yanıt Firestore'u beklemeden gösterilir.
+    write_queue.enqueue_turn(current_user_id, conversation_entry, mood_entry)
+    # --- VERİTABANI KAYIT SONU ---
+
+    # Streamlit session_state'e de kaydetmeye devam et (arayüzde anlık göstermek için)
+    if 'history' not in st.session_state: st.session_state.history = []
+    st.session_state.history.append({"user": form_data['user_input'], "ai": response['response'], "time": datetime.now()})
+    
+    if 'mood_history' not in st.session_state: st.session_state.mood_history = []
+    st.session_state.mood_history.append({
+        "zaman": datetime.now(),
+        "duygu_siddeti": form_data['intensity'],
+        "selected_emotion": form_data['selected_emotion']
+    })
+    # Session state güncellendi
+
 def process_agent_response(agent, form_data): # Burada 'agent' parametresini kullanmaya devam ediyoruz, bu iyi
     if st.button("💙 Agent'tan Destek Al", type="primary", use_container_width=True, disabled=not form_data['user_input'].strip()):
-        with st.spinner("🤖 Agent düşünüyor..."):
-            response = agent.process_user_input(form_data['user_input'], emotion_data=form_data)
-            if response['success']:
-                st.session_state.last_response = response
-                
-                current_user_id = st.session_state.user_id
-                
-                
-                # --- VERİTABANI KAYIT BAŞLANGICI ---
-                conversation_entry = {
-                    "user_id": current_user_id,
-                    "user_message": form_data['user_input'],
-                    "ai_response": response['response'],
-                    "time": firestore.SERVER_TIMESTAMP 
-                }
-                save_success_conv = save_conversation(st.session_state.db_client, current_user_id, conversation_entry) 
-
-                mood_entry = {
-                    "user_id": current_user_id,
-                    "zaman": firestore.SERVER_TIMESTAMP,
-                    "duygu_siddeti": form_data['intensity'],
-                    "selected_emotion": form_data['selected_emotion']
-                }
-                save_success_mood = save_mood_entry(st.session_state.db_client, current_user_id, mood_entry)
-                # --- VERİTABANI KAYIT SONU ---
-
-                # Streamlit session_state'e de kaydetmeye devam et (arayüzde anlık göstermek için)
-                if 'history' not in st.session_state: st.session_state.history = []
-                st.session_state.history.append({"user": form_data['user_input'], "ai": response['response'], "time": datetime.now()})
-                
-                if 'mood_history' not in st.session_state: st.session_state.mood_history = []
-                st.session_state.mood_history.append({
-                    "zaman": datetime.now(),
-                    "duygu_siddeti": form_data['intensity'],
-                    "selected_emotion": form_data['selected_emotion']
-                })
-                # Session state güncellendi
-
-            else:
-                st.error(response.get('fallback_response', "Bir hata oluştu."))
+        user_session = session_pool.get(st.session_state.user_id)
+        # Yanıt akış halinde gösterilir; kayıt işlemleri akış tamamlandıktan sonra yapılır.
+        response = stream_agent_response(agent, form_data, user_session)
+        if response and response['success']:
+            save_agent_turn(form_data, response)
+        else:
+            st.error((response or {}).get('fallback_response', "Bir hata oluştu."))
 
 def show_agent_response():
     if 'last_response' in st.session_state and st.session_state.last_response:
@@ -351,42 +415,105 @@ if "user_id" not in st.session_state:
 # Kullanıcı ID'si ayarlandı
 
 
+# --- GEÇMİŞ YÜKLEME ---
+# Açılışta yalnızca en yeni HISTORY_LATEST_LIMIT kayıt okunur; daha eskileri
+# istenince imleçle (cursor) sayfa sayfa, başka bir sekmede eklenenler ise son
+# okunan kaydın zamanından sonrası (since) sorgulanarak getirilir.
+def _local_time(value):
+    return value.replace(tzinfo=None) if hasattr(value, 'replace') else datetime.fromtimestamp(value.timestamp())
+
+def _to_history_entry(entry):
+    return {"user": entry['user_message'], "ai": entry['ai_response'], "time": _local_time(entry['time'])}
+
+def _to_mood_entry(entry):
+    return {
+        "zaman": _local_time(entry['zaman']),
+        "duygu_siddeti": entry['duygu_siddeti'],
+        "selected_emotion": entry.get('selected_emotion', 'Belirsiz')
+    }
+
+# (session_state anahtarı, Firestore alt koleksiyonu, zaman alanı, dönüştürücü)
+HISTORY_SOURCES = {
+    "history": ("conversations", "time", _to_history_entry),
+    "mood_history": ("mood_history", "zaman", _to_mood_entry),
+}
+
+def _remember_page(key, page):
+    # Daha eski sayfalar için imleç ve delta senkronizasyonu için en yeni kaydın sunucu zamanı
+    _, time_field, _ = HISTORY_SOURCES[key]
+    st.session_state[key + "_cursor"] = page.cursor
+    st.session_state[key + "_has_more"] = page.has_more
+    st.session_state[key + "_synced_until"] = page[-1][time_field] if page else None
+    # synced_until zamanını taşıyan belgeler; delta okumasında tekrar gelirler ve ayıklanırlar
+    st.session_state[key + "_synced_ids"] = newest_ids(page, time_field)
+    # Bu noktadan sonra listeye eklenenler yalnızca yerel kopyadır (sunucu zamanı bilinmiyor)
+    st.session_state[key + "_synced_len"] = len(st.session_state[key])
+
+def load_older_history(key):
+    collection, time_field, convert = HISTORY_SOURCES[key]
+    cursor = st.session_state.get(key + "_cursor")
+    if cursor is None or not st.session_state.db_client:
+        return
+    try:
+        page = load_history_page(st.session_state.db_client, st.session_state.user_id, collection, time_field,
+                                 page_size=HISTORY_PAGE_SIZE, start_after=cursor, newest_first=True)
+    except Exception as e:
+        st.warning(f"Eski kayıtlar yüklenemedi: {e}")
+        return
+    st.session_state[key] = [convert(entry) for entry in page] + st.session_state[key]
+    st.session_state[key + "_cursor"] = page.cursor
+    st.session_state[key + "_has_more"] = page.has_more
+    st.session_state[key + "_synced_len"] += len(page)
+
+def sync_new_history(key):
+    collection, time_field, convert = HISTORY_SOURCES[key]
+    # Kuyrukta bekleyen kendi kayıtlarımız da sunucudan gelsin
+    write_queue.flush(timeout=WRITE_FLUSH_INTERVAL_SECONDS + 2)
+    since = st.session_state.get(key + "_synced_until")
+    loader = load_conversations if key == "history" else load_mood_history
+    if since is None:
+        page = loader(st.session_state.db_client, st.session_state.user_id, latest=HISTORY_LATEST_LIMIT)
+        st.session_state[key] = [convert(entry) for entry in page]
+        _remember_page(key, page)
+        return
+    seen_ids = st.session_state.get(key + "_synced_ids") or []
+    page = loader(st.session_state.db_client, st.session_state.user_id, since=since, seen_ids=seen_ids)
+    if not page:
+        return
+    # Yerel kopyalar, sunucudan gelen (aynı kayıtların kalıcı) sürümleriyle değiştirilir.
+    synced = st.session_state[key][:st.session_state[key + "_synced_len"]]
+    st.session_state[key] = synced + [convert(entry) for entry in page]
+    newest = page[-1][time_field]
+    boundary = newest_ids(page, time_field)
+    st.session_state[key + "_synced_ids"] = seen_ids + boundary if newest == since else boundary
+    st.session_state[key + "_synced_until"] = newest
+    st.session_state[key + "_synced_len"] = len(st.session_state[key])
+
+
+# Ruh hali geçmişini yükle
+if "mood_history_loaded" not in st.session_state: 
+    loaded_mood_history = load_mood_history(st.session_state.db_client, st.session_state.user_id, latest=HISTORY_LATEST_LIMIT) 
+    st.session_state.mood_history = [_to_mood_entry(entry) for entry in loaded_mood_history]
+    _remember_page("mood_history", loaded_mood_history)
+    st.session_state.mood_history_loaded = True
+
 # Sohbet geçmişini yükle
 # Yükleme işlemleri için de st.session_state.db_client kullanılıyor
 if "history_loaded" not in st.session_state: 
-    loaded_conversations = load_conversations(st.session_state.db_client, st.session_state.user_id) 
+    loaded_conversations = load_conversations(st.session_state.db_client, st.session_state.user_id, latest=HISTORY_LATEST_LIMIT) 
     
-    # YÜKLENEN GEÇMİŞİ LANGCHAIN BELLEĞİNE EKLEME (YENİ VE KRİTİK KISIM)
-    if agent_instance and loaded_conversations: # agent_instance burada kullanılıyor
-        # Belleği temizle (emin olmak için, eğer zaten bir şey varsa)
-        agent_instance.memory.clear() 
-
-        for entry in loaded_conversations:
-            agent_instance.memory.chat_memory.add_user_message(entry['user_message'])
-            agent_instance.memory.chat_memory.add_ai_message(entry['ai_response'])
+    # YÜKLENEN GEÇMİŞİ KULLANICININ OTURUMUNA EKLEME
+    # Oturum havuzda yoksa aynı listelerle kurulur (Firestore'a ikinci kez gidilmez);
+    # varsa (örn. aynı kullanıcının başka bir sekmesi) belleğine dokunulmaz.
+    session_pool.get(
+        st.session_state.user_id, conversations=loaded_conversations,
+        mood_history=st.session_state.mood_history,
+    )
     
-    st.session_state.history = [
-        {
-            "user": entry['user_message'],
-            "ai": entry['ai_response'],
-            "time": entry['time'].replace(tzinfo=None) if hasattr(entry['time'], 'replace') else datetime.fromtimestamp(entry['time'].timestamp())
-        }
-        for entry in loaded_conversations
-    ]
+    st.session_state.history = [_to_history_entry(entry) for entry in loaded_conversations]
+    _remember_page("history", loaded_conversations)
     st.session_state.history_loaded = True
     
-# Ruh hali geçmişini yükle
-if "mood_history_loaded" not in st.session_state: 
-    loaded_mood_history = load_mood_history(st.session_state.db_client, st.session_state.user_id) 
-    st.session_state.mood_history = [
-        {
-            "zaman": entry['zaman'].replace(tzinfo=None) if hasattr(entry['zaman'], 'replace') else datetime.fromtimestamp(entry['zaman'].timestamp()),
-            "duygu_siddeti": entry['duygu_siddeti'],
-            "selected_emotion": entry.get('selected_emotion', 'Belirsiz')
-        }
-        for entry in loaded_mood_history
-    ]
-    st.session_state.mood_history_loaded = True
 
 
 # Agent'ı yükle ve hataları kontrol et (Bu blok aslında yukarıya taşındı, burada tekrar çağırmıyoruz)
@@ -413,7 +540,7 @@ with st.sidebar:
     else:
         st.warning("RAG sistemi aktif değil. 'data' klasöründe belge olmayabilir.")
 
-    st.markdown("Eğer `data` klasörüne yeni belgeler eklediyseniz, aşağıdaki butona tıklayarak veritabanını güncelleyebilirsiniz.")
+    st.markdown("`data` klasörüne eklenen veya değiştirilen belgeler açılışta otomatik olarak indekslenir. Veritabanı bozulduysa aşağıdaki butonla sıfırlayabilirsiniz.")
     
     if st.button("🔄 Veritabanını Sıfırla ve Yenile"):
         with st.spinner("Veritabanı siliniyor..."):
@@ -426,6 +553,19 @@ with st.sidebar:
     
     st.markdown("---")
 
+    # Hızlı yol (agent döngüsünü atlayan yerel yönlendirici) istatistikleri
+    with st.expander("⚡ Yönlendirme İstatistikleri"):
+        st.json(agent_instance.get_routing_report())
+
+    # LLM istemcisi: kuyruk bekleme, üst sistem gecikmesi ve devre kesici durumu
+    with st.expander("🛡️ LLM İstemcisi"):
+        st.json(agent_instance.get_llm_client_report())
+
+    with st.expander("💾 Kayıt Kuyruğu"):
+        st.json(write_queue.report())
+        if hasattr(firebase_db_client, "report"):
+            st.json(firebase_db_client.report())
+
 # --- HEADER BÖLÜMÜ ---
 # Header'ı tek parça olarak oluştur
 st.markdown("""
@@ -520,6 +660,8 @@ elif selected_tab == "Günlük Takip":
                 with st.expander(f"📅 {entry['time'].strftime('%d %B %Y, %H:%M')}"):
                     st.chat_message("user", avatar="👤").write(entry['user'])
                     st.chat_message("assistant", avatar="🤖").write(entry['ai'])
+            if st.session_state.get("history_has_more"):
+                st.button("⏬ Daha eski konuşmaları yükle", on_click=load_older_history, args=("history",), use_container_width=True)
     
     with journal_col2:
         # Lottie animasyonu ekle
@@ -532,11 +674,16 @@ elif selected_tab == "Günlük Takip":
             conversation_count = len(st.session_state.history)
             last_conversation = st.session_state.history[-1]['time'].strftime('%d %B')
             
+            count_label = f"{conversation_count}+" if st.session_state.get("history_has_more") else f"{conversation_count}"
+            
             st.markdown(f"""<div style='background-color: var(--card-bg); padding: 15px; border-radius: 10px; margin-top: 20px; box-shadow: var(--shadow-soft);'>
                 <h4 style='color: var(--accent-color); margin-top: 0;'>📊 İstatistikler</h4>
-                <p><strong>Toplam Konuşma:</strong> {conversation_count}</p>
+                <p><strong>Toplam Konuşma:</strong> {count_label}</p>
                 <p><strong>Son Konuşma:</strong> {last_conversation}</p>
             </div>""", unsafe_allow_html=True)
+        
+        # Başka bir sekmede/cihazda eklenen konuşmaları yalnızca yeni kayıtları okuyarak getir
+        st.button("🔄 Yeni kayıtları getir", on_click=sync_new_history, args=("history",), use_container_width=True)
 
 elif selected_tab == "Analiz & Raporlar":
     # Modern başlık ve açıklama
@@ -576,7 +723,11 @@ elif selected_tab == "Analiz & Raporlar":
             with metrics_col2:
                 st.metric("En Yüksek Şiddet", f"{df['duygu_siddeti'].max()} / 5")
             with metrics_col3:
-                st.metric("Kayıt Sayısı", f"{len(df)}")
+                st.metric("Kayıt Sayısı", f"{len(df)}+" if st.session_state.get("mood_history_has_more") else f"{len(df)}")
+            
+            if st.session_state.get("mood_history_has_more"):
+                st.caption(f"Grafikler yüklenen son {len(df)} kayda dayanır.")
+                st.button("⏬ Daha eski kayıtları yükle", on_click=load_older_history, args=("mood_history",))
             
             # Duygu dağılımı
             st.markdown("""<h4 style='color: var(--accent-color); margin-top: 20px;'>Duygu Dağılımı</h4>""", unsafe_allow_html=True)
@@ -0,0 +1,171 @@
+# rag/context_packer.py
+# Retriever'dan gelen parçaları LLM istemine girmeden önce toparlayan aşama:
+#   1. Aynı kaynaktan gelen bitişik/örtüşen parçaları birleştir (chunk_overlap tekrarlarını at)
+#   2. Maximal Marginal Relevance (MMR) ile çeşitlendir
+#   3. Token bütçesine göre kırp ve kaynak etiketli temiz metin üret
+# Benzerlikler yerel hashed n-gram embedding ile hesaplanır; ağ çağrısı yapılmaz.
+import math
+import os
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .local_embeddings import HashedNgramEmbeddings
+
+# Türkçe metinlerde Gemini tokenizer'ı için kaba ortalama (karakter / token)
+CHARS_PER_TOKEN = 3.5
+# Örtüşme aranırken kullanılan en kısa ortak parça (karakter)
+MIN_OVERLAP_CHARS = 20
+# Bitişik sayılacak iki parça arasındaki en fazla boşluk (splitter'ın attığı "\n\n" gibi)
+MAX_ADJACENT_GAP_CHARS = 4
+# Son parçayı kırpmaya değecek en az kalan bütçe (token)
+MIN_TRUNCATED_TOKENS = 40
+
+_similarity_embedder = HashedNgramEmbeddings(dimensions=512)
+
+
+def estimate_tokens(text: str) -> int:
+    """Metnin yaklaşık token sayısını tahmin eder."""
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def _source_key(document: Document):
+    metadata = document.metadata or {}
+    return metadata.get("source"), metadata.get("page")
+
+
+def _source_tag(document: Document) -> str:
+    source, page = _source_key(document)
+    name = os.path.basename(source) if source else "bilinmeyen kaynak"
+    if page is not None:
+        return "[Kaynak: {}, s. {}]".format(name, int(page) + 1)
+    return "[Kaynak: {}]".format(name)
+
+
+def _merge_text(first: str, second: str) -> Optional[str]:
+    """
+    second'ın başı first'ün sonuyla örtüşüyorsa (splitter'ın chunk_overlap'ı)
+    birleştirilmiş metni, örtüşme yoksa None döndürür.
+    """
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return None
+    position = first.find(probe)
+    while position != -1:
+        tail = first[position:]
+        if second.startswith(tail):
+            return first + second[len(tail):]
+        position = first.find(probe, position + 1)
+    return None
+
+
+def merge_adjacent_chunks(documents: List[Document]) -> List[Document]:
+    """
+    Aynı kaynaktan (ve aynı sayfadan) gelen örtüşen veya bitişik parçaları tek
+    belgede birleştirir. Birleşen grup, içindeki en iyi sıralı parçanın yerini alır.
+    """
+    merged: List[Document] = []
+    for document in documents:
+        text = document.page_content.strip()
+        start = (document.metadata or {}).get("start_index")
+        absorbed = False
+        for index, existing in enumerate(merged):
+            if _source_key(existing) != _source_key(document):
+                continue
+            existing_text = existing.page_content
+            existing_start = existing.metadata.get("start_index")
+            combined = None
+            if start is not None and existing_start is not None:
+                # Konum bilgisi varsa: örtüşen veya yalnızca ayraçla ayrılmış parçalar bitişiktir
+                first, second = (existing_text, text) if existing_start <= start else (text, existing_text)
+                first_start, second_start = min(existing_start, start), max(existing_start, start)
+                gap = second_start - (first_start + len(first))
+                if gap > 0 and gap <= MAX_ADJACENT_GAP_CHARS:
+                    combined = first + "\n\n" + second
+                elif gap <= 0:
+                    combined = first[: second_start - first_start] + second
+                    if len(combined) < len(first):
+                        combined = first
+            else:
+                combined = _merge_text(existing_text, text) or _merge_text(text, existing_text)
+            if existing_text.find(text) != -1:
+                combined = existing_text
+            if combined is not None:
+                metadata = dict(existing.metadata)
+                if start is not None and existing_start is not None:
+                    metadata["start_index"] = min(start, existing_start)
+                merged[index] = Document(page_content=combined, metadata=metadata, id=existing.id)
+                absorbed = True
+                break
+        if not absorbed:
+            merged.append(Document(page_content=text, metadata=dict(document.metadata or {}), id=document.id))
+    return merged
+
+
+def mmr_order(query: str, documents: List[Document], lambda_mult: float = 0.7) -> List[Document]:
+    """
+    Belgeleri Maximal Marginal Relevance sırasına dizer:
+    her adımda  λ·benzerlik(sorgu) − (1−λ)·max benzerlik(seçilenler)  en yüksek olan seçilir.
+    """
+    if len(documents) <= 1:
+        return list(documents)
+    vectors = np.asarray(
+        _similarity_embedder.embed_documents([query] + [d.page_content for d in documents]), dtype=np.float32
+    )
+    query_similarity = vectors[1:] @ vectors[0]
+    pairwise = vectors[1:] @ vectors[1:].T
+    # Retriever sırası da bir alaka sinyalidir; eşitlikleri onun lehine boz.
+    rank_prior = np.linspace(0.01, 0.0, num=len(documents))
+    relevance = query_similarity + rank_prior
+
+    selected: List[int] = []
+    remaining = list(range(len(documents)))
+    while remaining:
+        if selected:
+            redundancy = pairwise[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+        scores = lambda_mult * relevance[remaining] - (1.0 - lambda_mult) * redundancy
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+    return [documents[i] for i in selected]
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Metni token bütçesine sığacak şekilde, mümkünse cümle sonundan keser."""
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    sentence_end = max(cut.rfind(". "), cut.rfind(".\n"), cut.rfind("! "), cut.rfind("? "))
+    if sentence_end > max_chars // 2:
+        return cut[: sentence_end + 1]
+    return cut.rsplit(" ", 1)[0] + " …"
+
+
+def pack_context(query: str, documents: List[Document], token_budget: int = 600,
+                 mmr_lambda: float = 0.7) -> str:
+    """
+    Retriever çıktısını istem için temiz bir metne dönüştürür. Her blok kaynak
+    etiketiyle başlar; toplam uzunluk yaklaşık token_budget token'ı aşmaz.
+    """
+    if not documents:
+        return ""
+    candidates = mmr_order(query, merge_adjacent_chunks(documents), lambda_mult=mmr_lambda)
+    blocks: List[str] = []
+    used = 0
+    for document in candidates:
+        tag = _source_tag(document)
+        text = " ".join(document.page_content.split())
+        cost = estimate_tokens(tag) + estimate_tokens(text) + 1
+        if used + cost <= token_budget:
+            blocks.append("{}\n{}".format(tag, text))
+            used += cost
+            continue
+        remaining_tokens = token_budget - used - estimate_tokens(tag) - 1
+        if remaining_tokens >= MIN_TRUNCATED_TOKENS:
+            blocks.append("{}\n{}".format(tag, _truncate_to_tokens(text, remaining_tokens)))
+        break
+    return "\n\n".join(blocks)
@@ -0,0 +1,212 @@
+# rag/embedding_cache.py
+# Herhangi bir LangChain Embeddings nesnesinin önüne konan iki katmanlı önbellek:
+# bellekte LRU + diskte SQLite. Aynı parça veya sık tekrarlanan sorgular
+# ("çok stresliyim" gibi) için ağ üzerinden tekrar embedding istenmez.
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("rag_service")
+
+# Disk katmanı sınırı aşılınca sınırın bu oranı kadar altına inilir; böylece
+# dolu bir önbellekte silme (ve sayım) her yazmada değil, arada bir yapılır.
+EVICTION_HEADROOM = 0.1
+
+
+def normalize_text(text: str) -> str:
+    """Önbellek anahtarı için metni normalize eder (Unicode NFC + boşluk sadeleştirme)."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_name: str, kind: str, text: str) -> str:
+    """
+    Model adı, embedding türü (document/query) ve normalize edilmiş metinden anahtar üretir.
+    Tür anahtara dahildir, çünkü bazı sağlayıcılar (ör. Google) sorgu ve belge için
+    farklı vektörler döndürür.
+    """
+    payload = "{}\x00{}\x00{}".format(model_name, kind, normalize_text(text))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings sarmalayıcısı. Önce bellekteki LRU katmanına, sonra SQLite dosyasına bakar;
+    ikisinde de yoksa alttaki modeli çağırır ve sonucu iki katmana da yazar.
+    Disk katmanı max_disk_entries'i aşınca en uzun süredir kullanılmayan kayıtlar silinir.
+    Kayıt sayısı bellekte tutulur; COUNT(*) yalnızca açılışta ve silme sırasında çalışır.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: str,
+        cache_path: str,
+        memory_size: int = 1024,
+        max_disk_entries: int = 100_000,
+    ):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.memory_size = memory_size
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)"
+        )
+        self._conn.commit()
+        self._disk_entries = self._count_disk_entries()
+
+    # --- Önbellek katmanları ---
+    def _memory_get(self, key: str) -> Optional[List[float]]:
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+        return vector
+
+    def _memory_put(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _disk_get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        # SQLite parametre sınırına takılmamak için parça parça sorgula
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            rows = self._conn.execute(
+                "SELECT key, vector FROM embeddings WHERE key IN ({})".format(placeholders), part
+            ).fetchall()
+            found.update({key: _unpack(blob) for key, blob in rows})
+        if found:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, k) for k in found]
+            )
+            self._conn.commit()
+        return found
+
+    def _disk_put_many(self, items: Dict[str, List[float]]):
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+            [(key, _pack(vector), now) for key, vector in items.items()],
+        )
+        # Yazılanlar diskte bulunamayan anahtarlardır; aynı dosyayı paylaşan başka bir
+        # süreç araya yazdıysa sayı fazla çıkar, silme sırasında gerçek sayıyla düzeltilir.
+        self._disk_entries += len(items)
+        if self._disk_entries > self.max_disk_entries:
+            self._evict()
+        self._conn.commit()
+
+    def _count_disk_entries(self) -> int:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+    def _evict(self):
+        self._disk_entries = self._count_disk_entries()
+        target = self.max_disk_entries - int(self.max_disk_entries * EVICTION_HEADROOM)
+        overflow = self._disk_entries - target
+        if self._disk_entries > self.max_disk_entries and overflow > 0:
+            deleted = self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            ).rowcount
+            self._disk_entries -= deleted
+            self._counters["evictions"] += deleted
+
+    def _embed_with_cache(self, texts: List[str], kind: str) -> List[List[float]]:
+        keys = [cache_key(self.model_name, kind, text) for text in texts]
+        results: Dict[str, List[float]] = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self._memory_get(key)
+                if vector is not None:
+                    results[key] = vector
+                    self._counters["memory_hits"] += 1
+            pending = [k for k in dict.fromkeys(keys) if k not in results]
+            if pending:
+                from_disk = self._disk_get_many(pending)
+                self._counters["disk_hits"] += len(from_disk)
+                for key, vector in from_disk.items():
+                    self._memory_put(key, vector)
+                results.update(from_disk)
+
+        # Ağ çağrısı kilit dışında yapılır; aynı metin birden çok kez geçse de tek sefer embed edilir.
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in results and key not in missing:
+                missing[key] = text
+        if missing:
+            if kind == "query":
+                fresh = [self.underlying.embed_query(text) for text in missing.values()]
+            else:
+                fresh = self.underlying.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), fresh))
+            with self._lock:
+                self._counters["misses"] += len(computed)
+                for key, vector in computed.items():
+                    self._memory_put(key, vector)
+                self._disk_put_many(computed)
+            results.update(computed)
+
+        return [results[key] for key in keys]
+
+    # --- LangChain Embeddings arayüzü ---
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._embed_with_cache(texts, "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_with_cache([text], "query")[0]
+
+    # --- Gözlem ---
+    def stats(self) -> Dict[str, float]:
+        """İsabet/ıska sayaçlarını ve katman boyutlarını döndürür."""
+        with self._lock:
+            disk_entries = self._disk_entries
+            counters = dict(self._counters)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        counters["hit_rate"] = (
+            (counters["memory_hits"] + counters["disk_hits"]) / lookups if lookups else 0.0
+        )
+        counters["memory_entries"] = len(self._memory)
+        counters["disk_entries"] = disk_entries
+        return counters
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,195 @@
+# rag/embedding_scheduler.py
+# İndeks kurulumunda embedding isteklerini partiler halinde, eşzamanlı ve
+# kota dostu şekilde yürüten zamanlayıcı:
+#   - yapılandırılabilir parti boyutu ve eşzamanlılık
+#   - token bucket ile istek hızı sınırlama
+#   - 429 / geçici hatalarda üstel geri çekilme (jitter'lı) ile yeniden deneme
+# Kaldığı yerden devam etme (checkpoint) ingest_pipeline tarafında, yazılmış
+# partilerin koleksiyonda bulunmasıyla sağlanır.
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("rag_service")
+
+# Sağlayıcıdan bağımsız olarak "tekrar denenebilir" kabul edilen hata sınıfı adları
+# (google.api_core.exceptions ve HTTP istemcilerinin kullandığı adlar).
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "InternalServerError",
+    "GatewayTimeout",
+    "SimulatedRateLimitError",
+}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Hatanın kota/geçici bir hata olup olmadığını tahmin eder."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        return True
+    return "429" in str(error) or "quota" in str(error).lower()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Saniyede `rate` token dolar, en fazla `capacity`
+    token birikir. acquire() yeterli token yoksa bekler.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Token alır; beklenen toplam süreyi (saniye) döndürür."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                sleep_for = (tokens - self._tokens) / self.rate
+            time.sleep(sleep_for)
+            waited += sleep_for
+
+
+class EmbeddingScheduler:
+    """
+    Embeddings nesnesi üzerinde parti tabanlı, eşzamanlı embedding yürütücüsü.
+    Her parti tek bir istek sayılır ve token bucket'tan bir token harcar.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 64,
+        concurrency: int = 4,
+        requests_per_minute: float = 0,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+    ):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(requests_per_minute / 60.0) if requests_per_minute > 0 else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.stats: Dict[str, float] = {"requests": 0, "retries": 0, "throttled_seconds": 0.0}
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            if self.bucket is not None:
+                waited = self.bucket.acquire()
+                with self._lock:
+                    self.stats["throttled_seconds"] += waited
+            with self._lock:
+                self.stats["requests"] += 1
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    raise
+                # Full jitter: [0, min(max_delay, base * 2^attempt)]
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                attempt += 1
+                with self._lock:
+                    self.stats["retries"] += 1
+                logger.warning(
+                    "Embedding isteği başarısız ({}), {:.2f} sn sonra tekrar denenecek ({}/{}).".format(
+                        type(e).__name__, delay, attempt, self.max_retries
+                    )
+                )
+                time.sleep(delay)
+
+    def iter_embed_batches(self, batches: List[List[str]]) -> Iterator[Tuple[int, List[List[float]]]]:
+        """
+        Verilen partileri eşzamanlı olarak embed eder ve tamamlandıkça
+        (parti_sırası, vektörler) üretir. Sıra, tamamlanma sırasıdır.
+        """
+        if self.concurrency == 1 or len(batches) <= 1:
+            for index, texts in enumerate(batches):
+                yield index, self._embed_batch(texts)
+            return
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self._embed_batch, texts): index for index, texts in enumerate(batches)}
+            pending = set(futures)
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield futures[future], future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Metinleri batch_size'lık partilere bölüp sırayı koruyarak embed eder."""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results: List[List[List[float]]] = [None] * len(batches)
+        for index, vectors in self.iter_embed_batches(batches):
+            results[index] = vectors
+        return [vector for batch in results for vector in batch]
+
+
+class SimulatedRateLimitError(Exception):
+    """SimulatedEmbeddings'in ürettiği 429 benzeri hata."""
+
+    code = 429
+
+
+class SimulatedEmbeddings(Embeddings):
+    """
+    Zamanlayıcıyı ağ olmadan denemek için yerel yedek embedding.
+    Her çağrıda `latency` saniye bekler ve `error_rate` olasılıkla (veya
+    `fail_first` kez ardışık olarak) SimulatedRateLimitError fırlatır.
+    Vektörler alttaki embedding nesnesinden gelir.
+    """
+
+    def __init__(self, underlying: Embeddings, latency: float = 0.05, error_rate: float = 0.0,
+                 fail_first: int = 0, seed: int = None):
+        self.underlying = underlying
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fail_first = fail_first
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _maybe_fail(self):
+        with self._lock:
+            self.calls += 1
+            fail = self.calls <= self.fail_first or self._random.random() < self.error_rate
+        time.sleep(self.latency)
+        if fail:
+            raise SimulatedRateLimitError("429 Resource has been exhausted (simulated)")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._maybe_fail()
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self._maybe_fail()
+        return self.underlying.embed_query(text)
@@ -0,0 +1,315 @@
+# rag/flat_index.py
+# Küçük korpuslar için ChromaDB'ye alternatif, bellek eşlemeli (memory-mapped)
+# düz vektör indeksi. Vektörler tek bir .npy matrisinde (float32 veya float16),
+# kimlikler/metinler/metadata ise kompakt bir JSON yan dosyasında tutulur.
+# Açılış np.load(mmap_mode="r") ile kopyasızdır; arama tek bir matris-vektör
+# çarpımı ve argpartition ile yapılır.
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+logger = logging.getLogger("rag_service")
+
+VECTORS_FILENAME = "vectors.npy"
+SIDECAR_FILENAME = "sidecar.json"
+SUPPORTED_DTYPES = ("float32", "float16")
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def _metadata_matches(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """Chroma'nın where sözdiziminin alt kümesi: {alan: değer} veya {alan: {"$eq"|"$ne"|"$in"|"$nin": ...}}."""
+    for key, condition in where.items():
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator == "$eq":
+                matched = value == operand
+            elif operator == "$ne":
+                matched = value != operand
+            elif operator == "$in":
+                matched = value in operand
+            elif operator == "$nin":
+                matched = value not in operand
+            else:
+                raise ValueError("Desteklenmeyen filtre operatörü: '{}'".format(operator))
+            if not matched:
+                return False
+    return True
+
+
+class FlatVectorStore(VectorStore):
+    """
+    NumPy tabanlı düz (brute-force) vektör deposu.
+
+    Vektörler L2-normalize edilerek saklanır, bu yüzden kosinüs benzerliği bir
+    iç çarpımdır. Yazma işlemleri (upsert/delete) bellekte biriktirilir ve flush()
+    ile atomik olarak diske yazılır; indeksleme hattı bunu manifest ile birlikte
+    belirli aralıklarla çağırır. rag_service'in kullandığı Chroma alt kümesiyle
+    (get / delete / upsert_embeddings / embeddings) uyumludur.
+    """
+
+    def __init__(self, directory: str, embedding_function: Embeddings, dtype: str = "float32",
+                 read_only: bool = False):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError("Desteklenmeyen dtype: '{}'. Seçenekler: {}".format(dtype, ", ".join(SUPPORTED_DTYPES)))
+        self.directory = directory
+        self._embedding_function = embedding_function
+        self.dtype = np.dtype(dtype)
+        self.read_only = read_only
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None  # Diskteki (mmap) veya birleştirilmiş matris
+        self._pending: List[np.ndarray] = []  # Henüz matrise katılmamış satır blokları
+        self._alive: Optional[np.ndarray] = None  # Silinmemiş satırlar için maske
+        self._row_of: Dict[str, int] = {}
+        self._filter_masks: Dict[str, np.ndarray] = {}  # Metadata filtresi -> satır maskesi
+        self._dirty = False
+        self._load()
+
+    # --- Disk ---
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.directory, VECTORS_FILENAME)
+
+    @property
+    def sidecar_path(self) -> str:
+        return os.path.join(self.directory, SIDECAR_FILENAME)
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("Düz indeks salt okunur açıldı: {}".format(self.directory))
+
+    def _load(self):
+        if not (os.path.exists(self.vectors_path) and os.path.exists(self.sidecar_path)):
+            return
+        with open(self.sidecar_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        matrix = np.load(self.vectors_path, mmap_mode="r")
+        if matrix.dtype != self.dtype and self.read_only:
+            # Salt okunur modda dönüştürme yapılmaz; dosyadaki tip kullanılır.
+            self.dtype = matrix.dtype
+        elif matrix.dtype != self.dtype:
+            logger.warning(
+                "Düz indeks {} olarak kaydedilmiş, {} istendi; dönüştürülerek belleğe alınıyor.".format(
+                    matrix.dtype, self.dtype
+                )
+            )
+            matrix = np.asarray(matrix, dtype=self.dtype)
+            self._dirty = True
+        self._ids = sidecar["ids"]
+        self._documents = sidecar["documents"]
+        self._metadatas = sidecar["metadatas"]
+        self._matrix = matrix
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        self._row_of = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._filter_masks = {}
+
+    def flush(self):
+        """Bekleyen değişiklikleri sıkıştırıp diske atomik olarak yazar, ardından mmap ile yeniden açar."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._check_writable()
+            self._consolidate()
+            keep = np.flatnonzero(self._alive) if self._alive is not None else np.arange(0)
+            ids = [self._ids[i] for i in keep]
+            sidecar = {
+                "ids": ids,
+                "documents": [self._documents[i] for i in keep],
+                "metadatas": [self._metadatas[i] for i in keep],
+            }
+            if self._matrix is not None:
+                matrix = np.ascontiguousarray(self._matrix[keep], dtype=self.dtype)
+            else:
+                matrix = np.zeros((0, 0), dtype=self.dtype)
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_vectors = self.vectors_path + ".tmp.npy"
+            tmp_sidecar = self.sidecar_path + ".tmp"
+            np.save(tmp_vectors, matrix)
+            with open(tmp_sidecar, "w", encoding="utf-8") as f:
+                json.dump(sidecar, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_sidecar, self.sidecar_path)
+            self._ids, self._documents, self._metadatas = [], [], []
+            self._matrix, self._alive, self._row_of = None, None, {}
+            self._dirty = False
+            self._load()
+
+    # --- Bellek içi yardımcılar ---
+    def _consolidate(self):
+        """Bekleyen satır bloklarını tek bir matriste birleştirir."""
+        if not self._pending:
+            return
+        blocks = ([self._matrix] if self._matrix is not None and len(self._matrix) else []) + self._pending
+        self._matrix = np.concatenate(blocks).astype(self.dtype, copy=False)
+        self._pending = []
+
+    def __len__(self):
+        return int(self._alive.sum()) if self._alive is not None else 0
+
+    def _filter_mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """
+        Filtreye uyan satırların maskesini döndürür. Maske filtre başına bir kez
+        hesaplanıp bir sonraki yazmaya kadar saklanır; böylece aynı konu filtresiyle
+        gelen sorgular metadata'yı yeniden taramaz.
+        """
+        key = json.dumps(where, sort_keys=True, ensure_ascii=False)
+        mask = self._filter_masks.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (_metadata_matches(metadata, where) for metadata in self._metadatas),
+                dtype=bool, count=len(self._metadatas),
+            )
+            self._filter_masks[key] = mask
+        return mask
+
+    # --- Chroma uyumlu alt küme ---
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def upsert_embeddings(self, ids: List[str], embeddings: List[List[float]],
+                          documents: List[str], metadatas: List[Optional[Dict]] = None):
+        """Önceden hesaplanmış vektörlerle parçaları ekler/günceller."""
+        metadatas = metadatas or [None] * len(ids)
+        self._check_writable()
+        if len(set(ids)) != len(ids):
+            # Aynı çağrıda tekrar eden ID'lerde sonuncusu geçerli; aksi halde eski satır canlı kalır
+            keep = sorted({doc_id: i for i, doc_id in enumerate(ids)}.values())
+            ids = [ids[i] for i in keep]
+            embeddings = [embeddings[i] for i in keep]
+            documents = [documents[i] for i in keep]
+            metadatas = [metadatas[i] for i in keep]
+        block = _normalize_rows(np.asarray(embeddings, dtype=np.float32)).astype(self.dtype)
+        with self._lock:
+            self._delete_rows(ids)
+            start = len(self._ids)
+            self._ids.extend(ids)
+            self._documents.extend(documents)
+            self._metadatas.extend(m or {} for m in metadatas)
+            self._pending.append(block)
+            self._filter_masks = {}
+            alive = np.ones(len(ids), dtype=bool)
+            self._alive = alive if self._alive is None else np.concatenate([self._alive, alive])
+            for offset, doc_id in enumerate(ids):
+                self._row_of[doc_id] = start + offset
+            self._dirty = True
+
+    def _delete_rows(self, ids: Iterable[str]) -> int:
+        deleted = 0
+        for doc_id in ids:
+            row = self._row_of.pop(doc_id, None)
+            if row is not None:
+                self._alive[row] = False
+                deleted += 1
+        if deleted:
+            self._dirty = True
+        return deleted
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        self._check_writable()
+        with self._lock:
+            self._delete_rows(ids or [])
+        return True
+
+    def get(self, ids: Optional[Sequence[str]] = None, limit: Optional[int] = None,
+            include: Sequence[str] = ("documents", "metadatas")) -> Dict[str, List]:
+        """Chroma'nın get() çıktısıyla aynı biçimde kayıt döndürür."""
+        with self._lock:
+            if ids is None:
+                rows = [row for doc_id, row in self._row_of.items()]
+                rows.sort()
+            else:
+                rows = [self._row_of[doc_id] for doc_id in ids if doc_id in self._row_of]
+            if limit is not None:
+                rows = rows[:limit]
+            result = {"ids": [self._ids[row] for row in rows]}
+            if "documents" in include:
+                result["documents"] = [self._documents[row] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [self._metadatas[row] for row in rows]
+        return result
+
+    # --- LangChain VectorStore arayüzü ---
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if ids is None:
+            import uuid
+            ids = [str(uuid.uuid4()) for _ in texts]
+        vectors = self._embedding_function.embed_documents(texts)
+        self.upsert_embeddings(list(ids), vectors, texts, metadatas)
+        return list(ids)
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        data = self.get(ids=ids)
+        return [
+            Document(page_content=text, metadata=metadata, id=doc_id)
+            for doc_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"])
+        ]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                                filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """Vektörleştirilmiş kosinüs top-k araması. filter, Chroma'nın where sözdizimiyle metadata ön filtresidir."""
+        with self._lock:
+            self._consolidate()
+            if self._matrix is None or not len(self._matrix):
+                return []
+            query = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if norm == 0:
+                return []
+            scores = self._matrix @ (query / norm).astype(self._matrix.dtype)
+            candidates = self._alive if filter is None else self._alive & self._filter_mask(filter)
+            scores = np.where(candidates, scores.astype(np.float32), -np.inf)
+            k = min(k, int(np.count_nonzero(candidates)))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (Document(page_content=self._documents[row], metadata=self._metadatas[row], id=self._ids[row]),
+                 float(scores[row]))
+                for row in top
+            ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(
+            self._embedding_function.embed_query(query), k=k, filter=filter
+        )
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                                    **kwargs: Any) -> List[Document]:
+        return [doc for doc, _score in self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _score in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        # Kosinüs benzerliği [-1, 1] aralığından [0, 1] aralığına taşınır.
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, directory: str = None, dtype: str = "float32",
+                   **kwargs: Any) -> "FlatVectorStore":
+        store = cls(directory=directory, embedding_function=embedding, dtype=dtype)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.flush()
+        return store
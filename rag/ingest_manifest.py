@@ -0,0 +1,118 @@
+# rag/ingest_manifest.py
+# RAG indeksinin hangi dosyalardan, hangi içerikle ve hangi embedding modeliyle
+# oluşturulduğunu tutan manifest. rag_service bu kaydı kullanarak açılışta
+# yalnızca yeni, değişmiş veya silinmiş dosyaları yeniden işler.
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger("rag_service")
+
+MANIFEST_FILENAME = "ingest_manifest.json"
+# 2: parçalar "topic" metadata'sı taşır; eski indeksler bir kez yeniden kurulur.
+MANIFEST_VERSION = 2
+
+# İndekslenecek dosya uzantıları (DirectoryLoader glob'larıyla aynı)
+SUPPORTED_EXTENSIONS = (".txt", ".pdf")
+
+
+def empty_manifest(embedding_model: str, chunk_size: int, chunk_overlap: int) -> Dict:
+    """Boş bir manifest sözlüğü döndürür."""
+    return {
+        "version": MANIFEST_VERSION,
+        "embedding_model": embedding_model,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "files": {},
+    }
+
+
+def load_manifest(manifest_path: str) -> Dict:
+    """
+    Manifest'i diskten okur. Dosya yoksa veya bozuksa None döner;
+    bu durumda çağıran taraf indeksi 'bilinmeyen durumda' kabul etmelidir.
+    """
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Manifest okunamadı ({}): {}".format(manifest_path, e))
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        logger.warning("Manifest sürümü uyumsuz: {}".format(manifest.get("version")))
+        return None
+    return manifest
+
+
+def save_manifest(manifest: Dict, manifest_path: str):
+    """Manifest'i atomik olarak (geçici dosya + rename) diske yazar."""
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def file_sha256(file_path: str) -> str:
+    """Dosya içeriğinin SHA-256 özetini döndürür."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_chunk_ids(rel_path: str, content_hash: str, count: int) -> List[str]:
+    """
+    Bir dosyanın parçaları için deterministik ID'ler üretir.
+    Aynı dosya ve aynı içerik her zaman aynı ID'leri verir; bu sayede
+    yeniden ekleme işlemleri idempotent olur.
+    """
+    prefix = hashlib.sha1("{}:{}".format(rel_path, content_hash).encode("utf-8")).hexdigest()[:20]
+    return ["{}-{:05d}".format(prefix, i) for i in range(count)]
+
+
+def scan_data_directory(data_directory: str, previous_files: Dict = None) -> Dict[str, Dict]:
+    """
+    Veri dizinindeki desteklenen dosyaları tarar ve {göreli_yol: {sha256, size, mtime}} döndürür.
+    Boyutu ve değişiklik zamanı önceki manifest ile aynı olan dosyaların özeti
+    yeniden hesaplanmaz; böylece değişmeyen bir korpusun taranması milisaniyeler sürer.
+    """
+    previous_files = previous_files or {}
+    current = {}
+    for root, _dirs, files in os.walk(data_directory):
+        for name in sorted(files):
+            if not name.lower().endswith(SUPPORTED_EXTENSIONS):
+                continue
+            abs_path = os.path.join(root, name)
+            rel_path = os.path.relpath(abs_path, data_directory).replace(os.sep, "/")
+            stat = os.stat(abs_path)
+            previous = previous_files.get(rel_path)
+            if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime:
+                content_hash = previous["sha256"]
+            else:
+                content_hash = file_sha256(abs_path)
+            current[rel_path] = {
+                "sha256": content_hash,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+            }
+    return current
+
+
+def diff_manifest(manifest_files: Dict, current_files: Dict) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Manifest'teki dosyalarla diskteki dosyaları karşılaştırır.
+    (eklenenler, değişenler, silinenler) listelerini döndürür.
+    """
+    added = [p for p in current_files if p not in manifest_files]
+    removed = [p for p in manifest_files if p not in current_files]
+    changed = [
+        p for p in current_files
+        if p in manifest_files and manifest_files[p]["sha256"] != current_files[p]["sha256"]
+    ]
+    return sorted(added), sorted(changed), sorted(removed)
@@ -0,0 +1,243 @@
+# rag/ingest_pipeline.py
+# Akış (streaming) tabanlı indeksleme hattı:
+#   dosya listesi -> süreç havuzunda yükleme + parçalama -> sınırlı kuyruk
+#   -> EmbeddingScheduler ile eşzamanlı partiler halinde embedding -> upsert
+# Aynı anda yalnızca sınırlı sayıda dosyanın parçaları bellekte tutulur; böylece
+# binlerce PDF'lik bir korpusta bile bellek kullanımı düz kalır.
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_core.documents import Document
+
+from .embedding_scheduler import EmbeddingScheduler
+from .ingest_manifest import make_chunk_ids
+from .topic_router import TOPIC_METADATA_KEY, topic_for_path
+
+logger = logging.getLogger("rag_service")
+
+# (mutlak_yol, göreli_yol, sha256)
+IngestTask = Tuple[str, str, str]
+
+
+def load_file_documents(file_path: str) -> List[Document]:
+    """Tek bir TXT veya PDF dosyasını LangChain belgelerine dönüştürür."""
+    if file_path.lower().endswith(".pdf"):
+        loader = PyPDFLoader(file_path)
+    else:
+        loader = TextLoader(file_path, encoding="utf-8")
+    return loader.load()
+
+
+def split_documents(documents: List[Document], chunk_size: int, chunk_overlap: int) -> List[Document]:
+    """
+    Belgeleri RAG parçalarına ayırır (chunking). start_index metadata'sı,
+    bağlam paketleyicinin bitişik parçaları birleştirebilmesi için eklenir.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True
+    )
+    return text_splitter.split_documents(documents)
+
+
+def parse_and_chunk(task: IngestTask, chunk_size: int, chunk_overlap: int):
+    """
+    Süreç havuzundaki işçilerin çalıştırdığı fonksiyon: dosyayı yükler, parçalar
+    ve deterministik parça ID'lerini üretir. Her parçaya dosyanın konu etiketi
+    (bkz. topic_router) eklenir. (göreli_yol, parçalar, id'ler) döndürür.
+    """
+    abs_path, rel_path, content_hash = task
+    chunks = split_documents(load_file_documents(abs_path), chunk_size, chunk_overlap)
+    topic = topic_for_path(rel_path)
+    for chunk in chunks:
+        chunk.metadata[TOPIC_METADATA_KEY] = topic
+    return rel_path, chunks, make_chunk_ids(rel_path, content_hash, len(chunks))
+
+
+def iter_chunked_files(
+    tasks: List[IngestTask],
+    chunk_size: int,
+    chunk_overlap: int,
+    max_workers: int = 0,
+    max_pending: int = 8,
+) -> Iterator[Tuple[str, List[Document], List[str]]]:
+    """
+    Dosyaları parçalayıp tamamlandıkça üreten (generator) fonksiyon.
+    max_workers > 1 ise işler süreç havuzunda yürür ve aynı anda en fazla
+    max_pending dosya işlemde/bellekte bekler (geri basınç). Aksi halde sırayla çalışır.
+    """
+    if max_workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield parse_and_chunk(task, chunk_size, chunk_overlap)
+        return
+
+    pending_tasks = iter(tasks)
+    in_flight = set()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for task in pending_tasks:
+            in_flight.add(executor.submit(parse_and_chunk, task, chunk_size, chunk_overlap))
+            if len(in_flight) >= max_pending:
+                break
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                next_task = next(pending_tasks, None)
+                if next_task is not None:
+                    in_flight.add(executor.submit(parse_and_chunk, next_task, chunk_size, chunk_overlap))
+
+
+class IngestProgress:
+    """Dosya/parça sayılarını ve parça/saniye verimini tutar, belirli aralıklarla loglar."""
+
+    def __init__(self, total_files: int, log_interval: float = 5.0):
+        self.total_files = total_files
+        self.log_interval = log_interval
+        self.files_done = 0
+        self.chunks_done = 0
+        self.skipped = 0  # Önceki (yarıda kalmış) çalıştırmada zaten yazılmış parçalar
+        self.started_at = time.perf_counter()
+        self._last_log = self.started_at
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @property
+    def chunks_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.chunks_done / elapsed if elapsed > 0 else 0.0
+
+    def update(self, files: int = 0, chunks: int = 0):
+        self.files_done += files
+        self.chunks_done += chunks
+        now = time.perf_counter()
+        if now - self._last_log >= self.log_interval:
+            self._last_log = now
+            self.log()
+
+    def log(self):
+        logger.info(
+            "İndeksleme: {}/{} dosya, {} parça, {:.1f} parça/sn".format(
+                self.files_done, self.total_files, self.chunks_done, self.chunks_per_second
+            )
+        )
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "files": self.files_done,
+            "chunks": self.chunks_done,
+            "skipped_chunks": self.skipped,
+            "seconds": round(self.elapsed, 3),
+            "chunks_per_second": round(self.chunks_per_second, 1),
+        }
+
+
+def _existing_ids(vectorstore, ids: List[str]) -> set:
+    """Koleksiyonda zaten bulunan ID'leri döndürür (kaldığı yerden devam için)."""
+    return set(vectorstore.get(ids=ids, include=[])["ids"])
+
+
+def _upsert_embedded(vectorstore, documents: List[Document], ids: List[str], vectors: List[List[float]]):
+    """
+    Önceden hesaplanmış vektörlerle parçaları koleksiyona yazar. LangChain'in
+    Chroma sarmalayıcısı hazır vektör kabul etmediği için alttaki koleksiyon kullanılır.
+    """
+    if hasattr(vectorstore, "upsert_embeddings"):
+        vectorstore.upsert_embeddings(
+            ids=ids,
+            embeddings=vectors,
+            documents=[document.page_content for document in documents],
+            metadatas=[document.metadata for document in documents],
+        )
+        return
+    vectorstore._collection.upsert(
+        ids=ids,
+        embeddings=vectors,
+        documents=[document.page_content for document in documents],
+        metadatas=[document.metadata or None for document in documents],
+    )
+
+
+def run_ingest(
+    vectorstore,
+    tasks: List[IngestTask],
+    on_file_done: Callable[[str, List[str]], None],
+    chunk_size: int,
+    chunk_overlap: int,
+    scheduler: EmbeddingScheduler,
+    max_workers: int = 0,
+    max_pending: int = 8,
+) -> IngestProgress:
+    """
+    Görevleri akış halinde işler. Parçalar scheduler.batch_size'lık partilere
+    bölünür; scheduler.concurrency kadar parti aynı anda embed edilir ve her parti
+    tamamlanır tamamlanmaz koleksiyona yazılır (commit). Koleksiyonda zaten bulunan
+    parçalar atlanır; böylece yarıda kesilen bir kurulum son yazılan partiden devam eder.
+    Bir dosyanın tüm parçaları yazıldığında on_file_done(göreli_yol, parça_id'leri) çağrılır.
+    """
+    progress = IngestProgress(total_files=len(tasks))
+    batch_size = scheduler.batch_size
+    window_size = batch_size * scheduler.concurrency
+    # Yazılmayı bekleyen (belge, id, göreli_yol) üçlüleri
+    window: List[Tuple[Document, str, str]] = []
+    # Dosya başına yazılmayı bekleyen parça sayısı ve tüm ID'leri
+    remaining: Dict[str, int] = {}
+    file_ids: Dict[str, List[str]] = {}
+
+    def complete(rel_paths: List[str]):
+        for rel_path in rel_paths:
+            remaining[rel_path] -= 1
+            if remaining[rel_path] == 0:
+                on_file_done(rel_path, file_ids.pop(rel_path))
+                del remaining[rel_path]
+                progress.update(files=1)
+
+    def flush():
+        if not window:
+            return
+        already = _existing_ids(vectorstore, [chunk_id for _doc, chunk_id, _path in window])
+        if already:
+            progress.skipped += len(already)
+            complete([rel_path for _doc, chunk_id, rel_path in window if chunk_id in already])
+        todo = [item for item in window if item[1] not in already]
+        batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+        for index, vectors in scheduler.iter_embed_batches(
+            [[document.page_content for document, _id, _path in batch] for batch in batches]
+        ):
+            batch = batches[index]
+            _upsert_embedded(
+                vectorstore,
+                [document for document, _id, _path in batch],
+                [chunk_id for _doc, chunk_id, _path in batch],
+                vectors,
+            )
+            progress.update(chunks=len(batch))
+            complete([rel_path for _doc, _id, rel_path in batch])
+        window.clear()
+
+    for rel_path, chunks, chunk_ids in iter_chunked_files(
+        tasks, chunk_size, chunk_overlap, max_workers=max_workers, max_pending=max_pending
+    ):
+        if not chunks:
+            on_file_done(rel_path, [])
+            progress.update(files=1)
+            continue
+        remaining[rel_path] = len(chunks)
+        file_ids[rel_path] = chunk_ids
+        for document, chunk_id in zip(chunks, chunk_ids):
+            window.append((document, chunk_id, rel_path))
+            if len(window) >= window_size:
+                flush()
+    flush()
+    progress.log()
+    return progress
+
+
+def default_worker_count() -> int:
+    """Varsayılan işçi sayısı: en fazla 4 süreç."""
+    return min(4, os.cpu_count() or 1)
@@ -0,0 +1,71 @@
+# rag/local_embeddings.py
+# Ağ bağlantısı gerektirmeyen, yalnızca NumPy kullanan yerel embedding modeli.
+# Geliştirme, CI, bozulmuş (degraded) mod ve retrieval benchmark'ları için
+# sıfır gecikmeli ve ücretsiz bir alternatif sağlar.
+import math
+import zlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .text_normalize import tokenize
+
+
+class HashedNgramEmbeddings(Embeddings):
+    """
+    Kelime ve karakter n-gram'larını sabit boyutlu bir vektöre hash'leyen embedding.
+
+    - Her kelime hem bütün olarak hem de "<kelime>" biçiminde karakter n-gram'ları
+      (varsayılan 3-5) olarak sayılır; Türkçedeki ek yığılmaları ("stresliyim",
+      "streslerim") bu sayede ortak n-gram'lar üzerinden yakınlaşır.
+    - Hash için Python'un tuzlanmış hash()'i yerine crc32 kullanılır; aynı metin
+      her süreçte aynı vektörü verir, yani indeks ile sorgu tutarlıdır.
+    - İşaretli hash (signed hashing) çakışmaların etkisini dengeler, frekanslar
+      log ile bastırılır ve vektör L2-normalize edilir (kosinüs = iç çarpım).
+    """
+
+    def __init__(self, dimensions: int = 768, ngram_range=(3, 5), word_weight: float = 1.0):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+        self.word_weight = word_weight
+
+    @property
+    def model_name(self) -> str:
+        """Manifest ve önbellek anahtarlarında kullanılacak, parametreleri içeren ad."""
+        return "local-hashed-ngram-v1-d{}-n{}{}".format(self.dimensions, *self.ngram_range)
+
+    def _features(self, text: str):
+        features = []
+        min_n, max_n = self.ngram_range
+        for token in tokenize(text):
+            features.append(("w:" + token, self.word_weight))
+            padded = "<{}>".format(token)
+            for n in range(min_n, max_n + 1):
+                for i in range(len(padded) - n + 1):
+                    features.append((padded[i:i + n], 1.0))
+        return features
+
+    def _embed_one(self, text: str, out: np.ndarray):
+        counts = {}
+        for feature, weight in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            index = h % self.dimensions
+            sign = 1.0 if (h >> 31) & 1 else -1.0
+            counts[(index, sign)] = counts.get((index, sign), 0.0) + weight
+        for (index, sign), count in counts.items():
+            out[index] += sign * (1.0 + math.log(count))
+
+    def _embed_matrix(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            self._embed_one(text, matrix[row])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_matrix(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_matrix([text])[0].tolist()
@@ -1,18 +1,40 @@
 
 
+import heapq
+import math
 import os
-from langchain_community.document_loaders import (
-    DirectoryLoader,
-    TextLoader,
-    PyPDFLoader,
-)
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import time
+from collections import Counter, defaultdict
+from typing import Any, ClassVar, Dict, List, Optional, Tuple
+
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 # rag_service.py
 from langchain_chroma import Chroma
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, Field
 from dotenv import load_dotenv  # load_dotenv'i burada da import edelim
 import logging
 
+from .embedding_cache import CachedEmbeddings
+from .local_embeddings import HashedNgramEmbeddings
+from .text_normalize import tokenize
+from .topic_router import TOPIC_METADATA_KEY, topic_filter
+from .ingest_manifest import (
+    MANIFEST_FILENAME,
+    diff_manifest,
+    empty_manifest,
+    load_manifest,
+    save_manifest,
+    scan_data_directory,
+)
+from .embedding_scheduler import EmbeddingScheduler
+from .resilience import CircuitBreaker, ResiliencePolicy, ResilientEmbeddings
+from .flat_index import FlatVectorStore
+from .snapshot import open_snapshot
+from .ingest_pipeline import default_worker_count, run_ingest
+
 # Logging yapılandırması
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -31,12 +53,17 @@ load_dotenv(dotenv_path=dotenv_path_for_rag)  # .env dosyasını manuel olarak y
 
 logger.info(".env loaded from '{}'".format(dotenv_path_for_rag))
 
-# API anahtarının yüklendiğinden emin olun
+# Embedding backend'i: "google" (varsayılan, GOOGLE_API_KEY gerekir) veya
+# "local" (ağ gerektirmeyen hashed n-gram embedding).
+EMBEDDING_BACKENDS = ("google", "local")
+EMBEDDING_BACKEND = os.getenv("RAG_EMBEDDING_BACKEND", "google").strip().lower()
+LOCAL_EMBEDDING_DIMENSIONS = int(os.getenv("RAG_LOCAL_EMBEDDING_DIM", "768"))
+
+# API anahtarı yalnızca Google backend'i için gereklidir; eksikse hata,
+# backend gerçekten oluşturulurken verilir (bkz. build_base_embeddings).
 google_api_key = os.getenv("GOOGLE_API_KEY")
-if not google_api_key:
-    # Bu hata Streamlit'te gösterilecek.
-    logger.error("GOOGLE_API_KEY bulunamadı. Lütfen .env dosyanızı kontrol edin.")
-    raise ValueError("GOOGLE_API_KEY bulunamadı. Lütfen .env dosyanızı kontrol edin.")
+if not google_api_key and EMBEDDING_BACKEND == "google":
+    logger.warning("GOOGLE_API_KEY bulunamadı. Google embedding backend'i kullanılamayacak.")
 
 # Vektör veritabanının kalıcı olarak saklanacağı dizin
 # Bu dizini proje kök dizininde oluşturacağız.
@@ -45,85 +72,485 @@ PERSIST_DIRECTORY = os.path.join(
 )  # <-- chroma_db yolunu da köke göre ayarla
 
 
-def get_rag_retriever(data_directory: str = None):
+EMBEDDING_MODEL = "models/embedding-001"  # Google backend'inin modeli
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Embedding önbelleği chroma_db dışında tutulur; böylece reset_chroma_db() sonrası
+# yapılan yeniden kurulum da önbellekten beslenir.
+EMBEDDING_CACHE_PATH = os.getenv(
+    "RAG_EMBEDDING_CACHE_PATH",
+    os.path.join(project_root_for_rag, ".cache", "embedding_cache.sqlite3"),
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("RAG_EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+# İndeksleme hattı: paralel parçalama süreç sayısı (0/1 = sıralı), embedding/upsert
+# parti boyutu ve manifest'in diske yazılma aralığı (saniye)
+INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", str(default_worker_count())))
+INGEST_BATCH_SIZE = int(os.getenv("RAG_INGEST_BATCH_SIZE", "64"))
+MANIFEST_SAVE_INTERVAL = 2.0
+
+# Embedding zamanlayıcısı: aynı anda uçuşta olan parti sayısı, dakikalık istek
+# sınırı (0 = sınırsız) ve kota/geçici hatalarda en fazla yeniden deneme sayısı
+EMBED_CONCURRENCY = int(os.getenv("RAG_EMBED_CONCURRENCY", "4"))
+EMBED_REQUESTS_PER_MINUTE = float(os.getenv("RAG_EMBED_RPM", "600"))
+EMBED_MAX_RETRIES = int(os.getenv("RAG_EMBED_MAX_RETRIES", "5"))
+
+# Embedding API'sine süreç genelinde aynı anda en fazla kaç istek gidebileceği ve
+# kaç ardışık hatada devre kesicinin açılacağı (bkz. rag/resilience.py)
+EMBED_MAX_IN_FLIGHT = int(os.getenv("RAG_EMBED_MAX_IN_FLIGHT", "8"))
+EMBED_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("RAG_EMBED_CIRCUIT_FAILURES", "5"))
+EMBEDDING_POLICY = ResiliencePolicy(
+    "embeddings",
+    max_in_flight=EMBED_MAX_IN_FLIGHT,
+    breaker=CircuitBreaker(failure_threshold=EMBED_CIRCUIT_FAILURE_THRESHOLD),
+)
+
+# Retrieval modu: "hybrid" (BM25 + vektör, RRF ile birleştirilmiş; varsayılan)
+# veya "dense" (yalnızca vektör benzerliği)
+RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid").strip().lower()
+
+# Vektör deposu: "chroma" (varsayılan) veya "flat" (bellek eşlemeli NumPy matrisi;
+# küçük korpuslarda açılış ve arama maliyeti çok daha düşüktür)
+VECTOR_BACKENDS = ("chroma", "flat")
+VECTOR_BACKEND = os.getenv("RAG_VECTOR_BACKEND", "chroma").strip().lower()
+FLAT_INDEX_DIRECTORY = os.getenv("RAG_FLAT_INDEX_DIR", os.path.join(project_root_for_rag, "flat_index"))
+FLAT_INDEX_DTYPE = os.getenv("RAG_FLAT_INDEX_DTYPE", "float32").strip().lower()
+
+# Önceden oluşturulmuş indeks anlık görüntüsü (bkz. rag/snapshot.py). Verilirse
+# açılışta doğrulanıp salt okunur açılır; canlı indeks ve senkronizasyon kullanılmaz.
+INDEX_SNAPSHOT = os.getenv("RAG_INDEX_SNAPSHOT", "").strip()
+SNAPSHOT_EXTRACT_DIRECTORY = os.getenv(
+    "RAG_SNAPSHOT_EXTRACT_DIR", os.path.join(project_root_for_rag, ".cache", "snapshots")
+)
+
+# Hangi dosyanın hangi içerikle ve hangi parça ID'leriyle indekslendiğini tutan manifest
+MANIFEST_PATH = os.path.join(PERSIST_DIRECTORY, MANIFEST_FILENAME)
+
+
+def _resolve_backend(backend: str = None) -> str:
+    backend = (backend or EMBEDDING_BACKEND).strip().lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            "Bilinmeyen embedding backend'i: '{}'. Seçenekler: {}".format(backend, ", ".join(EMBEDDING_BACKENDS))
+        )
+    return backend
+
+
+def build_base_embeddings(backend: str = None):
     """
-    RAG için retriever'ı başlatır.
-    Veriler zaten ChromaDB'de varsa oradan yükler, yoksa yükler ve kaydeder.
+    Seçilen backend için (önbelleksiz) embedding nesnesini ve model adını döndürür.
+    Benchmark'lar ve indeksleme dışı kullanım için de doğrudan çağrılabilir.
+    """
+    backend = _resolve_backend(backend)
+    if backend == "local":
+        embeddings = HashedNgramEmbeddings(dimensions=LOCAL_EMBEDDING_DIMENSIONS)
+        return embeddings, embeddings.model_name
+    if not os.getenv("GOOGLE_API_KEY"):
+        logger.error("GOOGLE_API_KEY bulunamadı. Lütfen .env dosyanızı kontrol edin.")
+        raise ValueError("GOOGLE_API_KEY bulunamadı. Lütfen .env dosyanızı kontrol edin.")
+    return GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL
+
+
+def _build_embeddings(backend: str = None):
+    """
+    Retriever'ın kullanacağı embedding nesnesini ve model adını döndürür.
+    Ağ üzerinden çalışan backend'ler kalıcı önbellek ile sarmalanır; yerel
+    backend önbellekten daha hızlı olduğu için doğrudan kullanılır.
     """
-    logger.info("RAG retriever başlatılıyor. Veri dizini: {}".format(data_directory))
+    backend = _resolve_backend(backend)
+    embeddings, model_name = build_base_embeddings(backend)
+    if backend == "local":
+        return embeddings, model_name
+    # Önbellek dayanıklılık katmanının önündedir; önbellekten dönen sorgular kuyruğa girmez.
+    cached = CachedEmbeddings(
+        ResilientEmbeddings(embeddings, EMBEDDING_POLICY),
+        model_name=model_name,
+        cache_path=EMBEDDING_CACHE_PATH,
+        max_disk_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+    )
+    return cached, model_name
 
-    # ÖNEMLİ: ChromaDB kalıcı olarak kaydedildiği için her çalıştırdığımızda yeniden oluşmasını engellemeliyiz.
 
-    if os.path.exists(PERSIST_DIRECTORY) and os.listdir(PERSIST_DIRECTORY):
-        # Eğer ChromaDB veritabanı zaten varsa, yükle
-        logger.info("ChromaDB '{}' konumundan yükleniyor.".format(PERSIST_DIRECTORY))
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        vectorstore = Chroma(
-            persist_directory=PERSIST_DIRECTORY, embedding_function=embeddings
+def _resolve_vector_backend(backend: str = None) -> str:
+    backend = (backend or VECTOR_BACKEND).strip().lower()
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(
+            "Bilinmeyen vektör backend'i: '{}'. Seçenekler: {}".format(backend, ", ".join(VECTOR_BACKENDS))
         )
+    return backend
+
+
+def _open_vectorstore(embedding_backend: str, embeddings, vector_backend: str):
+    """
+    Seçilen vektör deposunu açar ve (vectorstore, manifest_yolu) döndürür.
+    Vektör boyutları farklı olduğu için her embedding backend'i kendi koleksiyonunu
+    (veya düz indeks dizinini) kullanır; Google + Chroma mevcut varsayılan koleksiyonu korur.
+    """
+    if vector_backend == "flat":
+        directory = os.path.join(FLAT_INDEX_DIRECTORY, embedding_backend)
+        vectorstore = FlatVectorStore(directory, embedding_function=embeddings, dtype=FLAT_INDEX_DTYPE)
+        return vectorstore, os.path.join(directory, MANIFEST_FILENAME)
+
+    if embedding_backend == "google":
+        collection_name, manifest_path = "langchain", MANIFEST_PATH
     else:
-        # Eğer ChromaDB yoksa veya boşsa, veriyi yükle ve kaydet
-        logger.info("ChromaDB bulunamadı veya boş. Veri yükleniyor ve kaydediliyor.")
-        if not data_directory or not os.path.exists(data_directory):
-            logger.error(
-                "RAG için veri dizini '{}' bulunamadı. RAG devre dışı.".format(data_directory)
+        collection_name = "rag_{}".format(embedding_backend)
+        manifest_path = os.path.join(PERSIST_DIRECTORY, "ingest_manifest_{}.json".format(embedding_backend))
+    vectorstore = Chroma(
+        collection_name=collection_name,
+        persist_directory=PERSIST_DIRECTORY,
+        embedding_function=embeddings,
+    )
+    return vectorstore, manifest_path
+
+
+def _save_checkpoint(vectorstore, manifest: dict, manifest_path: str):
+    """
+    Vektör deposundaki bekleyen yazmaları diske indirir, ardından manifest'i kaydeder.
+    Chroma her upsert'te kendisi kalıcılaştırır; düz indeks ise flush() ister.
+    Sıra önemlidir: manifest hiçbir zaman diskte olmayan parçaları göstermemelidir.
+    """
+    flush = getattr(vectorstore, "flush", None)
+    if flush is not None:
+        flush()
+    save_manifest(manifest, manifest_path)
+
+
+def _clear_collection(vectorstore):
+    """Koleksiyondaki tüm parçaları siler (koleksiyonun kendisi korunur)."""
+    existing_ids = vectorstore.get(include=[])["ids"]
+    if existing_ids:
+        vectorstore.delete(ids=existing_ids)
+    return len(existing_ids)
+
+
+def sync_vectorstore(
+    vectorstore, data_directory: str, embedding_model: str = EMBEDDING_MODEL, manifest_path: str = MANIFEST_PATH
+) -> dict:
+    """
+    Veri dizinini manifest ile karşılaştırır ve yalnızca farkları indekse uygular:
+    yeni/değişen dosyalar akış hattında (bkz. ingest_pipeline) paralel olarak
+    parçalanıp EmbeddingScheduler ile hız sınırlı partiler halinde embed edilir,
+    değişen/silinen dosyaların eski parçaları koleksiyondan kaldırılır. Manifest düzenli aralıklarla yazılır, böylece
+    yarıda kesilen bir senkronizasyon büyük ölçüde kaldığı yerden devam eder.
+    """
+    manifest = load_manifest(manifest_path)
+    compatible = manifest is not None and (
+        manifest.get("embedding_model") == embedding_model
+        and manifest.get("chunk_size") == CHUNK_SIZE
+        and manifest.get("chunk_overlap") == CHUNK_OVERLAP
+    )
+    if not compatible:
+        # Manifest yok (eski sürümle oluşturulmuş indeks) veya model/parçalama
+        # parametreleri değişmiş: mevcut parçalar güvenilir değil, sıfırdan kur.
+        removed_count = _clear_collection(vectorstore)
+        if removed_count:
+            logger.warning(
+                "Manifest yok veya uyumsuz; {} eski parça silindi, indeks yeniden kurulacak.".format(removed_count)
             )
-            return None
-
-        # Veriyi yükle - Hem TXT hem de PDF dosyalarını destekle
-        # TXT dosyaları için loader - UTF-8 encoding ile
-        txt_loader = DirectoryLoader(
-            data_directory, 
-            glob="**/*.txt", 
-            loader_cls=lambda file_path: TextLoader(file_path, encoding="utf-8")
+        manifest = empty_manifest(embedding_model, CHUNK_SIZE, CHUNK_OVERLAP)
+
+    current_files = scan_data_directory(data_directory, manifest["files"])
+    added, changed, removed = diff_manifest(manifest["files"], current_files)
+    stats = {
+        "added": len(added), "changed": len(changed), "removed": len(removed),
+        "chunks_added": 0, "chunks_removed": 0,
+    }
+    if not (added or changed or removed):
+        logger.info("RAG indeksi güncel ({} dosya).".format(len(current_files)))
+        return stats
+
+    logger.info(
+        "RAG indeksi güncelleniyor: {} yeni, {} değişmiş, {} silinmiş dosya.".format(
+            len(added), len(changed), len(removed)
+        )
+    )
+
+    for rel_path in removed + changed:
+        old_ids = manifest["files"][rel_path].get("chunk_ids", [])
+        if old_ids:
+            vectorstore.delete(ids=old_ids)
+            stats["chunks_removed"] += len(old_ids)
+        del manifest["files"][rel_path]
+    if removed or changed:
+        _save_checkpoint(vectorstore, manifest, manifest_path)
+
+    tasks = [
+        (os.path.join(data_directory, rel_path), rel_path, current_files[rel_path]["sha256"])
+        for rel_path in added + changed
+    ]
+    last_saved = [time.perf_counter()]
+
+    def on_file_done(rel_path, chunk_ids):
+        # Manifest'i her dosyada değil, aralıklarla yaz; binlerce dosyada JSON'u
+        # tekrar tekrar yazmak indekslemenin kendisinden pahalı olur. Parça ID'leri
+        # deterministik olduğundan yarıda kalan bir çalıştırmanın tekrarı idempotenttir.
+        manifest["files"][rel_path] = dict(current_files[rel_path], chunk_ids=chunk_ids)
+        stats["chunks_added"] += len(chunk_ids)
+        if time.perf_counter() - last_saved[0] >= MANIFEST_SAVE_INTERVAL:
+            _save_checkpoint(vectorstore, manifest, manifest_path)
+            last_saved[0] = time.perf_counter()
+
+    scheduler = EmbeddingScheduler(
+        vectorstore.embeddings,
+        batch_size=INGEST_BATCH_SIZE,
+        concurrency=EMBED_CONCURRENCY,
+        requests_per_minute=EMBED_REQUESTS_PER_MINUTE,
+        max_retries=EMBED_MAX_RETRIES,
+    )
+    try:
+        progress = run_ingest(
+            vectorstore,
+            tasks,
+            on_file_done,
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            scheduler=scheduler,
+            max_workers=INGEST_WORKERS,
         )
-        txt_documents = txt_loader.load()
-        logger.info("{} TXT belgesi yüklendi.".format(len(txt_documents)))
+    finally:
+        # Hata olsa bile tamamlanan dosyaları kaydet; bir sonraki açılış oradan devam eder.
+        _save_checkpoint(vectorstore, manifest, manifest_path)
+    stats["throughput"] = progress.as_dict()
+    stats["embedding"] = dict(scheduler.stats)
 
-        # PDF dosyaları için loader
-        pdf_loader = DirectoryLoader(
-            data_directory, glob="**/*.pdf", loader_cls=PyPDFLoader
+    logger.info(
+        "RAG indeksi güncellendi: {} parça eklendi, {} parça silindi ({:.1f} parça/sn).".format(
+            stats["chunks_added"], stats["chunks_removed"], progress.chunks_per_second
         )
-        pdf_documents = pdf_loader.load()
-        logger.info("{} PDF belgesi yüklendi.".format(len(pdf_documents)))
+    )
+    return stats
+
+
+class BM25Index:
+    """
+    Chroma'daki parçalar üzerinde bellek içi ters indeks (Okapi BM25).
+    Yoğun (dense) aramanın kaçırdığı birebir anahtar kelime eşleşmelerini
+    ("4-7-8", "panik atak") yakalar ve embedding çağrısı gerektirmez.
+    """
+
+    def __init__(self, ids: List[str], documents: List[Document], k1: float = 1.5, b: float = 0.75):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+        # Konu etiketi -> parça indeksleri (metadata ön filtresi için)
+        self.topic_rows: Dict[str, set] = defaultdict(set)
+        for doc_index, document in enumerate(self.documents):
+            topic = (document.metadata or {}).get(TOPIC_METADATA_KEY)
+            if topic is not None:
+                self.topic_rows[topic].add(doc_index)
+            term_counts = Counter(tokenize(document.page_content))
+            self.doc_lengths.append(sum(term_counts.values()))
+            for term, count in term_counts.items():
+                self.postings[term].append((doc_index, count))
+        total = len(self.documents)
+        self.avg_doc_length = (sum(self.doc_lengths) / total) if total else 0.0
+        self.idf = {
+            term: math.log(1.0 + (total - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
 
-        # Tüm belgeleri birleştir
-        documents = txt_documents + pdf_documents
-        logger.info("Toplam {} belge yüklendi.".format(len(documents)))
+    @classmethod
+    def from_vectorstore(cls, vectorstore) -> "BM25Index":
+        """Chroma koleksiyonundaki tüm parçalardan indeksi kurar."""
+        data = vectorstore.get(include=["documents", "metadatas"])
+        documents = [
+            Document(page_content=text or "", metadata=metadata or {}, id=doc_id)
+            for doc_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"])
+        ]
+        return cls(data["ids"], documents)
 
-        # Metni parçalara ayır (chunking)
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, chunk_overlap=200
+    def __len__(self):
+        return len(self.documents)
+
+    def rows_for_topics(self, topics: List[str]) -> set:
+        """Verilen konulardan herhangi birine ait parçaların indekslerini döndürür."""
+        rows = set()
+        for topic in topics:
+            rows |= self.topic_rows.get(topic, set())
+        return rows
+
+    def search(self, query: str, k: int = 10, allowed: Optional[set] = None) -> List[Tuple[int, float, float]]:
+        """
+        En yüksek puanlı k parçayı (indeks, puan, kapsama) olarak döndürür.
+        Kapsama; sorgudaki tüm (tekil) terimlerin ne kadarının parçada bulunduğudur;
+        korpusta hiç geçmeyen terimler de paydaya dahildir. allowed verilirse
+        yalnızca bu indekslerdeki parçalar puanlanır.
+        """
+        all_terms = list(dict.fromkeys(tokenize(query)))
+        query_terms = [t for t in all_terms if t in self.postings]
+        if not query_terms:
+            return []
+        scores: Dict[int, float] = defaultdict(float)
+        matched: Dict[int, int] = defaultdict(int)
+        for term in query_terms:
+            idf = self.idf[term]
+            for doc_index, tf in self.postings[term]:
+                if allowed is not None and doc_index not in allowed:
+                    continue
+                norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[doc_index] / self.avg_doc_length)
+                scores[doc_index] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+                matched[doc_index] += 1
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(doc_index, score, matched[doc_index] / len(all_terms)) for doc_index, score in top]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int = 60) -> List[str]:
+    """Birden çok sıralamayı RRF ile birleştirir: puan(d) = Σ 1 / (rrf_k + sıra)."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] += 1.0 / (rrf_k + rank)
+    return sorted(scores, key=lambda key: scores[key], reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    BM25 ve vektör aramasını Reciprocal Rank Fusion ile birleştiren retriever.
+
+    Sözcüksel eşleşme güvenliyse (sorgudaki tüm terimler en iyi parçada
+    geçiyor ve en iyi puan ikinciden belirgin biçimde yüksekse) vektör araması
+    hiç yapılmaz; sonuç doğrudan BM25'ten döner ve embedding çağrısı harcanmaz.
+
+    invoke(query, topics=[...]) ile çağrılırsa her iki arama da yalnızca bu
+    konulardaki parçalarda yapılır (bkz. topic_router); filtreli arama
+    min_filtered_results'tan az sonuç verirse tüm korpusta tekrarlanır.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    supports_topic_filter: ClassVar[bool] = True
+
+    vectorstore: Any
+    lexical_index: Any
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    fast_path_margin: float = 1.5
+    fast_path_enabled: bool = True
+    min_filtered_results: int = 2
+    stats: Dict[str, int] = Field(
+        default_factory=lambda: {"fast_path": 0, "hybrid": 0, "filtered": 0, "filter_fallback": 0}
+    )
+
+    def _is_confident(self, lexical_hits) -> bool:
+        if not self.fast_path_enabled or not lexical_hits:
+            return False
+        _top_index, top_score, top_coverage = lexical_hits[0]
+        if top_coverage < 1.0:
+            return False
+        if len(lexical_hits) == 1:
+            return True
+        return top_score >= self.fast_path_margin * lexical_hits[1][1]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun,
+                                topics: Optional[List[str]] = None) -> List[Document]:
+        if topics:
+            documents = self._search(query, topics)
+            if len(documents) >= min(self.k, self.min_filtered_results):
+                self.stats["filtered"] += 1
+                return documents
+            self.stats["filter_fallback"] += 1
+        return self._search(query, None)
+
+    def _search(self, query: str, topics: Optional[List[str]]) -> List[Document]:
+        allowed = self.lexical_index.rows_for_topics(topics) if topics else None
+        if allowed is not None and not allowed:
+            return []
+        lexical_hits = self.lexical_index.search(query, self.fetch_k, allowed=allowed)
+        if self._is_confident(lexical_hits):
+            self.stats["fast_path"] += 1
+            return [self.lexical_index.documents[i] for i, _score, _coverage in lexical_hits[: self.k]]
+
+        self.stats["hybrid"] += 1
+        search_kwargs = {"filter": topic_filter(topics)} if topics else {}
+        dense_documents = self.vectorstore.similarity_search(query, k=self.fetch_k, **search_kwargs)
+        by_key: Dict[str, Document] = {}
+        lexical_ranking = []
+        for doc_index, _score, _coverage in lexical_hits:
+            key = self.lexical_index.ids[doc_index]
+            by_key[key] = self.lexical_index.documents[doc_index]
+            lexical_ranking.append(key)
+        dense_ranking = []
+        for document in dense_documents:
+            key = document.id or document.page_content
+            by_key.setdefault(key, document)
+            dense_ranking.append(key)
+        fused = reciprocal_rank_fusion([lexical_ranking, dense_ranking], rrf_k=self.rrf_k)
+        return [by_key[key] for key in fused[: self.k]]
+
+
+def get_rag_retriever(data_directory: str = None, embedding_backend: str = None, vector_backend: str = None):
+    """
+    RAG için retriever'ı başlatır.
+    Vektör deposunu (ChromaDB veya düz NumPy indeksi) açar ve veri dizini verilmişse
+    manifest üzerinden yalnızca yeni, değişmiş veya silinmiş dosyaları indekse yansıtır.
+    Backend'ler verilmezse RAG_EMBEDDING_BACKEND / RAG_VECTOR_BACKEND ortam değişkenleri kullanılır.
+    """
+    backend = _resolve_backend(embedding_backend)
+    vector_backend = _resolve_vector_backend(vector_backend)
+    logger.info(
+        "RAG retriever başlatılıyor. Veri dizini: {}, embedding backend: {}, vektör deposu: {}".format(
+            data_directory, backend, vector_backend
         )
-        texts = text_splitter.split_documents(documents)
-        logger.info("{} parça oluşturuldu.".format(len(texts)))
+    )
+
+    embeddings, model_name = _build_embeddings(backend)
 
-        # Embedding'leri oluştur ve ChromaDB'ye kaydet
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        vectorstore = Chroma.from_documents(
-            documents=texts, embedding=embeddings, persist_directory=PERSIST_DIRECTORY
+    if INDEX_SNAPSHOT:
+        # Önceden hesaplanmış anlık görüntü: doğrula, salt okunur aç, senkronizasyon yapma.
+        vectorstore = open_snapshot(
+            INDEX_SNAPSHOT, embeddings, model_name, CHUNK_SIZE, CHUNK_OVERLAP, SNAPSHOT_EXTRACT_DIRECTORY
         )
-        vectorstore.persist()  # Veritabanını kalıcı olarak diske yaz
-        logger.info(
-            "ChromaDB oluşturuldu ve '{}' konumuna kaydedildi.".format(PERSIST_DIRECTORY)
+        return _build_retriever(vectorstore)
+
+    vectorstore, manifest_path = _open_vectorstore(backend, embeddings, vector_backend)
+
+    if data_directory and os.path.exists(data_directory):
+        sync_vectorstore(vectorstore, data_directory, model_name, manifest_path)
+    elif not vectorstore.get(limit=1, include=[])["ids"]:
+        logger.error(
+            "RAG için veri dizini '{}' bulunamadı ve vektör deposu boş. RAG devre dışı.".format(data_directory)
         )
+        return None
+    else:
+        logger.warning(
+            "Veri dizini '{}' bulunamadı; mevcut vektör deposu olduğu gibi kullanılıyor.".format(data_directory)
+        )
+
+    return _build_retriever(vectorstore)
 
-    retriever = vectorstore.as_retriever()
-    logger.info("RAG retriever başarıyla başlatıldı.")
+
+def _build_retriever(vectorstore):
+    """Vektör deposu üzerinde RETRIEVAL_MODE'a göre retriever oluşturur."""
+    if RETRIEVAL_MODE == "hybrid":
+        lexical_index = BM25Index.from_vectorstore(vectorstore)
+        logger.info("BM25 indeksi kuruldu ({} parça).".format(len(lexical_index)))
+        retriever = HybridRetriever(vectorstore=vectorstore, lexical_index=lexical_index)
+    else:
+        retriever = vectorstore.as_retriever()
+    logger.info("RAG retriever başarıyla başlatıldı (mod: {}).".format(RETRIEVAL_MODE))
     return retriever
 
 
 def reset_chroma_db():
     """
-    ChromaDB veritabanını sıfırlar. Yeni veri eklendiğinde veya veritabanı bozulduğunda kullanılabilir.
+    ChromaDB veritabanını ve düz vektör indeksini (manifest'leriyle birlikte) sıfırlar.
+    Yeni veriler açılışta otomatik eklendiği için yalnızca veritabanı bozulduğunda gereklidir.
     """
     import shutil
 
-    if os.path.exists(PERSIST_DIRECTORY):
-        logger.warning("ChromaDB veritabanı siliniyor: {}".format(PERSIST_DIRECTORY))
-        shutil.rmtree(PERSIST_DIRECTORY)
+    removed = False
+    for directory in (PERSIST_DIRECTORY, FLAT_INDEX_DIRECTORY):
+        if os.path.exists(directory):
+            logger.warning("Vektör veritabanı siliniyor: {}".format(directory))
+            shutil.rmtree(directory)
+            removed = True
+    if removed:
         logger.info(
-            "ChromaDB veritabanı silindi. Bir sonraki çalıştırmada yeniden oluşturulacak."
+            "Vektör veritabanı silindi. Bir sonraki çalıştırmada yeniden oluşturulacak."
         )
-        return True
-    return False
+    return removed
@@ -0,0 +1,332 @@
+# rag/resilience.py
+# Uzak model çağrıları (sohbet modeli, embedding) için ortak dayanıklılık katmanı:
+#   - süreç başına sınırlı eşzamanlı istek; kuyrukta fazla bekleyen istek reddedilir
+#   - tekrar denenebilir hatalarda (bkz. embedding_scheduler.is_retryable_error)
+#     full-jitter üstel geri çekilme ile yeniden deneme
+#   - kesintide hızlıca hata döndüren devre kesici (closed -> open -> half_open)
+#   - kuyruk bekleme ve üst sistem (upstream) gecikme metrikleri
+# Amaç, sağlayıcı yavaşladığında ya da çöktüğünde yükü artırmak yerine atmaktır.
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from .embedding_scheduler import is_retryable_error
+
+logger = logging.getLogger("rag_service")
+
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_MAX_QUEUE_WAIT_SECONDS = 10.0
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 4.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT_SECONDS = 30.0
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(ConnectionError):
+    """Devre açık: üst sistem kesintide kabul edildiği için çağrı hiç yapılmadı."""
+
+
+class OverloadedError(RuntimeError):
+    """Eşzamanlı istek sınırı dolu ve kuyrukta bekleme süresi aşıldı; istek atıldı."""
+
+
+class CircuitBreaker:
+    """
+    Ardışık `failure_threshold` başarısız çağrıdan sonra devre açılır ve
+    `reset_timeout` saniye boyunca çağrılar hemen CircuitOpenError ile reddedilir.
+    Süre dolunca tek bir deneme çağrısına izin verilir (half_open); başarılıysa
+    devre kapanır, değilse yeniden açılır.
+    """
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT_SECONDS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        """Devre açık ve bekleme süresi dolmadı; çağrı hiç kuyruğa alınmadan reddedilebilir."""
+        with self._lock:
+            return self.state == CIRCUIT_OPEN and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def try_acquire(self) -> Tuple[bool, bool]:
+        """
+        (izin verildi mi, bu çağrı half_open deneme çağrısı mı). Deneme çağrısını
+        alan taraf sonucu record_success/record_failure ile bildirmeli, üst sisteme
+        ulaşamadan biterse (iptal, kuyruk taşması) release_trial() çağırmalıdır.
+        """
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True, False
+            if self.state == CIRCUIT_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = CIRCUIT_HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == CIRCUIT_HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True, True
+            return False, False
+
+    def allow(self) -> bool:
+        return self.try_acquire()[0]
+
+    def release_trial(self):
+        """Sonuç bildirilmeden biten deneme çağrısının yerini bir sonraki çağrıya bırakır."""
+        with self._lock:
+            if self.state == CIRCUIT_HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CIRCUIT_CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    logger.warning("Devre kesici açıldı ({} ardışık hata).".format(self._failures))
+                self.state = CIRCUIT_OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class ResiliencePolicy:
+    """
+    Bir üst sisteme yapılan çağrıları sarmalayan politika. Aynı politika nesnesi
+    senkron (call) ve asenkron (acall) çağrılar arasında paylaşılır; eşzamanlılık
+    sınırı ve devre kesici süreç genelinde tektir.
+    """
+
+    def __init__(self, name: str, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 max_queue_wait: float = DEFAULT_MAX_QUEUE_WAIT_SECONDS,
+                 max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY, attempt_timeout: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue_wait = max_queue_wait
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Asenkron çağrılarda deneme başına süre sınırı; senkron çağrılarda sağlayıcının
+        # kendi timeout ayarı kullanılır (çalışan bir iş parçacığı kesilemez).
+        self.attempt_timeout = attempt_timeout
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, float] = {
+            "calls": 0, "succeeded": 0, "failed": 0, "retries": 0,
+            "rejected_circuit_open": 0, "rejected_overloaded": 0, "in_flight": 0,
+            "queue_wait_seconds": 0.0, "max_queue_wait_seconds": 0.0,
+            "upstream_seconds": 0.0, "max_upstream_seconds": 0.0, "upstream_attempts": 0,
+        }
+
+    # --- Metrikler ---
+    def _add(self, **values: float):
+        with self._lock:
+            for key, value in values.items():
+                self.stats[key] += value
+
+    def _observe(self, total_key: str, max_key: str, seconds: float):
+        with self._lock:
+            self.stats[total_key] += seconds
+            self.stats[max_key] = max(self.stats[max_key], seconds)
+
+    def report(self) -> Dict[str, Any]:
+        """Sayaçlar, devre durumu ve ortalama kuyruk/üst sistem gecikmesi."""
+        with self._lock:
+            stats = dict(self.stats)
+        attempts = stats["upstream_attempts"]
+        admitted = stats["calls"] - stats["rejected_circuit_open"] - stats["rejected_overloaded"]
+        stats["avg_upstream_seconds"] = round(stats["upstream_seconds"] / attempts, 3) if attempts else 0.0
+        stats["avg_queue_wait_seconds"] = round(stats["queue_wait_seconds"] / admitted, 3) if admitted > 0 else 0.0
+        for key in ("queue_wait_seconds", "max_queue_wait_seconds", "upstream_seconds", "max_upstream_seconds"):
+            stats[key] = round(stats[key], 3)
+        stats["circuit"] = self.breaker.state
+        return stats
+
+    # --- Yardımcılar ---
+    def _reject_open(self):
+        self._add(rejected_circuit_open=1)
+        raise CircuitOpenError("'{}' geçici olarak devre dışı (devre kesici açık).".format(self.name))
+
+    def _admit(self):
+        # Devre açıksa kuyruğa girmeden hemen reddedilir; half_open deneme hakkı ise
+        # ancak eşzamanlılık yuvası alındıktan sonra verilir (bkz. _try_breaker).
+        self._add(calls=1)
+        if self.breaker.is_open():
+            self._reject_open()
+
+    def _try_breaker(self) -> bool:
+        """Yuva alındıktan sonra çağrılır; bu denemenin half_open deneme çağrısı olup olmadığını döndürür."""
+        allowed, trial = self.breaker.try_acquire()
+        if not allowed:
+            self._release_slot()
+            self._reject_open()
+        return trial
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: [0, min(max_delay, base * 2^attempt)]
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _on_error(self, error: Exception, attempt: int, retry: bool) -> Optional[float]:
+        """Hata sonrası beklenecek süreyi döndürür; yeniden denenmeyecekse None."""
+        retryable = is_retryable_error(error)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            # Üst sistem yanıt verdi (örn. geçersiz istek); kesinti sayılmaz.
+            self.breaker.record_success()
+        if not retry or not retryable or attempt >= self.max_retries or self.breaker.state == CIRCUIT_OPEN:
+            self._add(failed=1)
+            return None
+        delay = self._backoff(attempt)
+        self._add(retries=1)
+        logger.warning("'{}' çağrısı başarısız ({}), {:.2f} sn sonra tekrar denenecek ({}/{}).".format(
+            self.name, type(error).__name__, delay, attempt + 1, self.max_retries
+        ))
+        return delay
+
+    def _on_success(self):
+        self.breaker.record_success()
+        self._add(succeeded=1)
+
+    # --- Senkron ---
+    def _acquire_slot(self):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.max_queue_wait):
+            self._add(rejected_overloaded=1)
+            raise OverloadedError("'{}' için eşzamanlı istek sınırı dolu ({}).".format(self.name, self.max_in_flight))
+        self._observe("queue_wait_seconds", "max_queue_wait_seconds", time.monotonic() - started)
+        self._add(in_flight=1)
+
+    def _release_slot(self):
+        self._add(in_flight=-1)
+        self._slots.release()
+
+    def call(self, function: Callable[..., Any], *args: Any, retry: bool = True, **kwargs: Any) -> Any:
+        """function(*args, **kwargs) çağrısını politika altında yürütür."""
+        self._admit()
+        attempt = 0
+        while True:
+            self._acquire_slot()
+            trial = self._try_breaker()
+            started = time.monotonic()
+            reported = False
+            try:
+                try:
+                    result = function(*args, **kwargs)
+                except Exception as e:
+                    reported = True
+                    delay = self._on_error(e, attempt, retry)
+                    if delay is None:
+                        raise
+                else:
+                    reported = True
+                    self._on_success()
+                    return result
+            finally:
+                # KeyboardInterrupt vb. ile sonuç bildirilmeden çıkılırsa deneme hakkı geri verilir.
+                if trial and not reported:
+                    self.breaker.release_trial()
+                self._observe("upstream_seconds", "max_upstream_seconds", time.monotonic() - started)
+                self._add(upstream_attempts=1)
+                self._release_slot()
+            attempt += 1
+            time.sleep(delay)
+
+    # --- Asenkron ---
+    async def _aacquire_slot(self):
+        started = time.monotonic()
+        # Semafor senkron çağrılarla paylaşıldığı için olay döngüsünü bloklamadan yoklanır.
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() - started >= self.max_queue_wait:
+                self._add(rejected_overloaded=1)
+                raise OverloadedError("'{}' için eşzamanlı istek sınırı dolu ({}).".format(
+                    self.name, self.max_in_flight
+                ))
+            await asyncio.sleep(0.01)
+        self._observe("queue_wait_seconds", "max_queue_wait_seconds", time.monotonic() - started)
+        self._add(in_flight=1)
+
+    async def acall(self, function: Callable[..., Any], *args: Any, retry: bool = True, **kwargs: Any) -> Any:
+        """Asenkron function(*args, **kwargs) çağrısını politika altında yürütür."""
+        self._admit()
+        attempt = 0
+        while True:
+            await self._aacquire_slot()
+            trial = self._try_breaker()
+            started = time.monotonic()
+            reported = False
+            try:
+                try:
+                    if self.attempt_timeout:
+                        result = await asyncio.wait_for(function(*args, **kwargs), timeout=self.attempt_timeout)
+                    else:
+                        result = await function(*args, **kwargs)
+                except asyncio.TimeoutError as e:
+                    reported = True
+                    delay = self._on_error(TimeoutError(str(e) or "'{}' deneme süresi aşıldı.".format(self.name)),
+                                           attempt, retry)
+                    if delay is None:
+                        raise
+                except Exception as e:
+                    reported = True
+                    delay = self._on_error(e, attempt, retry)
+                    if delay is None:
+                        raise
+                else:
+                    reported = True
+                    self._on_success()
+                    return result
+            finally:
+                # Görev iptal edilirse (CancelledError, örn. tur bütçesi doldu) deneme hakkı geri verilir;
+                # aksi halde devre half_open'da takılı kalır ve sonraki tüm çağrıları reddeder.
+                if trial and not reported:
+                    self.breaker.release_trial()
+                self._observe("upstream_seconds", "max_upstream_seconds", time.monotonic() - started)
+                self._add(upstream_attempts=1)
+                self._release_slot()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+class ResilientEmbeddings(Embeddings):
+    """
+    Embeddings sarmalayıcısı. Sorgu embedding'leri politika altında yeniden denenir;
+    belge partileri yalnızca eşzamanlılık sınırı ve devre kesiciden geçer, çünkü
+    onları yeniden deneme EmbeddingScheduler'ın işidir (iki katmanlı yeniden deneme
+    kesintide yükü katlar).
+    """
+
+    def __init__(self, underlying: Embeddings, policy: ResiliencePolicy):
+        self.underlying = underlying
+        self.policy = policy
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.policy.call(self.underlying.embed_documents, texts, retry=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.policy.call(self.underlying.embed_query, text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.policy.acall(self.underlying.aembed_documents, texts, retry=False)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.policy.acall(self.underlying.aembed_query, text)
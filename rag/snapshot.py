@@ -0,0 +1,206 @@
+# rag/snapshot.py
+# Önceden hesaplanmış, sağlama toplamı doğrulanan RAG indeks anlık görüntüleri.
+#
+# Kurulum (CI veya tek bir makinede):
+#     python -m rag.snapshot build --data data --output snapshots
+# Bu komut düz (NumPy) indeksi sıfırdan kurar ve şunları içeren sürümlü bir
+# .tar.gz arşivi üretir: vectors.npy, sidecar.json, ingest_manifest.json ve
+# snapshot.json (embedding modeli, parçalama parametreleri, dosya özetleri).
+# Arşivin SHA-256 özeti yanına <arşiv>.sha256 olarak yazılır.
+#
+# Açılış (her replika): RAG_INDEX_SNAPSHOT=<arşiv yolu> verildiğinde rag_service
+# arşivi doğrular, çıkarır ve salt okunur olarak açar. Parametreler uyuşmazsa
+# anlık görüntü reddedilir.
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict
+
+from .flat_index import SIDECAR_FILENAME, VECTORS_FILENAME, FlatVectorStore
+from .ingest_manifest import MANIFEST_FILENAME, file_sha256
+
+logger = logging.getLogger("rag_service")
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_META_FILENAME = "snapshot.json"
+SNAPSHOT_FILES = (VECTORS_FILENAME, SIDECAR_FILENAME, MANIFEST_FILENAME)
+VERIFIED_MARKER = ".verified"
+
+
+class SnapshotError(ValueError):
+    """Anlık görüntü bozuk, doğrulanamıyor veya mevcut yapılandırmayla uyumsuz."""
+
+
+def _checksum_path(archive_path: str) -> str:
+    return archive_path + ".sha256"
+
+
+def _read_expected_checksum(archive_path: str) -> str:
+    checksum_path = _checksum_path(archive_path)
+    if not os.path.exists(checksum_path):
+        raise SnapshotError("Sağlama toplamı dosyası bulunamadı: {}".format(checksum_path))
+    with open(checksum_path, "r", encoding="utf-8") as f:
+        return f.read().split()[0].strip().lower()
+
+
+def build_snapshot(data_directory: str, output_directory: str, embedding_backend: str = None,
+                   dtype: str = None) -> str:
+    """
+    Veri dizininden düz indeksi sıfırdan kurar ve sürümlü bir anlık görüntü arşivi üretir.
+    Arşivin yolunu döndürür.
+    """
+    from . import rag_service
+
+    backend = rag_service._resolve_backend(embedding_backend)
+    dtype = dtype or rag_service.FLAT_INDEX_DTYPE
+    embeddings, model_name = rag_service._build_embeddings(backend)
+    os.makedirs(output_directory, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as work_directory:
+        index_directory = os.path.join(work_directory, "index")
+        store = FlatVectorStore(index_directory, embedding_function=embeddings, dtype=dtype)
+        manifest_path = os.path.join(index_directory, MANIFEST_FILENAME)
+        stats = rag_service.sync_vectorstore(store, data_directory, model_name, manifest_path)
+        store.flush()
+        if not len(store) or not os.path.exists(manifest_path):
+            # Boş/yüklenebilir dosyası olmayan dizinde manifest hiç yazılmaz; boş arşiv üretme.
+            raise SnapshotError("'{}' içinde indekslenecek belge bulunamadı; anlık görüntü oluşturulmadı.".format(
+                data_directory))
+
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        content_digest = hashlib.sha256(
+            "".join(
+                "{}:{}".format(path, info["sha256"]) for path, info in sorted(manifest["files"].items())
+            ).encode("utf-8")
+        ).hexdigest()
+        created_at = datetime.now(timezone.utc)
+        version = "{:%Y%m%d%H%M%S}-{}".format(created_at, content_digest[:12])
+        meta = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "version": version,
+            "created_at": created_at.isoformat(),
+            "embedding_backend": backend,
+            "embedding_model": model_name,
+            "chunk_size": rag_service.CHUNK_SIZE,
+            "chunk_overlap": rag_service.CHUNK_OVERLAP,
+            "dtype": dtype,
+            "chunk_count": len(store),
+            "file_count": len(manifest["files"]),
+            "files": {name: file_sha256(os.path.join(index_directory, name)) for name in SNAPSHOT_FILES},
+        }
+        with open(os.path.join(index_directory, SNAPSHOT_META_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        archive_name = "rag-index-{}-{}.tar.gz".format(backend, version)
+        archive_path = os.path.join(output_directory, archive_name)
+        tmp_archive = archive_path + ".tmp"
+        with tarfile.open(tmp_archive, "w:gz") as tar:
+            for name in (SNAPSHOT_META_FILENAME,) + SNAPSHOT_FILES:
+                tar.add(os.path.join(index_directory, name), arcname=name)
+        os.replace(tmp_archive, archive_path)
+
+    archive_checksum = file_sha256(archive_path)
+    with open(_checksum_path(archive_path), "w", encoding="utf-8") as f:
+        f.write("{}  {}\n".format(archive_checksum, archive_name))
+    logger.info(
+        "Anlık görüntü oluşturuldu: {} ({} parça, {} dosya, {:.1f} parça/sn)".format(
+            archive_path, meta["chunk_count"], meta["file_count"],
+            stats.get("throughput", {}).get("chunks_per_second", 0.0),
+        )
+    )
+    return archive_path
+
+
+def verify_snapshot_meta(meta: Dict, embedding_model: str, chunk_size: int, chunk_overlap: int):
+    """Anlık görüntünün parametrelerini mevcut yapılandırmayla karşılaştırır; uyuşmazsa SnapshotError fırlatır."""
+    expected = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "embedding_model": embedding_model,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+    }
+    mismatches = [
+        "{}: anlık görüntü={!r}, beklenen={!r}".format(key, meta.get(key), value)
+        for key, value in expected.items()
+        if meta.get(key) != value
+    ]
+    if mismatches:
+        raise SnapshotError("Anlık görüntü mevcut yapılandırmayla uyumsuz: " + "; ".join(mismatches))
+
+
+def open_snapshot(archive_path: str, embeddings, embedding_model: str, chunk_size: int, chunk_overlap: int,
+                  extract_root: str) -> FlatVectorStore:
+    """
+    Arşivin SHA-256 özetini doğrular, (gerekirse) extract_root altına çıkarır, içerdiği
+    dosyaların özetlerini ve parametrelerini kontrol eder ve indeksi salt okunur açar.
+    Aynı arşiv daha önce doğrulanarak çıkarılmışsa yalnızca açılır.
+    """
+    if not os.path.exists(archive_path):
+        raise SnapshotError("Anlık görüntü bulunamadı: {}".format(archive_path))
+    expected_checksum = _read_expected_checksum(archive_path)
+    target_directory = os.path.join(extract_root, expected_checksum[:16])
+    marker_path = os.path.join(target_directory, VERIFIED_MARKER)
+
+    if not os.path.exists(marker_path):
+        actual_checksum = file_sha256(archive_path)
+        if actual_checksum != expected_checksum:
+            raise SnapshotError(
+                "Anlık görüntü sağlama toplamı uyuşmuyor: {} (beklenen {}, bulunan {})".format(
+                    archive_path, expected_checksum, actual_checksum
+                )
+            )
+        os.makedirs(extract_root, exist_ok=True)
+        staging_directory = tempfile.mkdtemp(dir=extract_root)
+        try:
+            with tarfile.open(archive_path, "r:gz") as tar:
+                tar.extractall(staging_directory, filter="data")
+            with open(os.path.join(staging_directory, SNAPSHOT_META_FILENAME), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            for name, digest in meta.get("files", {}).items():
+                if file_sha256(os.path.join(staging_directory, name)) != digest:
+                    raise SnapshotError("Anlık görüntüdeki '{}' dosyası bozuk.".format(name))
+            open(os.path.join(staging_directory, VERIFIED_MARKER), "w").close()
+            if os.path.exists(target_directory):
+                shutil.rmtree(target_directory)
+            os.replace(staging_directory, target_directory)
+        except Exception:
+            shutil.rmtree(staging_directory, ignore_errors=True)
+            raise
+
+    with open(os.path.join(target_directory, SNAPSHOT_META_FILENAME), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    verify_snapshot_meta(meta, embedding_model, chunk_size, chunk_overlap)
+    store = FlatVectorStore(target_directory, embedding_function=embeddings, dtype=meta["dtype"], read_only=True)
+    logger.info(
+        "Anlık görüntü açıldı: {} (sürüm {}, {} parça)".format(archive_path, meta["version"], len(store))
+    )
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RAG indeks anlık görüntüsü oluşturur.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Veri dizininden anlık görüntü oluştur")
+    build.add_argument("--data", required=True, help="Kaynak belgelerin bulunduğu dizin")
+    build.add_argument("--output", required=True, help="Arşivin yazılacağı dizin")
+    build.add_argument("--embedding-backend", default=None, help="google veya local (varsayılan: RAG_EMBEDDING_BACKEND)")
+    build.add_argument("--dtype", default=None, choices=("float32", "float16"))
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        try:
+            archive_path = build_snapshot(args.data, args.output, args.embedding_backend, args.dtype)
+        except SnapshotError as e:
+            parser.exit(1, "Hata: {}\n".format(e))
+        print(archive_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# rag/text_normalize.py
+# Türkçe metinler için ortak normalizasyon ve tokenizasyon yardımcıları.
+# Python'un str.lower() fonksiyonu "I" -> "i" ve "İ" -> "i̇" (noktalı, iki karakter)
+# dönüşümü yaptığı için Türkçe eşleştirmede yanlış sonuç verir.
+import re
+import unicodedata
+from typing import List
+
+_TURKISH_CASE_MAP = str.maketrans({"I": "ı", "İ": "i"})
+# Türkçe karakterleri klavyede sıkça yazıldıkları ASCII karşılıklarına indirger
+# ("olmek" = "ölmek"). turkish_casefold'dan sonra uygulanır.
+_ASCII_FOLD_MAP = str.maketrans({"ç": "c", "ğ": "g", "ı": "i", "ö": "o", "ş": "s", "ü": "u", "â": "a", "î": "i", "û": "u"})
+
+# Tire ile bağlı parçalar ("4-7-8", "kedi-inek") tek token olarak korunur.
+_TOKEN_PATTERN = re.compile(r"\w+(?:-\w+)*")
+
+
+def turkish_casefold(text: str) -> str:
+    """Metni Türkçe kurallarına göre küçük harfe çevirir (NFC normalize edilmiş)."""
+    return unicodedata.normalize("NFC", text).translate(_TURKISH_CASE_MAP).lower()
+
+
+def ascii_fold(text: str) -> str:
+    """Türkçe küçük harfe çevirip Türkçe karakterleri ASCII karşılıklarına indirger."""
+    return turkish_casefold(text).translate(_ASCII_FOLD_MAP)
+
+
+def tokenize(text: str) -> List[str]:
+    """Metni Türkçe küçük harfe çevirip kelime token'larına ayırır."""
+    return _TOKEN_PATTERN.findall(turkish_casefold(text))
@@ -0,0 +1,90 @@
+# rag/topic_router.py
+# Bilgi dosyalarını konu (topic) etiketleriyle eşleyen ve kullanıcının formda
+# seçtiği duygu / ihtiyaç bilgisinden aramanın daraltılacağı konuları çıkaran
+# yönlendirici. Ek LLM çağrısı yapmaz; tamamen sözlük tabanlıdır.
+#
+# İndeksleme sırasında her parçanın metadata'sına "topic" yazılır; retriever bu
+# alan üzerinde ön filtre uygular, filtre yeterli sonuç vermezse tüm korpusa döner.
+import os
+from typing import Iterable, List, Optional
+
+from .text_normalize import turkish_casefold
+
+TOPIC_METADATA_KEY = "topic"
+
+TOPIC_ANXIETY = "anxiety"
+TOPIC_STRESS = "stress"
+TOPIC_MINDFULNESS = "mindfulness"
+TOPIC_EMOTIONAL_SUPPORT = "emotional_support"
+KNOWN_TOPICS = (TOPIC_ANXIETY, TOPIC_STRESS, TOPIC_MINDFULNESS, TOPIC_EMOTIONAL_SUPPORT)
+
+# data/ altındaki mevcut bilgi dosyaları (uzantısız ad -> konu)
+TOPIC_BY_FILENAME = {
+    "anxiety_management": TOPIC_ANXIETY,
+    "stress_management": TOPIC_STRESS,
+    "mindfulness_techniques": TOPIC_MINDFULNESS,
+    "emotional_support": TOPIC_EMOTIONAL_SUPPORT,
+}
+
+# Arayüzdeki duygu listesi (features/app.py: duygu_listesi). Anahtarlar turkish_casefold
+# uygulanmış hâlleridir. "Belirsiz" bilinçli olarak yoktur: filtre uygulanmaz.
+EMOTION_TOPICS = {
+    "mutlu": [TOPIC_MINDFULNESS, TOPIC_EMOTIONAL_SUPPORT],
+    "üzgün": [TOPIC_EMOTIONAL_SUPPORT],
+    "kızgın": [TOPIC_STRESS, TOPIC_MINDFULNESS],
+    "endişeli": [TOPIC_ANXIETY],
+    "yorgun": [TOPIC_STRESS, TOPIC_MINDFULNESS],
+    "stresli": [TOPIC_STRESS, TOPIC_ANXIETY],
+    "heyecanlı": [TOPIC_ANXIETY, TOPIC_MINDFULNESS],
+}
+
+# Arayüzdeki ihtiyaç listesi (features/app.py: ihtiyac_listesi)
+NEED_TOPICS = {
+    "sadece dinlenilmek istiyorum": [TOPIC_EMOTIONAL_SUPPORT],
+    "biraz motivasyona ihtiyacım var": [TOPIC_EMOTIONAL_SUPPORT],
+    "stresle başa çıkmak için bir yöntem arıyorum": [TOPIC_STRESS, TOPIC_ANXIETY],
+    "odaklanmama yardımcı ol": [TOPIC_MINDFULNESS],
+    "kendimi daha iyi hissetmek istiyorum": [TOPIC_EMOTIONAL_SUPPORT, TOPIC_MINDFULNESS],
+}
+
+
+def topic_for_path(rel_path: str) -> str:
+    """
+    Veri dizinine göreli dosya yolundan konu etiketini türetir. Alt dizindeki
+    dosyalar (örn. data/anxiety/makale.pdf) dizin adını, kök dizindekiler
+    TOPIC_BY_FILENAME eşlemesini ya da uzantısız dosya adını konu olarak alır.
+    """
+    parts = rel_path.replace("\\", "/").split("/")
+    if len(parts) > 1:
+        return parts[0].lower()
+    stem = os.path.splitext(parts[0])[0].lower()
+    return TOPIC_BY_FILENAME.get(stem, stem)
+
+
+def _lookup(table: dict, label: Optional[str]) -> List[str]:
+    if not label:
+        return []
+    return table.get(" ".join(turkish_casefold(label).split()), [])
+
+
+def route_topics(emotion: Optional[str] = None, need: Optional[str] = None,
+                 available_topics: Iterable[str] = KNOWN_TOPICS) -> List[str]:
+    """
+    Seçilen duygu ve ihtiyaca göre aramanın daraltılacağı konuları döndürür.
+    İhtiyaç daha belirleyici olduğu için önce onun konuları gelir. Eşleşme yoksa
+    veya sonuç bilinen konuların tamamını kapsıyorsa (filtre bir şey kazandırmaz)
+    boş liste döner; bu durumda tüm korpusta arama yapılmalıdır.
+    """
+    available = set(available_topics)
+    topics = [
+        topic for topic in dict.fromkeys(_lookup(NEED_TOPICS, need) + _lookup(EMOTION_TOPICS, emotion))
+        if topic in available
+    ]
+    if not topics or set(topics) >= available:
+        return []
+    return topics
+
+
+def topic_filter(topics: List[str]) -> dict:
+    """Konu listesini vektör deposunun (Chroma sözdizimli) metadata filtresine çevirir."""
+    return {TOPIC_METADATA_KEY: {"$in": list(topics)}}
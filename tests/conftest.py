@@ -0,0 +1,6 @@
+# Testler proje kökünden (agents/, rag/) içe aktarım yapar.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
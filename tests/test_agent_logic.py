@@ -0,0 +1,74 @@
+# agents/agent_logic.py: senkron turda RAG aramasının tur bütçesiyle sınırlanması.
+import time
+
+import pytest
+
+from agents.agent_logic import EmotionalSupportAgent
+from agents.deadline import STAGE_RETRIEVAL
+
+
+class _SlowRetriever:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def get_relevant_documents(self, query):
+        time.sleep(self.seconds)
+        return []
+
+
+class _Executor:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, inputs, config=None):
+        self.calls += 1
+        return {"output": "LLM yanıtı"}
+
+
+@pytest.fixture
+def agent():
+    agent = EmotionalSupportAgent(api_key="test", retriever=_SlowRetriever(2.0), enable_fast_path=False,
+                                  turn_budget_seconds=0.3)
+    agent.agent_executor = _Executor()
+    return agent
+
+
+def test_sync_retrieval_is_bounded_by_turn_budget(agent):
+    started = time.perf_counter()
+    result = agent.process_user_input("Bugün çok yorgunum")
+    assert time.perf_counter() - started < 1.0
+    assert result["success"]
+    assert result["deadline"]["stage"] == STAGE_RETRIEVAL
+    assert agent.agent_executor.calls == 0
+
+
+def test_stream_retrieval_is_bounded_by_turn_budget(agent):
+    started = time.perf_counter()
+    events = list(agent.stream_user_input("Bugün çok yorgunum"))
+    assert time.perf_counter() - started < 1.0
+    assert events[-1]["result"]["deadline"]["stage"] == STAGE_RETRIEVAL
+
+
+def test_fast_retrieval_reaches_the_agent(agent):
+    agent.retriever = _SlowRetriever(0.0)
+    agent.turn_budget_seconds = 10.0
+    result = agent.process_user_input("Bugün çok yorgunum")
+    assert result["response"] == "LLM yanıtı"
+    assert "deadline" not in result
+
+
+def test_crisis_turn_does_not_raise_fast_path_rate():
+    agent = EmotionalSupportAgent(api_key="test", retriever=_SlowRetriever(0.0), enable_fast_path=True)
+    agent.agent_executor = _Executor()
+    agent.process_user_input("nefes egzersizi öner")
+    agent.process_user_input("Bugün çok yorgunum")
+    before = agent.get_routing_report()
+    assert before["fast_path_rate"] == 0.5
+
+    result = agent.process_user_input("Kendimi öldürmek istiyorum")
+    assert result["route"] == "agent"
+    assert result["crisis"]
+    report = agent.get_routing_report()
+    assert report["total_turns"] == 3
+    assert report["fast_path_rate"] < before["fast_path_rate"]
+    assert set(report["routes"]) == {"breathing", "agent"}
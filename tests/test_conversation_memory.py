@@ -0,0 +1,64 @@
+# agents/conversation_memory.py: özet katlamasının turu bekletmemesi.
+import threading
+import time
+
+from langchain_core.messages import SystemMessage
+
+from agents.conversation_memory import SUMMARY_PREFIX, RollingSummaryMemory
+
+
+def _slow_memory(release: threading.Event, saved: list):
+    def summarizer(previous, messages):
+        release.wait(5)
+        return "özet: {} mesaj".format(len(messages))
+
+    return RollingSummaryMemory(summarizer=summarizer, max_recent_turns=2, on_summary_updated=saved.append)
+
+
+def _save_turns(memory, count, start=0):
+    for i in range(start, start + count):
+        memory.save_context({"input": "soru {}".format(i)}, {"output": "cevap {}".format(i)})
+
+
+def test_fold_does_not_block_save_context():
+    release, saved = threading.Event(), []
+    memory = _slow_memory(release, saved)
+    started = time.perf_counter()
+    _save_turns(memory, 3)
+    assert time.perf_counter() - started < 1.0
+    # Katlama sürerken katlanan turlar istemden düşmez
+    history = memory.load_memory_variables({})["chat_history"]
+    assert [m.content for m in history] == ["soru 0", "cevap 0", "soru 1", "cevap 1", "soru 2", "cevap 2"]
+    assert memory.state()["summarized_turns"] == 0
+    assert saved == []
+
+    release.set()
+    assert memory.wait_for_summary(timeout=5)
+    history = memory.load_memory_variables({})["chat_history"]
+    assert isinstance(history[0], SystemMessage)
+    assert history[0].content == SUMMARY_PREFIX + "özet: 4 mesaj"
+    assert [m.content for m in history[1:]] == ["soru 2", "cevap 2"]
+    assert saved == [{"summary": "özet: 4 mesaj", "summarized_turns": 2}]
+
+
+def test_turns_queued_during_fold_are_folded_next():
+    release, saved = threading.Event(), []
+    memory = _slow_memory(release, saved)
+    _save_turns(memory, 3)
+    _save_turns(memory, 2, start=3)
+    release.set()
+    assert memory.wait_for_summary(timeout=5)
+    assert memory.state()["summarized_turns"] == 4
+    assert [m.content for m in memory.chat_memory.messages] == ["soru 4", "cevap 4"]
+
+
+def test_clear_discards_fold_in_flight():
+    release, saved = threading.Event(), []
+    memory = _slow_memory(release, saved)
+    _save_turns(memory, 3)
+    memory.clear()
+    release.set()
+    assert memory.wait_for_summary(timeout=5)
+    time.sleep(0.05)
+    assert memory.state() == {"summary": "", "summarized_turns": 0}
+    assert saved == []
@@ -0,0 +1,50 @@
+# agents/crisis_detector.py: etiketli set üzerinde kesinlik/duyarlılık ve olumsuzlama.
+import pytest
+
+from agents.crisis_detector import LABELED_EXAMPLES, LEVEL_ACUTE, LEVEL_NONE, detect_crisis, evaluate
+
+
+def _precision_recall(level):
+    predicted = [(detect_crisis(text).level, expected) for text, expected in LABELED_EXAMPLES]
+    true_positive = sum(1 for got, expected in predicted if got == level and expected == level)
+    flagged = sum(1 for got, _expected in predicted if got == level)
+    actual = sum(1 for _got, expected in predicted if expected == level)
+    return true_positive / flagged, true_positive / actual
+
+
+def test_labeled_set_has_no_errors():
+    report = evaluate()
+    assert report["errors"] == []
+    assert report["accuracy"] == 1.0
+
+
+def test_acute_precision_and_recall():
+    precision, recall = _precision_recall(LEVEL_ACUTE)
+    assert precision == 1.0
+    assert recall == 1.0
+
+
+@pytest.mark.parametrize("text", [
+    "Arkadaşım intihar etti",
+    "Jiletle tıraş oldum",
+    "kendimi öldürmeyeceğim",
+    "İntihar etmeyi düşünmüyorum",
+])
+def test_reported_false_positives_are_not_crisis(text):
+    assert (text, LEVEL_NONE) in LABELED_EXAMPLES
+    assert detect_crisis(text).level == LEVEL_NONE
+
+
+@pytest.mark.parametrize("text", [
+    "intihar etmeyi düşünüyorum",
+    "kendimi öldürmem lazım",
+    "kendimi jiletle kesiyorum",
+])
+def test_first_person_intent_stays_acute(text):
+    assert detect_crisis(text).is_acute
+
+
+def test_negation_only_vetoes_its_own_phrase():
+    assessment = detect_crisis("Kendimi öldürmeyeceğim dedim ama ölmek istiyorum")
+    assert assessment.is_acute
+    assert assessment.matches == ["ölmek istiyor"]
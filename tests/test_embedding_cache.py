@@ -0,0 +1,32 @@
+# rag/embedding_cache.py: disk sınırının her yazmada sayım yapmadan korunması.
+from langchain_core.embeddings import Embeddings
+
+from rag.embedding_cache import CachedEmbeddings
+
+
+class _FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 0.0]
+
+
+def test_disk_cap_is_enforced_without_counting_every_insert(tmp_path):
+    cache = CachedEmbeddings(_FakeEmbeddings(), "fake", str(tmp_path / "cache.sqlite3"), memory_size=4,
+                             max_disk_entries=100)
+    count_queries = []
+    cache._conn.set_trace_callback(lambda sql: count_queries.append(sql) if "COUNT(*)" in sql else None)
+
+    inserts = 500
+    for i in range(inserts):
+        cache.embed_query("metin {}".format(i))
+
+    cache._conn.set_trace_callback(None)
+    (on_disk,) = cache._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+    assert on_disk <= 100
+    assert cache.stats()["disk_entries"] == on_disk
+    assert cache.stats()["evictions"] == inserts - on_disk
+    # Silme sınırın %10 altına indirdiği için sayım yalnızca ~her 10 yazmada bir yapılır
+    assert len(count_queries) <= inserts // 10
+    cache.close()
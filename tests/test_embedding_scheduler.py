@@ -0,0 +1,104 @@
+# rag/embedding_scheduler.py ve rag/ingest_pipeline.py: yeniden deneme, sıra ve kaldığı yerden devam.
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from rag.embedding_scheduler import EmbeddingScheduler, SimulatedEmbeddings, SimulatedRateLimitError
+from rag.flat_index import FlatVectorStore
+from rag.ingest_pipeline import run_ingest
+
+
+class _FakeEmbeddings(Embeddings):
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 0.0]
+
+
+class _FailAfter(Embeddings):
+    """İlk `ok_calls` çağrıdan sonra tekrar denenemeyen bir hata fırlatır (yarıda kalan kurulum)."""
+
+    def __init__(self, underlying, ok_calls):
+        self.underlying = underlying
+        self.ok_calls = ok_calls
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls > self.ok_calls:
+            raise ValueError("kurulum kesildi")
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.underlying.embed_query(text)
+
+
+TEXTS = ["metin {}".format("x" * i) for i in range(7)]
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_retries_transient_errors_and_preserves_order(concurrency):
+    simulated = SimulatedEmbeddings(_FakeEmbeddings(), latency=0.0, fail_first=2)
+    scheduler = EmbeddingScheduler(simulated, batch_size=2, concurrency=concurrency, base_delay=0.001)
+    vectors = scheduler.embed_documents(TEXTS)
+    assert vectors == _FakeEmbeddings().embed_documents(TEXTS)
+    assert scheduler.stats["retries"] == 2
+    assert scheduler.stats["requests"] == 4 + 2
+
+
+def test_random_errors_are_retried_until_success():
+    simulated = SimulatedEmbeddings(_FakeEmbeddings(), latency=0.0, error_rate=0.3, seed=7)
+    scheduler = EmbeddingScheduler(simulated, batch_size=1, concurrency=2, max_retries=20, base_delay=0.001)
+    assert scheduler.embed_documents(TEXTS) == _FakeEmbeddings().embed_documents(TEXTS)
+    assert scheduler.stats["requests"] == simulated.calls == len(TEXTS) + scheduler.stats["retries"]
+
+
+def test_gives_up_after_max_retries():
+    simulated = SimulatedEmbeddings(_FakeEmbeddings(), latency=0.0, fail_first=10)
+    scheduler = EmbeddingScheduler(simulated, batch_size=8, concurrency=1, max_retries=2, base_delay=0.001)
+    with pytest.raises(SimulatedRateLimitError):
+        scheduler.embed_documents(TEXTS)
+    assert simulated.calls == 3
+    assert scheduler.stats["retries"] == 2
+
+
+def test_non_retryable_error_is_raised_without_retry():
+    failing = _FailAfter(_FakeEmbeddings(), ok_calls=0)
+    scheduler = EmbeddingScheduler(failing, batch_size=8, concurrency=1, base_delay=0.001)
+    with pytest.raises(ValueError):
+        scheduler.embed_documents(TEXTS)
+    assert failing.calls == 1
+    assert scheduler.stats["retries"] == 0
+
+
+def test_second_run_resumes_after_mid_build_failure(tmp_path):
+    source = tmp_path / "stres.txt"
+    source.write_text("\n".join("Paragraf {}: nefes al, yavaşça ver.".format(i) for i in range(10)), encoding="utf-8")
+    tasks = [(str(source), "stres.txt", "ozet")]
+    store = FlatVectorStore(str(tmp_path / "index"), embedding_function=_FakeEmbeddings())
+    done = {}
+
+    def on_file_done(rel_path, chunk_ids):
+        done[rel_path] = chunk_ids
+
+    # Her parti iki parça; ikinci partiden sonra kurulum kesilir
+    first = _FailAfter(_FakeEmbeddings(), ok_calls=2)
+    with pytest.raises(ValueError):
+        run_ingest(store, tasks, on_file_done, chunk_size=40, chunk_overlap=0,
+                   scheduler=EmbeddingScheduler(first, batch_size=2, concurrency=1))
+    written = len(store)
+    assert written == 4
+    assert done == {}
+
+    second = _FakeEmbeddings()
+    progress = run_ingest(store, tasks, on_file_done, chunk_size=40, chunk_overlap=0,
+                          scheduler=EmbeddingScheduler(second, batch_size=2, concurrency=1))
+    total = len(done["stres.txt"])
+    assert total > written
+    assert progress.skipped == written
+    assert progress.chunks_done == len(second.texts) == total - written
+    assert len(store) == total
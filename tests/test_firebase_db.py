@@ -0,0 +1,170 @@
+# agents/firebase_db.py: yerel depo (LocalFirestoreClient) üzerinde silme ve yazma kuyruğu.
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from agents import firebase_db
+from agents.history_cache import HistoryCache
+from agents.local_store import LocalFirestoreClient
+from agents.session_manager import SessionPool
+
+
+@pytest.fixture
+def client():
+    return LocalFirestoreClient()
+
+
+@pytest.fixture(autouse=True)
+def memory_history_cache(monkeypatch):
+    cache = HistoryCache(":memory:")
+    monkeypatch.setattr(firebase_db, "_history_cache", cache)
+    yield cache
+    cache.close()
+
+
+def _conversation_ids(client, user_id):
+    return [ref.id for ref in client.collection("users").document(user_id).collection("conversations").list_documents()]
+
+
+def _turn(user_id, i):
+    return {"user_id": user_id, "user_message": "soru {}".format(i), "ai_response": "cevap {}".format(i),
+            "time": firebase_db.firestore.SERVER_TIMESTAMP}
+
+
+def test_delete_user_data_purges_queued_writes_and_session(client, memory_history_cache):
+    queue = firebase_db.WriteBehindQueue(client, flush_interval=60.0)
+    pool = SessionPool()
+    pool.get("silinen", conversations=[])
+    firebase_db.save_conversation(client, "silinen", _turn("silinen", 0))
+    memory_history_cache.store("silinen", "conversations", "time", [("x", {"time": datetime.now(timezone.utc)})], complete=True)
+    for i in range(5):
+        queue.enqueue_turn("silinen", _turn("silinen", i))
+        queue.enqueue_turn("kalan", _turn("kalan", i))
+
+    assert firebase_db.delete_user_data(client, "silinen", write_queue=queue, session_pool=pool)
+    queue.close()
+
+    assert _conversation_ids(client, "silinen") == []
+    assert len(_conversation_ids(client, "kalan")) == 5
+    assert queue.report()["purged"] == 5
+    assert len(pool) == 0
+    assert memory_history_cache.sync_state("silinen", "conversations") is None
+
+
+def test_writes_after_purge_are_kept(client):
+    queue = firebase_db.WriteBehindQueue(client, flush_interval=0.01)
+    queue.enqueue_turn("u", _turn("u", 0))
+    queue.purge("u")
+    queue.enqueue_turn("u", _turn("u", 1))
+    queue.close()
+    conversations = firebase_db.load_conversations(client, "u")
+    assert [entry["user_message"] for entry in conversations] == ["soru 1"]
+
+
+def _commit_turns(client, user_id, numbers):
+    # Tek commit: tüm kayıtlar aynı sunucu zamanını alır
+    queue = firebase_db.WriteBehindQueue(client, flush_interval=0.01)
+    for i in numbers:
+        queue.enqueue(user_id, "conversations", _turn(user_id, i))
+    queue.close()
+
+
+def _messages(page):
+    return sorted(entry["user_message"] for entry in page)
+
+
+def test_delta_sync_keeps_writes_sharing_the_cursor_timestamp(client):
+    _commit_turns(client, "u", [0, 1])
+    page = firebase_db.load_conversations(client, "u")
+    since, seen = page[-1]["time"], firebase_db.newest_ids(page, "time")
+    assert len(seen) == 2
+
+    # Sınırdaki kayıtlar >= ile tekrar okunur ama kimlikle ayıklanır
+    assert firebase_db.load_conversations(client, "u", since=since, seen_ids=seen) == []
+    assert _messages(firebase_db.load_conversations(client, "u", since=since)) == ["soru 0", "soru 1"]
+
+    _commit_turns(client, "u", [2, 3])
+    delta = firebase_db.load_conversations(client, "u", since=since, seen_ids=seen)
+    assert _messages(delta) == ["soru 2", "soru 3"]
+
+
+def test_mirror_cursor_does_not_skip_same_timestamp_history(client, memory_history_cache):
+    _commit_turns(client, "u", [0, 1, 2])
+    load = lambda: firebase_db._load_cached_history(memory_history_cache, client, "u", "conversations", "time",
+                                                    latest=2)
+    load()
+    page = load()  # aynadan
+    assert len(page) == 2 and page.has_more
+    older = firebase_db.load_history_page(client, "u", "conversations", "time", start_after=page.cursor,
+                                          newest_first=True)
+    assert len(older) == 1
+    assert _messages(list(page) + list(older)) == ["soru 0", "soru 1", "soru 2"]
+
+    _commit_turns(client, "u", [3])
+    assert _messages(firebase_db._load_cached_history(memory_history_cache, client, "u", "conversations",
+                                                      "time")) == ["soru 0", "soru 1", "soru 2", "soru 3"]
+
+
+class _RecordingClient(LocalFirestoreClient):
+    """Commit boyutlarını ve aynı anda yolda olan commit sayısını kaydeder."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.commit_sizes = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._record_lock = threading.Lock()
+
+    def _commit(self, writes):
+        with self._record_lock:
+            self.commit_sizes.append(len(writes))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            super()._commit(writes)
+        finally:
+            with self._record_lock:
+                self.in_flight -= 1
+
+
+def _fill(client, user_id, collection, count):
+    ref = client.collection("users").document(user_id).collection(collection)
+    for start in range(0, count, 500):
+        batch = client.batch()
+        for i in range(start, min(count, start + 500)):
+            batch.set(ref.document("doc{:05d}".format(i)), {"i": i})
+        batch.commit()
+    return ref
+
+
+def test_delete_collection_commits_at_most_500_deletes():
+    client = _RecordingClient(latency=0.005)
+    ref = _fill(client, "u", "conversations", 1234)
+    client.commit_sizes.clear()
+    progress = []
+
+    deleted = firebase_db.delete_collection(client, ref, batch_size=1000, max_workers=2,
+                                            on_progress=lambda name, count: progress.append((name, count)))
+
+    assert deleted == 1234
+    assert list(ref.list_documents()) == []
+    assert max(client.commit_sizes) <= firebase_db.DELETE_BATCH_SIZE
+    assert sum(client.commit_sizes) == 1234
+    assert client.max_in_flight <= 2
+    assert progress[-1] == ("conversations", 1234)
+    assert [count for _name, count in progress] == sorted(count for _name, count in progress)
+
+
+def test_delete_user_data_empties_every_subcollection():
+    client = _RecordingClient()
+    _fill(client, "u", "conversations", 700)
+    _fill(client, "u", "mood_history", 501)
+    firebase_db.save_memory_summary(client, "u", {"summary": "özet", "summarized_turns": 3})
+    client.commit_sizes.clear()
+
+    assert firebase_db.delete_user_data(client, "u")
+
+    for collection in firebase_db.USER_SUBCOLLECTIONS:
+        assert list(client.collection("users").document("u").collection(collection).list_documents()) == []
+    assert max(client.commit_sizes) <= firebase_db.DELETE_BATCH_SIZE
@@ -0,0 +1,30 @@
+# rag/flat_index.py: aynı çağrıda tekrar eden ID'lerin tek canlı satır bırakması.
+from langchain_core.embeddings import Embeddings
+
+from rag.flat_index import FlatVectorStore
+
+
+class _FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 0.0]
+
+
+def test_duplicate_ids_in_one_upsert_keep_the_last(tmp_path):
+    store = FlatVectorStore(str(tmp_path / "index"), embedding_function=_FakeEmbeddings())
+    store.upsert_embeddings(ids=["a", "b", "a"], embeddings=[[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]],
+                            documents=["eski", "b", "yeni"], metadatas=[{"v": 1}, None, {"v": 2}])
+    assert len(store) == 2
+    assert int(store._alive.sum()) == 2
+    assert store.get(ids=["a"])["documents"] == ["yeni"]
+
+    store.delete(ids=["a"])
+    assert len(store) == 1
+    results = store.similarity_search_by_vector([1.0, 1.0], k=4)
+    assert [doc.page_content for doc in results] == ["b"]
+
+    store.flush()
+    reopened = FlatVectorStore(str(tmp_path / "index"), embedding_function=_FakeEmbeddings())
+    assert reopened.get()["ids"] == ["b"]
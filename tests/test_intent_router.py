@@ -0,0 +1,43 @@
+# agents/intent_router.py: olumsuzlama/yapamama vetosu ve açık istek şartı.
+import pytest
+
+from agents.intent_router import IntentRouter
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter()
+
+
+@pytest.mark.parametrize("text", [
+    "spor yapmak istemiyorum",
+    "Yürüyüş yapamıyorum bacağım kırık",
+    "nefes alamıyorum",
+    "meditasyon yapmak istemem, öner de",
+    "koşamıyorum ama yürüyüş öner",
+])
+def test_negation_and_inability_go_to_agent(router, text):
+    decision = router.classify(text)
+    assert decision.route is None
+    assert decision.reason == "negated"
+
+
+@pytest.mark.parametrize("text", ["meditasyon", "nefes", "yürüyüş spor"])
+def test_short_messages_without_request_go_to_agent(router, text):
+    decision = router.classify(text)
+    assert decision.route is None
+    assert decision.reason == "not_a_request"
+
+
+@pytest.mark.parametrize("text, route", [
+    ("nefes egzersizi öner", "breathing"),
+    ("Bana bir meditasyon önerir misin", "meditation"),
+    ("yürüyüş yapmak istiyorum", "physical_activity"),
+    ("tamam, nefes egzersizi yapalım", "breathing"),
+])
+def test_explicit_requests_take_fast_path(router, text, route):
+    assert router.classify(text).route_name == route
+
+
+def test_crisis_messages_are_vetoed(router):
+    assert router.classify("ölmek istiyorum, nefes egzersizi öner").reason == "veto"
@@ -0,0 +1,100 @@
+# rag/resilience.py: devre kesici geçişleri ve half_open deneme hakkının geri verilmesi.
+import asyncio
+import time
+
+import pytest
+
+from rag.resilience import (
+    CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, CircuitBreaker, CircuitOpenError,
+    OverloadedError, ResiliencePolicy,
+)
+
+
+def _fail():
+    raise ConnectionError("upstream down")
+
+
+def _policy(**kwargs):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    defaults = dict(max_retries=0, base_delay=0, max_delay=0, breaker=breaker)
+    defaults.update(kwargs)
+    return ResiliencePolicy("test", **defaults), breaker
+
+
+def _open_and_wait(policy, breaker):
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            policy.call(_fail)
+    assert breaker.state == CIRCUIT_OPEN
+    time.sleep(0.06)
+
+
+def test_breaker_opens_after_threshold_and_rejects_fast():
+    policy, breaker = _policy()
+    _open_and_wait(policy, breaker)
+    breaker.reset_timeout = 60
+    breaker.record_failure()  # süreyi yeniden başlat
+    with pytest.raises(CircuitOpenError):
+        policy.call(lambda: "ok")
+    assert policy.report()["rejected_circuit_open"] == 1
+
+
+def test_half_open_trial_success_closes_circuit():
+    policy, breaker = _policy()
+    _open_and_wait(policy, breaker)
+    assert policy.call(lambda: "ok") == "ok"
+    assert breaker.state == CIRCUIT_CLOSED
+
+
+def test_half_open_trial_failure_reopens_circuit():
+    policy, breaker = _policy()
+    _open_and_wait(policy, breaker)
+    with pytest.raises(ConnectionError):
+        policy.call(_fail)
+    assert breaker.state == CIRCUIT_OPEN
+
+
+def test_only_one_trial_in_half_open():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.try_acquire() == (True, True)
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert breaker.try_acquire() == (False, False)
+
+
+def test_cancelled_trial_releases_half_open_slot():
+    policy, breaker = _policy()
+    _open_and_wait(policy, breaker)
+
+    async def scenario():
+        async def hang():
+            await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(policy.acall(hang))
+        await asyncio.sleep(0.01)
+        assert breaker.state == CIRCUIT_HALF_OPEN
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        async def ok():
+            return "ok"
+
+        return await policy.acall(ok)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == CIRCUIT_CLOSED
+    assert policy.report()["in_flight"] == 0
+
+
+def test_overloaded_call_does_not_take_trial():
+    policy, breaker = _policy(max_in_flight=1, max_queue_wait=0.01)
+    _open_and_wait(policy, breaker)
+    policy._slots.acquire()  # tüm yuvalar dolu
+    try:
+        with pytest.raises(OverloadedError):
+            policy.call(lambda: "ok")
+    finally:
+        policy._slots.release()
+    assert policy.call(lambda: "ok") == "ok"
+    assert breaker.state == CIRCUIT_CLOSED
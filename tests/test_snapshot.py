@@ -0,0 +1,36 @@
+# rag/snapshot.py: boş veri dizininde anlık görüntü üretilmemesi.
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from rag import rag_service
+from rag.snapshot import SnapshotError, build_snapshot
+
+
+class _FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 0.0]
+
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    monkeypatch.setattr(rag_service, "_build_embeddings", lambda backend: (_FakeEmbeddings(), "fake"))
+
+
+def test_empty_data_directory_raises_snapshot_error(tmp_path):
+    data, output = tmp_path / "data", tmp_path / "snapshots"
+    data.mkdir()
+    with pytest.raises(SnapshotError):
+        build_snapshot(str(data), str(output), embedding_backend="local")
+    assert list(output.iterdir()) == []
+
+
+def test_snapshot_is_built_from_loadable_files(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "stres.txt").write_text("Stresle başa çıkmak için düzenli nefes egzersizleri yapılabilir.\n" * 20,
+                                    encoding="utf-8")
+    archive_path = build_snapshot(str(data), str(tmp_path / "snapshots"), embedding_backend="local")
+    assert archive_path.endswith(".tar.gz")